@@ -4,107 +4,296 @@ Vercel serverless function for handling button clicks and interactions
 """
 
 import json
-from datetime import datetime
+import os
+import sys
+import time
 from http.server import BaseHTTPRequestHandler
-import urllib.parse
 
-def create_start_print_dialog(printer_id):
-    """Create start print job dialog"""
-    return {
-        "response_type": "ephemeral",
-        "blocks": [
-            {
-                "type": "header",
-                "text": {
-                    "type": "plain_text",
-                    "text": f"🖨️ Start Print Job - Bambu X1 #{printer_id[-1]}"
-                }
-            },
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": "*📁 Select File to Print:*"
-                }
-            },
-            {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "static_select",
-                        "placeholder": {
-                            "type": "plain_text",
-                            "text": "Choose a file..."
-                        },
-                        "options": [
-                            {
-                                "text": {"type": "plain_text", "text": "benchy_test.3mf"},
-                                "value": "benchy_test.3mf"
-                            },
-                            {
-                                "text": {"type": "plain_text", "text": "phone_case.3mf"},
-                                "value": "phone_case.3mf"
-                            },
-                            {
-                                "text": {"type": "plain_text", "text": "custom_part.3mf"},
-                                "value": "custom_part.3mf"
-                            }
-                        ],
-                        "action_id": "select_file"
-                    }
-                ]
+# Vercel runs functions from the project root; make the shared package importable when run from elsewhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm import deferred, idempotency, ingest
+from printfarm.dashboard import format_time_remaining, parse_query, render_dashboard_json
+from printfarm.dispatch import ActionRouter
+from printfarm.fragments import Fragment, dumps, send_json
+from printfarm.idempotency import RESPONSES
+from printfarm.metrics import METRICS
+from printfarm.state import FLEET
+from printfarm.tenants import TENANTS
+
+# Modules that only hook into the shared state are imported when their storage is configured;
+# handlers import what else they use, so a cold start loads only what its request needs
+if os.environ.get("PRINTFARM_DB"):
+    from printfarm import store  # restores and persists state
+if os.environ.get("PRINTFARM_HISTORY"):
+    from printfarm import history  # appends job events to the log /print stats reads
+
+# Static parts of the start print dialog, built and JSON-encoded once per cold start
+FILE_OPTIONS = [
+    {"text": {"type": "plain_text", "text": name}, "value": name}
+    for name in ("benchy_test.3mf", "phone_case.3mf", "custom_part.3mf")
+]
+
+CLIENT_TYPE_OPTIONS = [
+    {"text": {"type": "plain_text", "text": "Internal"}, "value": "internal"},
+    {"text": {"type": "plain_text", "text": "External"}, "value": "external"}
+]
+
+# With a catalog configured the picker searches it (Slack asks us via block_suggestion)
+SEARCH_FILE_SELECT = {
+    "type": "external_select",
+    "placeholder": {
+        "type": "plain_text",
+        "text": "Search files..."
+    },
+    "min_query_length": 0,
+    "action_id": "select_file"
+}
+
+STATIC_FILE_SELECT = {
+    "type": "static_select",
+    "placeholder": {
+        "type": "plain_text",
+        "text": "Choose a file..."
+    },
+    "options": FILE_OPTIONS,
+    "action_id": "select_file"
+}
+
+FILE_HEADING = Fragment({
+    "type": "section",
+    "text": {
+        "type": "mrkdwn",
+        "text": "*📁 Select File to Print:*"
+    }
+})
+
+# Keyed by catalog.enabled()
+FILE_PICKERS = {
+    True: Fragment({"type": "actions", "elements": [SEARCH_FILE_SELECT]}),
+    False: Fragment({"type": "actions", "elements": [STATIC_FILE_SELECT]}),
+}
+
+START_DIALOG_BLOCKS = [
+    {
+        "type": "divider"
+    },
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "*📋 Job Details:*"
+        }
+    },
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "Client Type:"
+        },
+        "accessory": {
+            "type": "static_select",
+            "placeholder": {
+                "type": "plain_text",
+                "text": "Select client type..."
             },
-            {
-                "type": "divider"
+            "options": CLIENT_TYPE_OPTIONS,
+            "action_id": "client_type"
+        }
+    },
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "Deadline:"
+        },
+        "accessory": {
+            "type": "datepicker",
+            "placeholder": {
+                "type": "plain_text",
+                "text": "No deadline"
             },
+            "action_id": "deadline"
+        }
+    },
+    {
+        "type": "input",
+        "element": {
+            "type": "plain_text_input",
+            "action_id": "project_name",
+            "placeholder": {
+                "type": "plain_text",
+                "text": "Enter project name..."
+            }
+        },
+        "label": {
+            "type": "plain_text",
+            "text": "Project Name"
+        }
+    },
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "Printer:"
+        },
+        "accessory": {
+            "type": "checkboxes",
+            "options": [
+                {
+                    "text": {"type": "plain_text", "text": "Only this printer (wait for it if it's busy)"},
+                    "value": "pin"
+                }
+            ],
+            "action_id": "pin_printer"
+        }
+    },
+    {
+        "type": "divider"
+    }
+]
+
+START_DIALOG_FRAGMENTS = [Fragment(block) for block in START_DIALOG_BLOCKS]
+
+def create_start_print_dialog(printer_id):
+    """Create start print job dialog (only the header and buttons are encoded per call)"""
+    printer = FLEET.get(printer_id)
+    header = {
+        "type": "header",
+        "text": {
+            "type": "plain_text",
+            "text": f"🖨️ Start Print Job - {printer.name if printer else printer_id}"
+        }
+    }
+    buttons = {
+        "type": "actions",
+        "elements": [
             {
-                "type": "section",
+                "type": "button",
                 "text": {
-                    "type": "mrkdwn",
-                    "text": "*📋 Job Details:*"
-                }
+                    "type": "plain_text",
+                    "text": "🚀 Start Print"
+                },
+                "style": "primary",
+                "action_id": f"confirm_print_{printer_id}",
+                "value": printer_id
             },
             {
-                "type": "section",
+                "type": "button",
                 "text": {
-                    "type": "mrkdwn",
-                    "text": "Client Type:"
+                    "type": "plain_text",
+                    "text": "❌ Cancel"
                 },
-                "accessory": {
-                    "type": "static_select",
-                    "placeholder": {
+                "action_id": "cancel_print"
+            }
+        ]
+    }
+    from printfarm import catalog  # imported lazily: only the start dialog and file search need it
+    return {
+        "response_type": "ephemeral",
+        "blocks": [header, FILE_HEADING, FILE_PICKERS[catalog.enabled()]] + START_DIALOG_FRAGMENTS + [buttons]
+    }
+
+def create_printing_status(printer_id):
+    """Show detailed printing status (latest values from the shared fleet state)"""
+    from printfarm import camera  # imported lazily: only this view links camera frames
+    from printfarm.estimate import estimate_printer
+
+    printer = FLEET.get(printer_id)
+    estimate = estimate_printer(printer_id)
+    remaining = format_time_remaining(estimate.remaining) if estimate and estimate.remaining else ''
+    cost = f"${estimate.cost:.2f}" if estimate and estimate.cost is not None else "Unknown"
+    filled = max(0, min(20, printer.progress // 5))
+    # Camera frames come through the public snapshot proxy (the printers' LAN addresses are unreachable from Slack)
+    snapshot = camera.snapshot_url(printer_id)
+    live_feed = camera.snapshot_url(printer_id, stream=True) or f"http://{printer.ip}:8080/stream"
+    blocks = [
+        {
+            "type": "header",
+            "text": {
+                "type": "plain_text",
+                "text": f"🖨️ {printer.name} - Live Status"
+            }
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn", 
+                "text": f"*📊 Progress:* {printer.progress}% complete\n" \
+                       f"*⏱️ Time Remaining:* {remaining or 'Unknown'}\n" \
+                       f"*📄 Current Job:* {printer.current_job or 'None'}\n" \
+                       f"*👤 Started by:* {printer.started_by or 'Unknown'}\n" \
+                       f"*💰 Estimated Cost:* {cost}"
+            }
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": "*Progress Bar:*\n" + "█" * filled + "░" * (20 - filled) + f" {printer.progress}%"
+            }
+        },
+        {
+            "type": "divider"
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {
                         "type": "plain_text",
-                        "text": "Select client type..."
+                        "text": "⏸️ Pause"
                     },
-                    "options": [
-                        {
-                            "text": {"type": "plain_text", "text": "Internal"},
-                            "value": "internal"
-                        },
-                        {
-                            "text": {"type": "plain_text", "text": "External"},
-                            "value": "external"
-                        }
-                    ],
-                    "action_id": "client_type"
-                }
-            },
-            {
-                "type": "input",
-                "element": {
-                    "type": "plain_text_input",
-                    "placeholder": {
-                        "type": "plain_text",
-                        "text": "Enter project name..."
-                    }
+                    "action_id": f"pause_print_{printer_id}",
+                    "style": "danger"
                 },
-                "label": {
-                    "type": "plain_text",
-                    "text": "Project Name"
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text", 
+                        "text": "🛑 Cancel Print"
+                    },
+                    "action_id": f"cancel_print_{printer_id}",
+                    "style": "danger"
+                },
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "📹 Live Feed"
+                    },
+                    "action_id": f"live_feed_{printer_id}",
+                    "url": live_feed
                 }
-            },
+            ]
+        }
+    ]
+    if snapshot:
+        blocks.insert(2, {
+            "type": "image",
+            "image_url": snapshot,
+            "alt_text": f"{printer.name} camera snapshot"
+        })
+    return {
+        "response_type": "ephemeral",
+        "blocks": blocks
+    }
+
+def create_paused_status(printer):
+    """A paused printer's job, with buttons to resume or cancel it"""
+    return {
+        "response_type": "ephemeral",
+        "blocks": [
             {
-                "type": "divider"
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*{printer.name}* ⏸️ Paused\n"
+                            f"📄 Job: {printer.current_job or 'None'}\n"
+                            f"📊 Progress: {printer.progress}%\n"
+                            f"👤 Started by: {printer.started_by or 'Unknown'}"
+                }
             },
             {
                 "type": "actions",
@@ -113,27 +302,40 @@ def create_start_print_dialog(printer_id):
                         "type": "button",
                         "text": {
                             "type": "plain_text",
-                            "text": "🚀 Start Print"
+                            "text": "▶️ Resume"
                         },
-                        "style": "primary",
-                        "action_id": f"confirm_print_{printer_id}",
-                        "value": printer_id
+                        "action_id": f"resume_print_{printer.id}",
+                        "style": "primary"
                     },
                     {
                         "type": "button",
                         "text": {
                             "type": "plain_text",
-                            "text": "❌ Cancel"
+                            "text": "🛑 Cancel Print"
                         },
-                        "action_id": "cancel_print"
+                        "action_id": f"cancel_print_{printer.id}",
+                        "style": "danger"
                     }
                 ]
             }
         ]
     }
 
-def create_printing_status(printer_id):
-    """Show detailed printing status"""
+# Printers shown in the batch picker after the status groups (Slack allows 100 options per group)
+BATCH_PICKER_LIMIT = 100
+
+BATCH_STATUS_OPTIONS = [
+    {"text": {"type": "plain_text", "text": text}, "value": value}
+    for text, value in (("All printing", "status:printing"), ("All paused", "status:paused"),
+                        ("All available", "status:available"), ("Every printer", "all"))
+]
+
+def create_batch_dialog(fleet):
+    """Pick printers (or whole status groups) and run one command on all of them"""
+    printers = [
+        {"text": {"type": "plain_text", "text": f"{printer.name} · {printer.status}"}, "value": printer.id}
+        for printer in list(fleet)[:BATCH_PICKER_LIMIT]
+    ]
     return {
         "response_type": "ephemeral",
         "blocks": [
@@ -141,27 +343,39 @@ def create_printing_status(printer_id):
                 "type": "header",
                 "text": {
                     "type": "plain_text",
-                    "text": f"🖨️ Bambu X1 #{printer_id[-1]} - Live Status"
+                    "text": "🧰 Batch Actions"
                 }
             },
             {
                 "type": "section",
                 "text": {
-                    "type": "mrkdwn", 
-                    "text": f"*📊 Progress:* 45% complete\n" \
-                           f"*⏱️ Time Remaining:* 2h 15m\n" \
-                           f"*📄 Current Job:* testslide1f\n" \
-                           f"*👤 Started by:* @shobhit\n" \
-                           f"*💰 Estimated Cost:* $12.50"
+                    "type": "mrkdwn",
+                    "text": "*🖨️ Printers:*"
+                },
+                "accessory": {
+                    "type": "multi_static_select",
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "Choose printers..."
+                    },
+                    "option_groups": [
+                        {"label": {"type": "plain_text", "text": "By status"}, "options": BATCH_STATUS_OPTIONS},
+                        {"label": {"type": "plain_text", "text": "Printers"}, "options": printers},
+                    ],
+                    "action_id": "batch_printers"
                 }
             },
             {
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
-                    "text": "*Progress Bar:*\n" + "█" * 9 + "░" * 11 + " 45%"
+                    "text": "*📁 File to start* (Start only):"
                 }
             },
+            {
+                "type": "actions",
+                "elements": [FILE_SELECT]
+            },
             {
                 "type": "divider"
             },
@@ -174,271 +388,381 @@ def create_printing_status(printer_id):
                             "type": "plain_text",
                             "text": "⏸️ Pause"
                         },
-                        "action_id": f"pause_print_{printer_id}",
-                        "style": "danger"
+                        "action_id": "batch_pause"
                     },
                     {
                         "type": "button",
                         "text": {
-                            "type": "plain_text", 
-                            "text": "🛑 Cancel Print"
+                            "type": "plain_text",
+                            "text": "▶️ Resume"
                         },
-                        "action_id": f"cancel_print_{printer_id}",
-                        "style": "danger"
+                        "action_id": "batch_resume"
                     },
                     {
                         "type": "button",
                         "text": {
                             "type": "plain_text",
-                            "text": "📹 Live Feed"
+                            "text": "🛑 Cancel"
                         },
-                        "action_id": f"live_feed_{printer_id}",
-                        "url": f"http://192.168.1.10{printer_id[-1]}:8080/stream"
+                        "style": "danger",
+                        "action_id": "batch_cancel",
+                        "confirm": {
+                            "title": {"type": "plain_text", "text": "Cancel prints?"},
+                            "text": {"type": "mrkdwn", "text": "Every selected printer stops its current print."},
+                            "confirm": {"type": "plain_text", "text": "Cancel prints"},
+                            "deny": {"type": "plain_text", "text": "Keep printing"}
+                        }
+                    },
+                    {
+                        "type": "button",
+                        "text": {
+                            "type": "plain_text",
+                            "text": "🚀 Start"
+                        },
+                        "style": "primary",
+                        "action_id": "batch_start"
                     }
                 ]
             }
         ]
     }
 
-# api/actions.py
-"""
-Vercel serverless function for handling button clicks and interactions
-"""
+# Action routing table: exact ids are a dict lookup, prefixed ids are parsed once
+router = ActionRouter()
 
-import json
-from datetime import datetime
-from http.server import BaseHTTPRequestHandler
-import urllib.parse
+# Permission an action needs, by router label; everything else needs "view"
+ACTION_PERMISSIONS = {
+    'confirm_print_*': 'print',
+    'block_suggestion': 'print',
+    'pause_print_*': 'control',
+    'resume_print_*': 'control',
+    'cancel_print_*': 'control',
+    'batch_pause': 'control',
+    'batch_resume': 'control',
+    'batch_cancel': 'control',
+    'batch_start': 'print',
+}
 
-# Duplicate the dashboard function here (since Vercel can't import between files easily)
-def create_printer_dashboard():
-    """Create the main printer dashboard Slack message"""
-    
-    # Dummy printer data 
-    DUMMY_PRINTERS = [
-        {
-            "id": "printer_1",
-            "name": "Bambu X1 #1",
-            "model": "X1 Carbon",
-            "status": "available",
-            "last_job": "phone_case.3mf"
-        },
-        {
-            "id": "printer_2", 
-            "name": "Bambu X1 #2",
-            "model": "X1 Carbon",
-            "status": "printing",
-            "current_job": "testslide1f",
-            "progress": 45,
-            "time_remaining": 135,
-            "started_by": "@shobhit"
-        },
-        {
-            "id": "printer_3",
-            "name": "Bambu X1 #3", 
-            "model": "X1 Carbon",
-            "status": "available",
-            "last_job": "benchy_test.3mf"
-        },
-        {
-            "id": "printer_4",
-            "name": "Bambu X1 #4",
-            "model": "X1 Carbon", 
-            "status": "offline",
-            "error": "Network connection lost"
+def access_for(payload):
+    """The tenant access for an interaction's team, channel and user (None if not covered)"""
+    channel = payload.get('channel') or {}
+    return TENANTS.resolve(
+        (payload.get('team') or {}).get('id'),
+        channel.get('id') or (payload.get('container') or {}).get('channel_id'),
+        channel.get('name'),
+        (payload.get('user') or {}).get('id'),
+    )
+
+@router.action('refresh_status', 'page_prev', 'page_next')
+def show_dashboard(payload, action):
+    """Refresh or page through the dashboard (the button value carries the filters and page)"""
+    return render_dashboard_json(access_for(payload).fleet, parse_query(action.get('value')))
+
+@router.prefix('printer_action_')
+def printer_action(payload, action, printer_id):
+    """Open the view that fits the printer's current status"""
+    printer = access_for(payload).fleet.get(printer_id)
+
+    # Check what action to take based on printer status
+    if printer is None:
+        return {"text": f"❓ Unknown printer '{printer_id}'"}
+    elif printer.status == "available":
+        return create_start_print_dialog(printer_id)
+    elif printer.status == "printing":
+        return create_printing_status(printer_id)
+    elif printer.status == "paused":
+        return create_paused_status(printer)
+    elif printer.status == "error":
+        return {
+            "text": f"❌ {printer.name} reported an error: {printer.error or 'Unknown error'}. "
+                    f"Clear it on the printer, then refresh."
         }
-    ]
-    
-    def get_status_emoji(status):
-        status_emojis = {
-            "available": "✅",
-            "printing": "🔒", 
-            "offline": "⚠️"
+    elif printer.status == "offline":
+        return {
+            "text": f"ℹ️ {printer.name} is currently offline. Check network connection."
         }
-        return status_emojis.get(status, "❓")
-
-    def format_time_remaining(minutes):
-        if minutes <= 0:
-            return ""
-        hours = minutes // 60
-        mins = minutes % 60
-        if hours > 0:
-            return f"{hours}h {mins}m"
-        else:
-            return f"{mins}m"
-    
-    # Header
-    blocks = [
-        {
-            "type": "header",
-            "text": {
-                "type": "plain_text",
-                "text": "🏭 3D Printer Farm Status"
-            }
-        },
-        {
-            "type": "divider"
+    else:
+        return {
+            "text": f"ℹ️ {printer.name} is currently {printer.status}."
+        }
+
+def get_state_values(payload):
+    """Flatten the inputs of the message an action came from into {action_id: value}"""
+    values = {}
+    for block in payload.get('state', {}).get('values', {}).values():
+        for element_id, element in block.items():
+            if 'selected_options' in element:
+                values[element_id] = [option['value'] for option in element['selected_options'] or ()]
+            elif 'selected_option' in element:
+                values[element_id] = (element['selected_option'] or {}).get('value')
+            elif 'selected_date' in element:
+                values[element_id] = element['selected_date']
+            else:
+                values[element_id] = element.get('value')
+    return values
+
+def parse_deadline(date):
+    """End of the given YYYY-MM-DD day as a timestamp (None if not set)"""
+    if not date:
+        return None
+    return time.mktime(time.strptime(date, "%Y-%m-%d")) + 24 * 3600 - 1
+
+@router.prefix('confirm_print_')
+def confirm_print(payload, action, printer_id):
+    """Start a print job, or queue it for the next free printer of the same model"""
+    from printfarm import catalog  # imported lazily: only the start dialog and file search need it
+    from printfarm.scheduler import SCHEDULER  # imported lazily: only the queue views need it
+
+    fleet = access_for(payload).fleet
+    printer = fleet.get(printer_id)
+    if printer is None:
+        return {"text": f"❓ Unknown printer '{printer_id}'"}
+
+    values = get_state_values(payload)
+    if not values.get('select_file'):
+        return {"text": "⚠️ Choose a file to print first."}
+
+    # Pinned only when asked for; otherwise any of the tenant's printers of this model will do
+    pinned = 'pin' in (values.get('pin_printer') or ())
+    pool = None if pinned else [p.id for p in fleet.select(model=printer.model or None)]
+
+    # The slicer's print time (when the file is in the catalog) orders the queue
+    library = catalog.get_catalog()
+    entry = library.get(values['select_file']) if library is not None else None
+    job = SCHEDULER.submit(
+        values['select_file'],
+        client_type=values.get('client_type') or 'internal',
+        deadline=parse_deadline(values.get('deadline')),
+        duration=round(entry.print_time / 60) if entry and entry.print_time else None,
+        submitted_by=f"@{payload['user']['name']}",
+        project=values.get('project_name'),
+        printer_id=printer_id if pinned else None,
+        pool=pool,
+        prefer=printer_id,
+    )
+    if job.state == 'running':
+        started_on = FLEET.get(job.assigned_to)
+        return {
+            "text": f"🚀 Print job started on {started_on.name if started_on else printer.name}! "
+                    f"Check status with `/print`"
+        }
+    if pinned:
+        return {
+            "text": f"📋 {printer.name} is busy, so `{job.file}` is queued "
+                    f"(position {SCHEDULER.position(job.id)}). It starts as soon as the printer is free."
         }
-    ]
-    
-    # Each printer status
-    for printer in DUMMY_PRINTERS:
-        status_emoji = get_status_emoji(printer["status"])
-        
-        if printer["status"] == "printing":
-            status_text = f"*{printer['name']}* {status_emoji} Printing\n" \
-                         f"📄 Job: {printer['current_job']}\n" \
-                         f"📊 Progress: {printer['progress']}%\n" \
-                         f"⏱️ Remaining: {format_time_remaining(printer['time_remaining'])}\n" \
-                         f"👤 Started by: {printer.get('started_by', 'Unknown')}"
-            button_text = "View Progress"
-            button_style = "primary"
-            
-        elif printer["status"] == "available":
-            status_text = f"*{printer['name']}* {status_emoji} Available\n" \
-                         f"🔧 Model: {printer['model']}\n" \
-                         f"📁 Last job: {printer.get('last_job', 'None')}"
-            button_text = "Start Print"
-            button_style = "primary"
-            
-        elif printer["status"] == "offline":
-            status_text = f"*{printer['name']}* {status_emoji} Offline\n" \
-                         f"❌ Error: {printer.get('error', 'Unknown error')}"
-            button_text = "Check Status"
-            button_style = "danger"
-        
-        blocks.append({
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": status_text
-            },
-            "accessory": {
-                "type": "button",
-                "text": {
-                    "type": "plain_text",
-                    "text": button_text
-                },
-                "style": button_style,
-                "action_id": f"printer_action_{printer['id']}",
-                "value": printer['id']
-            }
-        })
-        
-        blocks.append({"type": "divider"})
-    
-    # Footer with actions
-    blocks.append({
-        "type": "actions",
-        "elements": [
-            {
-                "type": "button",
-                "text": {
-                    "type": "plain_text",
-                    "text": "🔄 Refresh Status"
-                },
-                "action_id": "refresh_status",
-                "style": "primary"
-            },
-            {
-                "type": "button", 
-                "text": {
-                    "type": "plain_text",
-                    "text": "📋 View Queue"
-                },
-                "action_id": "view_queue"
-            }
-        ]
-    })
-    
-    # Timestamp
-    blocks.append({
-        "type": "context",
-        "elements": [
-            {
-                "type": "mrkdwn",
-                "text": f"Last updated: {datetime.now().strftime('%I:%M %p')}"
-            }
-        ]
-    })
-    
     return {
-        "response_type": "ephemeral",
-        "blocks": blocks
+        "text": f"📋 Every {printer.model or 'printer'} is busy, so `{job.file}` is queued "
+                f"(position {SCHEDULER.position(job.id)}). It starts on the next one that is free."
+    }
+
+@router.action('view_queue')
+def view_queue(payload, action):
+    """Show the next jobs in the print queue (the tenant's own printers only)"""
+    from printfarm.scheduler import SCHEDULER  # imported lazily: only the queue views need it
+
+    printer_ids = access_for(payload).tenant.printer_ids
+    if printer_ids is None:
+        jobs, waiting = SCHEDULER.pending(10), len(SCHEDULER)
+    else:
+        jobs = SCHEDULER.pending(len(SCHEDULER), printer_ids)
+        jobs, waiting = jobs[:10], len(jobs)
+    if not jobs:
+        return {
+            "text": "📋 Print queue is currently empty."
+        }
+
+    lines = [f"📋 *Print queue* ({waiting} waiting)"]
+    for position, job in enumerate(jobs, 1):
+        if job.printer_id in FLEET:
+            target = FLEET.get(job.printer_id).name
+        elif job.pool is not None:
+            target = f"any of {len(job.pool)} printer{'s' if len(job.pool) != 1 else ''}"
+        else:
+            target = "any printer"
+        due = f", due {time.strftime('%b %d', time.localtime(job.deadline))}" if job.deadline else ""
+        lines.append(f"{position}. `{job.file}` for {target} · {job.client_type}{due} · {job.submitted_by}")
+    return {"text": "\n".join(lines)}
+
+@router.prefix('pause_print_')
+@router.prefix('resume_print_')
+@router.prefix('cancel_print_')
+def control_print(payload, action, printer_id):
+    """Pause, resume or cancel the print on one printer"""
+    if printer_id not in access_for(payload).fleet:
+        return {"text": f"❓ Unknown printer '{printer_id}'"}
+    from printfarm.commands import CONTROL  # imported lazily: only printer commands need it
+
+    command = action['action_id'][:-len(printer_id) - len('_print_')]
+    result = CONTROL.run(command, printer_id)
+    if result.outcome == 'done':
+        return {"text": f"✅ {result.name} {result.detail}."}
+    if result.outcome == 'skipped':
+        return {"text": f"ℹ️ {result.name} is {result.detail}, so there is nothing to {command}."}
+    return {"text": f"❌ Couldn't {command} {result.name}: {result.detail}"}
+
+@router.action('batch_actions')
+def batch_actions(payload, action):
+    """Open the batch actions dialog for the tenant's printers"""
+    return create_batch_dialog(access_for(payload).fleet)
+
+def batch_targets(fleet, selected):
+    """Printer ids for the picker's values (status groups expand to their printers right now)"""
+    targets = []
+    for value in selected:
+        if value == 'all':
+            targets.extend(fleet.ids())
+        elif value.startswith('status:'):
+            targets.extend(printer.id for printer in fleet.select(status=value[7:]))
+        elif value in fleet:
+            targets.append(value)
+    return list(dict.fromkeys(targets))
+
+@router.action('batch_pause', 'batch_resume', 'batch_cancel', 'batch_start')
+def batch_command(payload, action):
+    """Run one command across the selected printers, concurrently"""
+    from printfarm import commands  # imported lazily: only printer commands need it
+
+    command = action['action_id'][len('batch_'):]
+    values = get_state_values(payload)
+    printer_ids = batch_targets(access_for(payload).fleet, values.get('batch_printers') or ())
+    if not printer_ids:
+        return {"text": "⚠️ Choose at least one printer first."}
+
+    options = {}
+    if command == 'start':
+        if not values.get('select_file'):
+            return {"text": "⚠️ Choose a file to print first."}
+        options = {"file": values['select_file'],
+                   "job": {"client_type": "internal", "submitted_by": f"@{payload['user']['name']}"}}
+
+    # In a process that outlives the request the message fills in as printers answer;
+    # on serverless the instance may freeze once we answer, so answer with the summary
+    response_url = payload.get('response_url')
+    if response_url and deferred.background_ok():
+        commands.start_batch(command, printer_ids, response_url, **options)
+        return {"text": f"⏳ *Batch {command}* on {len(printer_ids)} printer{'s' if len(printer_ids) != 1 else ''}..."}
+    return commands.run_batch(command, printer_ids, **options)
+
+@router.action('cancel_print')
+def cancel_print(payload, action):
+    """Dismiss the start print dialog"""
+    return {
+        "text": "❌ Print job cancelled."
     }
 
+@router.fallback
+def unknown_action(payload, action):
+    """Acknowledge actions nobody handles (counted in printfarm_unknown_actions_total)"""
+    return {"text": f"👍 Action '{action['action_id']}' received"}
+
+def file_options(payload):
+    """Options for the file picker's external_select, searched by what the user typed"""
+    from printfarm import catalog  # imported lazily: only the start dialog and file search need it
+
+    library = catalog.get_catalog()
+    if library is None:
+        return {"options": FILE_OPTIONS}
+    return {"options": catalog.options(library.search(payload.get('value', '')))}
+
+def action_label(payload):
+    """Bounded name of what an interaction asks for (metrics and permissions)"""
+    if payload.get('type') == 'block_suggestion':
+        return 'block_suggestion'
+    return router.label((payload.get('actions') or [{}])[0].get('action_id', ''))
+
+def handle_action(payload, label=None):
+    """Build the response for one interaction payload, if the tenant allows it"""
+    access = access_for(payload)
+    label = label or action_label(payload)
+    if access is None or ACTION_PERMISSIONS.get(label, 'view') not in access.permissions:
+        if label == 'block_suggestion':
+            return {"options": []}
+        return {"text": TENANTS.denied if access is None else "❌ You don't have permission to do that here"}
+    if label == 'block_suggestion':
+        return file_options(payload)
+    return router.dispatch(payload)
+
 class handler(BaseHTTPRequestHandler):
     """Vercel serverless function handler for button interactions"""
     
     def do_POST(self):
         """Handle POST requests from Slack button interactions"""
+        timer = METRICS.request('actions')
+        key = None
+        completed = False  # once a response is stored, a retry must replay it, not run again
         try:
-            # Parse the request body
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            
-            # Slack sends form-encoded data for interactions
-            parsed_data = urllib.parse.parse_qs(post_data.decode('utf-8'))
+            # Read and verify the request; Slack sends interaction data as a 'payload' form field
+            fields = ingest.read_form(self, ('payload',))
+            try:
+                payload = json.loads(fields['payload'])
+            except (KeyError, ValueError):
+                raise ingest.RequestRejected(400, "Missing or malformed interaction payload")
+            label = timer.label = action_label(payload)
+            timer.stage('parse')
             
-            # Get the payload (Slack sends interaction data as 'payload')
-            payload_str = parsed_data.get('payload', [''])[0]
-            payload = json.loads(payload_str)
+            # Slack retries requests it got no answer to; a repeat gets the first answer back
+            key = idempotency.interaction_key(payload)
+            replay = RESPONSES.claim(key) if key is not None else None
+            if replay is not None:
+                timer.label = 'duplicate'
+                send_json(self, 200, replay)
+                timer.stage('write')
+                return
             
-            action_id = payload['actions'][0]['action_id']
-            user = payload['user']['name']
+            # Deferred mode: ack now, deliver the result via response_url
+            response_url = payload.get('response_url', '')
+            if deferred.defer(response_url, lambda: handle_action(payload, label)):
+                if key is not None:
+                    RESPONSES.complete(key, b"")
+                    completed = True
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                timer.stage('write')
+                return
             
-            if action_id == 'refresh_status':
-                response = create_printer_dashboard()
-            
-            elif action_id.startswith('printer_action_'):
-                printer_id = action_id.replace('printer_action_', '')
-                
-                # Check what action to take based on printer status
-                if printer_id == "printer_1" or printer_id == "printer_3":  # Available printers
-                    response = create_start_print_dialog(printer_id)
-                elif printer_id == "printer_2":  # Printing printer
-                    response = create_printing_status(printer_id)
-                else:  # Offline printer
-                    response = {
-                        "text": f"ℹ️ Bambu X1 #{printer_id[-1]} is currently offline. Check network connection."
-                    }
-            
-            elif action_id.startswith('confirm_print_'):
-                printer_id = action_id.replace('confirm_print_', '')
-                response = {
-                    "text": f"🚀 Print job started on Bambu X1 #{printer_id[-1]}! Check status with `/print`"
-                }
-            
-            elif action_id == 'view_queue':
-                response = {
-                    "text": "📋 Print queue is currently empty. All jobs are processed immediately."
-                }
-            
-            elif action_id == 'cancel_print':
-                response = {
-                    "text": "❌ Print job cancelled."
-                }
-            
-            else:
-                response = {"text": f"👍 Action '{action_id}' received"}
+            response = handle_action(payload, label)
+            timer.stage('handle')
+            body = dumps(response)  # constant blocks are spliced in pre-encoded
+            timer.stage('encode')
+            if key is not None:
+                RESPONSES.complete(key, body)
+                completed = True
             
             # Send response
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            send_json(self, 200, body)
+            timer.stage('write')
+            
+        except ingest.RequestRejected as e:
+            # Refused before doing any work (bad signature, oversized, malformed)
+            METRICS.error('actions', f"rejected_{e.status}")
+            send_json(self, e.status, {"text": f"❌ {str(e)}"})
             
         except Exception as e:
-            # Error response
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            error_response = {"text": f"❌ Error processing action: {str(e)}"}
-            self.wfile.write(json.dumps(error_response).encode())
+            # Error response; the traceback goes to the function log
+            METRICS.error('actions', type(e).__name__)
+            if key is not None and not completed:
+                RESPONSES.abandon(key)
+            import traceback  # imported lazily: only failing requests print one
+            traceback.print_exc()
+            send_json(self, 500, {"text": f"❌ Error processing action: {type(e).__name__}: {str(e)}"})
+        
+        finally:
+            timer.finish()
     
     def do_GET(self):
-        """Handle GET requests (for testing)"""
+        """Handle GET requests (for testing); ?metrics returns Prometheus metrics"""
+        path, _, query = self.path.partition('?')
+        if path.endswith('/metrics') or 'metrics' in query.split('&'):
+            body = METRICS.render()
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
         self.send_response(200)
         self.send_header('Content-type', 'text/plain')
         self.end_headers()
-        self.wfile.write(b'Slack Actions Handler is running on Vercel!')
\ No newline at end of file
+        self.wfile.write(b'Slack Actions Handler is running on Vercel!')
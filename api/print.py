@@ -4,241 +4,155 @@ Vercel serverless function for /print command
 Each endpoint is a separate file in the /api folder
 """
 
-import json
-from datetime import datetime
+import os
+import sys
 from http.server import BaseHTTPRequestHandler
-import urllib.parse
 
-# Dummy printer data (same as before)
-DUMMY_PRINTERS = [
-    {
-        "id": "printer_1",
-        "name": "Bambu X1 #1",
-        "model": "X1 Carbon",
-        "status": "available",
-        "ip": "192.168.1.101",
-        "current_job": None,
-        "progress": 0,
-        "time_remaining": 0,
-        "last_job": "phone_case.3mf"
-    },
-    {
-        "id": "printer_2", 
-        "name": "Bambu X1 #2",
-        "model": "X1 Carbon",
-        "status": "printing",
-        "ip": "192.168.1.102",
-        "current_job": "testslide1f",
-        "progress": 45,
-        "time_remaining": 135,
-        "started_by": "@shobhit"
-    },
-    {
-        "id": "printer_3",
-        "name": "Bambu X1 #3", 
-        "model": "X1 Carbon",
-        "status": "available",
-        "ip": "192.168.1.103",
-        "current_job": None,
-        "progress": 0,
-        "time_remaining": 0,
-        "last_job": "benchy_test.3mf"
-    },
-    {
-        "id": "printer_4",
-        "name": "Bambu X1 #4",
-        "model": "X1 Carbon", 
-        "status": "offline",
-        "ip": "192.168.1.104",
-        "current_job": None,
-        "progress": 0,
-        "time_remaining": 0,
-        "error": "Network connection lost"
-    }
-]
+# Vercel runs functions from the project root; make the shared package importable when run from elsewhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def get_status_emoji(status):
-    """Get emoji for printer status"""
-    status_emojis = {
-        "available": "✅",
-        "printing": "🔒", 
-        "paused": "⏸️",
-        "offline": "⚠️",
-        "maintenance": "🔧",
-        "error": "❌"
-    }
-    return status_emojis.get(status, "❓")
+from printfarm import deferred, idempotency, ingest, webapi
+from printfarm.dashboard import parse_query, render_dashboard_json
+from printfarm.fragments import dumps, send_json
+from printfarm.idempotency import RESPONSES
+from printfarm.metrics import METRICS
+from printfarm.tenants import TENANTS
 
-def format_time_remaining(minutes):
-    """Format time remaining in readable format"""
-    if minutes <= 0:
-        return ""
-    
-    hours = minutes // 60
-    mins = minutes % 60
-    
-    if hours > 0:
-        return f"{hours}h {mins}m"
-    else:
-        return f"{mins}m"
+# Modules that only hook into the shared state are imported when their storage is configured
+if os.environ.get("PRINTFARM_DB"):
+    from printfarm import store  # restores and persists state
+if os.environ.get("PRINTFARM_HISTORY"):
+    from printfarm import history  # appends job events to the log /print stats reads
 
-def create_printer_dashboard():
-    """Create the main printer dashboard Slack message"""
-    
-    # Header
-    blocks = [
-        {
-            "type": "header",
-            "text": {
-                "type": "plain_text",
-                "text": "🏭 3D Printer Farm Status"
-            }
-        },
-        {
-            "type": "divider"
+# Slash command fields the handler reads; nothing else in the form is decoded
+COMMAND_FIELDS = ('team_id', 'channel_id', 'channel_name', 'user_id', 'user_name', 'text', 'response_url', 'trigger_id')
+
+def command_name(text):
+    """The subcommand a /print text asks for (used to label metrics)"""
+    word = text.strip().partition(' ')[0].lower()
+    return word if word in ('live', 'stats') else 'dashboard'
+
+def start_live(channel_id, text, fleet):
+    """/print live [filters]: post a dashboard that keeps itself up to date"""
+    if not webapi.bot_token():
+        return {
+            "response_type": "ephemeral",
+            "text": "❌ Live dashboards need SLACK_BOT_TOKEN to be configured"
         }
-    ]
-    
-    # Each printer status
-    for printer in DUMMY_PRINTERS:
-        status_emoji = get_status_emoji(printer["status"])
-        
-        # Main printer info
-        if printer["status"] == "printing":
-            status_text = f"*{printer['name']}* {status_emoji} Printing\n" \
-                         f"📄 Job: {printer['current_job']}\n" \
-                         f"📊 Progress: {printer['progress']}%\n" \
-                         f"⏱️ Remaining: {format_time_remaining(printer['time_remaining'])}\n" \
-                         f"👤 Started by: {printer.get('started_by', 'Unknown')}"
-            
-            button_text = "View Progress"
-            button_style = "primary"
-            
-        elif printer["status"] == "available":
-            status_text = f"*{printer['name']}* {status_emoji} Available\n" \
-                         f"🔧 Model: {printer['model']}\n" \
-                         f"📁 Last job: {printer.get('last_job', 'None')}"
-            
-            button_text = "Start Print"
-            button_style = "primary"
-            
-        elif printer["status"] == "offline":
-            status_text = f"*{printer['name']}* {status_emoji} Offline\n" \
-                         f"❌ Error: {printer.get('error', 'Unknown error')}\n" \
-                         f"🌐 IP: {printer['ip']}"
-            
-            button_text = "Check Status"
-            button_style = "danger"
-            
-        else:
-            status_text = f"*{printer['name']}* {status_emoji} {printer['status'].title()}"
-            button_text = "View Details"
-            button_style = "default"
-        
-        # Add printer block
-        blocks.append({
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": status_text
-            },
-            "accessory": {
-                "type": "button",
-                "text": {
-                    "type": "plain_text",
-                    "text": button_text
-                },
-                "style": button_style,
-                "action_id": f"printer_action_{printer['id']}",
-                "value": printer['id']
-            }
-        })
-        
-        blocks.append({"type": "divider"})
-    
-    # Footer with actions
-    blocks.append({
-        "type": "actions",
-        "elements": [
-            {
-                "type": "button",
-                "text": {
-                    "type": "plain_text",
-                    "text": "🔄 Refresh Status"
-                },
-                "action_id": "refresh_status",
-                "style": "primary"
-            },
-            {
-                "type": "button", 
-                "text": {
-                    "type": "plain_text",
-                    "text": "📋 View Queue"
-                },
-                "action_id": "view_queue"
-            }
-        ]
-    })
-    
-    # Timestamp
-    blocks.append({
-        "type": "context",
-        "elements": [
-            {
-                "type": "mrkdwn",
-                "text": f"Last updated: {datetime.now().strftime('%I:%M %p')}"
-            }
-        ]
-    })
-    
+    from printfarm.live import LIVE  # imported lazily: only this subcommand needs it
+    try:
+        LIVE.start(channel_id, parse_query(text), fleet=fleet)
+    except webapi.SlackApiError as e:
+        return {"response_type": "ephemeral", "text": f"❌ Couldn't post live dashboard: {e.error}"}
     return {
         "response_type": "ephemeral",
-        "blocks": blocks
+        "text": "📡 Live dashboard posted - it updates as printers change"
     }
 
+def show_stats(text, access):
+    """/print stats [days]: utilization and hours per printer, user and client type"""
+    from printfarm.history import stats_message  # imported lazily: only this subcommand needs it
+
+    days = text.strip().lower().rstrip('d')
+    days = min(int(days), 366) if days.isdigit() and int(days) > 0 else 7
+    return stats_message(days, access.tenant.printer_ids, access.fleet)
+
+def handle_command(fields):
+    """Build the response for a /print slash command"""
+    # Which lab's printers this channel (and user) may see
+    access = TENANTS.resolve(fields.get('team_id'), fields.get('channel_id'),
+                             fields.get('channel_name'), fields.get('user_id'))
+    if access is None or 'view' not in access.permissions:
+        return {
+            "text": TENANTS.denied
+        }
+    
+    text = fields.get('text', '')
+    if command_name(text) == 'live':
+        return start_live(fields.get('channel_id', ''), text.strip().partition(' ')[2], access.fleet)
+    if command_name(text) == 'stats':
+        return show_stats(text.strip().partition(' ')[2], access)
+    
+    # Return the tenant's printer dashboard (already JSON-encoded), filtered by any arguments
+    query = parse_query(text)
+    return render_dashboard_json(access.fleet, query)
+
 class handler(BaseHTTPRequestHandler):
     """Vercel serverless function handler"""
     
     def do_POST(self):
         """Handle POST requests from Slack"""
+        timer = METRICS.request('print')
+        key = None
+        completed = False  # once a response is stored, a retry must replay it, not run again
         try:
-            # Parse the request body
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+            # Read and verify the request, decoding only the fields we use
+            fields = ingest.read_form(self, COMMAND_FIELDS)
+            timer.label = command_name(fields.get('text', ''))
+            timer.stage('parse')
             
-            # Slack sends form-encoded data
-            parsed_data = urllib.parse.parse_qs(post_data.decode('utf-8'))
+            # Slack retries requests it got no answer to; a repeat gets the first answer back
+            key = idempotency.command_key(fields)
+            replay = RESPONSES.claim(key) if key is not None else None
+            if replay is not None:
+                timer.label = 'duplicate'
+                send_json(self, 200, replay)
+                timer.stage('write')
+                return
             
-            # Get Slack data
-            channel_name = parsed_data.get('channel_name', [''])[0]
-            user_name = parsed_data.get('user_name', [''])[0]
+            # Deferred mode: ack now, deliver the dashboard via response_url
+            response_url = fields.get('response_url', '')
+            if deferred.defer(response_url, lambda: handle_command(fields)):
+                if key is not None:
+                    RESPONSES.complete(key, b"")
+                    completed = True
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                timer.stage('write')
+                return
             
-            # Only allow in your test channel
-            if channel_name != '3d-printer-automation-test':
-                response = {
-                    "text": "❌ This command only works in #3d-printer-automation-test channel"
-                }
-            else:
-                # Return the printer dashboard
-                response = create_printer_dashboard()
+            response = handle_command(fields)
+            timer.stage('handle')
+            body = dumps(response)  # constant blocks are spliced in pre-encoded
+            timer.stage('encode')
+            if key is not None:
+                RESPONSES.complete(key, body)
+                completed = True
             
             # Send response
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            send_json(self, 200, body)
+            timer.stage('write')
+            
+        except ingest.RequestRejected as e:
+            # Refused before doing any work (bad signature, oversized, malformed)
+            METRICS.error('print', f"rejected_{e.status}")
+            send_json(self, e.status, {"text": f"❌ {str(e)}"})
             
         except Exception as e:
-            # Error response
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            error_response = {"text": f"❌ Error: {str(e)}"}
-            self.wfile.write(json.dumps(error_response).encode())
+            # Error response; the traceback goes to the function log
+            METRICS.error('print', type(e).__name__)
+            if key is not None and not completed:
+                RESPONSES.abandon(key)
+            import traceback  # imported lazily: only failing requests print one
+            traceback.print_exc()
+            send_json(self, 500, {"text": f"❌ Error: {type(e).__name__}: {str(e)}"})
+        
+        finally:
+            timer.finish()
     
     def do_GET(self):
-        """Handle GET requests (for testing)"""
+        """Handle GET requests (for testing); ?metrics returns Prometheus metrics"""
+        path, _, query = self.path.partition('?')
+        if path.endswith('/metrics') or 'metrics' in query.split('&'):
+            body = METRICS.render()
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
         self.send_response(200)
         self.send_header('Content-type', 'text/plain')
         self.end_headers()
-        self.wfile.write(b'Slack 3D Printer Bot is running on Vercel!')
\ No newline at end of file
+        self.wfile.write(b'Slack 3D Printer Bot is running on Vercel!')
@@ -0,0 +1,127 @@
+# api/snapshot.py
+"""
+Vercel serverless function serving printer camera frames
+GET /api/snapshot?printer=<id>&expires=..&sig=.. returns the newest JPEG from
+the printer's shared camera feed; &stream=1 re-serves the feed as MJPEG, so
+any number of viewers share the one connection to the camera
+"""
+
+import os
+import sys
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+# Vercel runs functions from the project root; make the shared package importable when run from elsewhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm import camera
+from printfarm.camera import CAMERAS
+from printfarm.metrics import METRICS
+
+# A re-served stream ends after this long; the viewer's browser reconnects
+MAX_STREAM_SECONDS = 300
+
+BOUNDARY = "printfarmframe"
+
+class handler(BaseHTTPRequestHandler):
+    """Vercel serverless function handler for camera snapshots"""
+
+    def send_plain(self, status, text):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_frame(self, printer_id, frame):
+        """The frame as a JPEG (the grey placeholder when there is none yet)"""
+        if frame is None:
+            body, content_type, etag = camera.placeholder_png(), 'image/png', None
+        else:
+            body, content_type, etag = frame.jpeg, 'image/jpeg', f'"{printer_id}-{frame.seq}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return 'not_modified'
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'private, max-age=1')
+        else:
+            self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+        return 'frame' if frame is not None else 'no_frame'
+
+    def send_stream(self, feed):
+        """Re-serve the shared feed as MJPEG until the viewer leaves or MAX_STREAM_SECONDS pass"""
+        self.send_response(200)
+        self.send_header('Content-type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        seq = 0
+        while time.monotonic() < deadline:
+            frame = feed.next_frame(seq, camera.FIRST_FRAME_WAIT)
+            if frame is None:
+                continue
+            seq = frame.seq
+            try:
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(frame.jpeg)}\r\n\r\n".encode()
+                                 + frame.jpeg + b"\r\n")
+                self.wfile.flush()
+            except OSError:
+                return   # the viewer went away
+
+    def do_GET(self):
+        """Serve a snapshot (or ?metrics for Prometheus metrics)"""
+        path, _, query = self.path.partition('?')
+        if path.endswith('/metrics') or 'metrics' in query.split('&'):
+            body = METRICS.render()
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        timer = METRICS.request('snapshot')
+        try:
+            params = {name: values[0] for name, values in parse_qs(query).items()}
+            printer_id = params.get('printer', '')
+            stream = params.get('stream') == '1'
+            if not camera.check_url(printer_id, params.get('expires', ''), params.get('sig', ''), stream):
+                METRICS.error('snapshot', 'rejected_403')
+                self.send_plain(403, "Snapshot link expired or invalid")
+                return
+            feed = CAMERAS.feed(printer_id)
+            if feed is None:
+                METRICS.error('snapshot', 'rejected_404')
+                self.send_plain(404, f"Unknown printer '{printer_id}'")
+                return
+            timer.stage('parse')
+
+            if stream:
+                timer.label = 'stream'
+                self.send_stream(feed)
+            else:
+                frame = feed.latest()
+                timer.stage('lookup')
+                timer.label = self.send_frame(printer_id, frame)
+            timer.stage('write')
+
+        except Exception as e:
+            # Error response; the traceback goes to the function log
+            METRICS.error('snapshot', type(e).__name__)
+            traceback.print_exc()
+            self.send_plain(500, f"Error: {type(e).__name__}: {str(e)}")
+
+        finally:
+            timer.finish()
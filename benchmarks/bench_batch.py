@@ -0,0 +1,90 @@
+# benchmarks/bench_batch.py
+"""
+Benchmark: one batch command across a fleet
+Puts a fake MQTT connection behind the printer commands (each publish takes a
+round trip, a few printers are unreachable and one never answers), then
+pauses every printer one at a time and as a batch, printing the progress
+messages the batch would post to Slack and its final summary
+
+Run: python benchmarks/bench_batch.py [printers] [round trip ms] [parallelism]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm.commands import PrinterCommands, run_batch
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+
+class FakeMqtt:
+    """publish_threadsafe with a fixed round trip; some printers fail, one hangs"""
+
+    def __init__(self, fleet, round_trip, unreachable=(), hanging=()):
+        self.fleet = fleet
+        self.round_trip = round_trip
+        self.unreachable = set(unreachable)
+        self.hanging = set(hanging)
+        self.published = 0
+
+    def publish_threadsafe(self, printer_id, payload, timeout=5.0):
+        if printer_id in self.hanging:
+            time.sleep(timeout)
+            raise TimeoutError("no answer")
+        time.sleep(self.round_trip)
+        if printer_id in self.unreachable:
+            raise ConnectionError("broker connection lost")
+        self.published += 1
+        # The printer reports its new state back, as its MQTT status would
+        self.fleet.update(printer_id, status="paused")
+        return True
+
+
+def make_fleet(printers):
+    return FleetState(
+        {"id": f"printer_{i}", "name": f"Bambu X1 #{i}", "model": "X1 Carbon",
+         "status": "printing" if i % 5 else "available"}
+        for i in range(1, printers + 1)
+    )
+
+
+def main():
+    printers = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    round_trip = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1e3
+    parallelism = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    timeout = 1.0
+
+    fleet = make_fleet(printers)
+    control = PrinterCommands(fleet, Scheduler(fleet), parallelism=parallelism, timeout=timeout)
+    control.attach_mqtt(FakeMqtt(fleet, round_trip, unreachable=("printer_7", "printer_13"), hanging=("printer_22",)))
+    started = time.perf_counter()
+    results = [control.run("pause", printer_id) for printer_id in fleet.ids()]
+    sequential = time.perf_counter() - started
+    print(f"pause on {printers} printers one at a time: {sequential:.2f} s "
+          f"({sum(r.outcome == 'done' for r in results)} paused)")
+
+    fleet = make_fleet(printers)
+    control = PrinterCommands(fleet, Scheduler(fleet), parallelism=parallelism, timeout=timeout)
+    control.attach_mqtt(FakeMqtt(fleet, round_trip, unreachable=("printer_7", "printer_13"), hanging=("printer_22",)))
+    reports = []
+
+    def report(message):
+        reports.append((time.perf_counter() - started, message["text"].splitlines()[0]))
+
+    started = time.perf_counter()
+    summary = run_batch("pause", fleet.ids(), report=report, interval=0.1, commands=control)
+    batched = time.perf_counter() - started
+    print(f"pause on {printers} printers as a batch ({parallelism} at once): {batched:.2f} s "
+          f"({sequential / batched:.1f}x faster)")
+    for at, line in reports:
+        print(f"  {at:5.2f} s  {line}")
+    print("summary:")
+    for line in summary["text"].splitlines():
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
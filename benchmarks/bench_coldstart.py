@@ -0,0 +1,107 @@
+# benchmarks/bench_coldstart.py
+"""
+Cold-start benchmark for the Vercel functions
+Each run is a fresh interpreter under `python -X importtime` that imports one
+api/ module, then answers one request through its handler class (no socket).
+Reports the median import time, first response latency, whole-process wall
+time and how many modules the import left loaded, plus the slowest imports
+from the -X importtime log.
+
+Run: python benchmarks/bench_coldstart.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the endpoint, then feeds one request straight into handler.do_POST
+CHILD = r"""
+import io, importlib.util, json, sys, time
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("endpoint", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+t1 = time.perf_counter()
+loaded = len(sys.modules)
+body = sys.argv[2].encode()
+h = module.handler.__new__(module.handler)
+h.rfile, h.wfile = io.BytesIO(body), io.BytesIO()
+h.headers = {"Content-Length": str(len(body))}
+h.request_version, h.requestline, h.command = "HTTP/1.1", "POST / HTTP/1.1", "POST"
+h.client_address = ("127.0.0.1", 0)
+h.log_message = lambda *args: None
+h.do_POST()
+t2 = time.perf_counter()
+assert b" 200 " in h.wfile.getvalue().split(b"\r\n", 1)[0], h.wfile.getvalue()[:200]
+print(json.dumps({"import_ms": (t1 - t0) * 1e3, "first_ms": (t2 - t1) * 1e3, "modules": loaded}))
+"""
+
+REQUESTS = {
+    "api/print.py": urllib.parse.urlencode({
+        "channel_name": "3d-printer-automation-test",
+        "user_name": "bench",
+        "text": "",
+    }),
+    "api/actions.py": urllib.parse.urlencode({
+        "payload": json.dumps({
+            "type": "block_actions",
+            "user": {"id": "U1", "name": "bench"},
+            "actions": [{"action_id": "printer_action_printer_2", "value": "printer_2"}],
+        }),
+    }),
+}
+
+
+def parse_importtime(stderr):
+    """{module: self time in us} from an -X importtime log"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def run_once(endpoint, body):
+    env = dict(os.environ)
+    for name in ("SLACK_DEFERRED_RESPONSES", "SLACK_SIGNING_SECRET", "PRINTFARM_DB"):
+        env.pop(name, None)
+    env["SLACK_ALLOW_UNSIGNED"] = "1"
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, os.path.join(ROOT, endpoint), body],
+        capture_output=True, text=True, check=True, cwd=ROOT, env=env)
+    wall_ms = (time.perf_counter() - start) * 1e3
+    timings = json.loads(result.stdout)
+    timings["wall_ms"] = wall_ms
+    return timings, parse_importtime(result.stderr)
+
+
+def main(runs=15):
+    print(f"{'endpoint':>15} {'import (ms)':>12} {'first response (ms)':>20} {'process (ms)':>13} {'modules':>8}")
+    slowest = {}
+    for endpoint, body in REQUESTS.items():
+        samples = []
+        for _ in range(runs):
+            timings, modules = run_once(endpoint, body)
+            samples.append(timings)
+            for name, us in modules.items():
+                slowest.setdefault(name, []).append(us)
+        median = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+        print(f"{endpoint:>15} {median['import_ms']:>12.1f} {median['first_ms']:>20.2f} {median['wall_ms']:>13.1f} {median['modules']:>8.0f}")
+
+    print("\nslowest imports (median self time across runs)")
+    ranked = sorted(((statistics.median(v), k) for k, v in slowest.items()), reverse=True)
+    for us, name in ranked[:12]:
+        print(f"  {us / 1e3:>6.2f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
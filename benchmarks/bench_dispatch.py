@@ -0,0 +1,77 @@
+# benchmarks/bench_dispatch.py
+"""
+Microbenchmark: action routing cost
+Compares the original if/elif + startswith + str.replace chain with the
+ActionRouter table, over a mix of exact and prefixed action ids that grows
+with the number of registered actions
+
+Run: python benchmarks/bench_dispatch.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm.dispatch import ActionRouter
+
+EXACT = ["refresh_status", "page_prev", "page_next", "view_queue", "cancel_print"]
+PREFIXES = ["printer_action_", "confirm_print_", "pause_print_", "cancel_print_", "live_feed_"]
+
+
+def noop(*args):
+    return args
+
+
+def make_chain(exact, prefixes):
+    """Generate the shape of the original handler: one if/elif branch per action"""
+    lines = ["def chain(action_id):", "    if False:", "        pass"]
+    for name in exact:
+        lines += [f"    elif action_id == {name!r}:", "        return noop(action_id)"]
+    for prefix in prefixes:
+        lines += [
+            f"    elif action_id.startswith({prefix!r}):",
+            f"        return noop(action_id.replace({prefix!r}, ''))",
+        ]
+    lines += ["    else:", "        return noop(action_id)"]
+    namespace = {"noop": noop}
+    exec("\n".join(lines), namespace)
+    return namespace["chain"]
+
+
+def make_router(exact, prefixes):
+    router = ActionRouter()
+    router.action(*exact)(noop)
+    for prefix in prefixes:
+        router.prefix(prefix)(noop)
+    router.fallback(noop)
+    return router
+
+
+def main():
+    print(f"{'actions':>8} {'chain (ns)':>11} {'router (ns)':>12}")
+    for extra in (0, 20, 100):
+        exact = EXACT + [f"extra_action_{i}" for i in range(extra)]
+        prefixes = PREFIXES + [f"extra_prefix_{i}_" for i in range(extra)]
+        ids = [f"{p}printer_{n}" for p in PREFIXES for n in range(1, 7)] + EXACT * 2
+        chain = make_chain(exact, prefixes)
+        router = make_router(exact, prefixes)
+
+        def run_chain():
+            for action_id in ids:
+                chain(action_id)
+
+        def run_router():
+            for action_id in ids:
+                handler, suffix = router.resolve(action_id)
+                handler(action_id) if suffix is None else handler(action_id, suffix)
+
+        number = 2000
+        chain_ns = min(timeit.repeat(run_chain, number=number, repeat=5)) / number / len(ids) * 1e9
+        router_ns = min(timeit.repeat(run_router, number=number, repeat=5)) / number / len(ids) * 1e9
+        print(f"{len(exact) + len(prefixes):>8} {chain_ns:>11.0f} {router_ns:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
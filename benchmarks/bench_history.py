@@ -0,0 +1,119 @@
+# benchmarks/bench_history.py
+"""
+Benchmark: /print stats over a year of print history
+Simulates a year of jobs on a fleet (start, the odd pause/resume, finish or
+error) through real fleet changes, then times the week/month/year reports,
+the full Slack message and reloading the saved columns, and compares the
+report with a plain loop over row dicts
+
+Run: python benchmarks/bench_history.py [printers] [jobs per printer per day]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm.history import COLUMNS, DAY, ERROR, START, History, stats_message
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+USERS = [f"@user{i}" for i in range(40)]
+CLIENTS = ["internal", "external"]
+
+
+def simulate(history_path, printers=60, per_day=8, days=365, seed=11):
+    rng = random.Random(seed)
+    now = [0.0]
+    fleet = FleetState(
+        {"id": f"printer_{i}", "name": f"Bambu X1 #{i}", "model": "X1 Carbon"}
+        for i in range(1, printers + 1)
+    )
+    scheduler = Scheduler(fleet, clock=lambda: now[0])
+    history = History(fleet, scheduler, path=history_path, clock=lambda: now[0])
+
+    # (time, printer, step) for every state change, replayed in time order
+    steps = []
+    for printer in fleet.ids():
+        t = rng.uniform(0, 3600)
+        while t < days * DAY:
+            length = rng.expovariate(per_day / DAY * 1.3)
+            steps.append((t, printer, ("start", rng.choice(USERS), rng.choice(CLIENTS))))
+            if rng.random() < 0.1:
+                steps.append((t + length / 2, printer, ("paused",)))
+                steps.append((t + length / 2 + 600, printer, ("printing",)))
+                length += 600
+            steps.append((t + length, printer, ("error",) if rng.random() < 0.03 else ("available",)))
+            t += length + rng.expovariate(per_day / DAY * 4)
+    steps.sort()
+
+    for t, printer, step in steps:
+        now[0] = t
+        if step[0] == "start":
+            scheduler.submit("part.3mf", client_type=step[2], submitted_by=step[1], printer_id=printer)
+        elif step[0] == "error":
+            fleet.update(printer, status="error")
+            fleet.update(printer, status="available")   # cleared by the operator
+        else:
+            fleet.update(printer, status=step[0])
+    return fleet, history, now[0]
+
+
+def naive_report(history, since, until):
+    """Per-printer totals from a loop over row dicts, as a list-of-events log would do it"""
+    rows = [
+        {"time": t, "event": event, "printer": history.key_codes.values[key][0], "seconds": seconds}
+        for t, event, key, seconds in zip(*(getattr(history, name) for name, _ in COLUMNS))
+    ]
+    started = time.perf_counter()
+    totals = {}
+    for row in rows:
+        if since <= row["time"] < until:
+            busy, jobs, errors = totals.get(row["printer"], (0.0, 0, 0))
+            totals[row["printer"]] = (busy + min(row["seconds"], row["time"] - since),
+                                      jobs + (row["event"] == START), errors + (row["event"] == ERROR))
+    return time.perf_counter() - started
+
+
+def timed(fn, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    printers = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    per_day = float(sys.argv[2]) if len(sys.argv) > 2 else 8
+    with tempfile.TemporaryDirectory() as path:
+        started = time.perf_counter()
+        fleet, history, end = simulate(path, printers, per_day)
+        elapsed = time.perf_counter() - started
+        size = sum(getattr(history, name).itemsize * len(history) for name, _ in COLUMNS)
+        print(f"{len(history)} events from {printers} printers over a year, recorded in {elapsed:.1f} s "
+              f"({size / len(history):.0f} bytes/event, {size / 2**20:.1f} MiB)")
+        history.close()
+
+        for label, days in (("week", 7), ("month", 30), ("year", 365)):
+            seconds, stats = timed(lambda: history.report(end - days * DAY, end))
+            print(f"  report over a {label:<5} {seconds * 1e3:>8.1f} ms "
+                  f"({len(stats.printers)} printers, {len(stats.users)} users)")
+        seconds, _ = timed(lambda: stats_message(365, None, fleet, history))
+        print(f"  /print stats 365     {seconds * 1e3:>8.1f} ms (whole message)")
+        seconds, _ = timed(lambda: history.report(end - 365 * DAY, end, {"printer_1", "printer_2"}))
+        print(f"  one tenant, year     {seconds * 1e3:>8.1f} ms")
+        seconds = naive_report(history, end - 365 * DAY, end)
+        print(f"  row-dict loop, year  {seconds * 1e3:>8.1f} ms (per printer only, for comparison)")
+
+        seconds, reloaded = timed(lambda: History(FleetState(), Scheduler(FleetState()), path=path), rounds=1)
+        print(f"  reload from disk     {seconds * 1e3:>8.1f} ms ({len(reloaded)} events)")
+        reloaded.close()
+
+
+if __name__ == "__main__":
+    main()
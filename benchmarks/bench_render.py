@@ -0,0 +1,84 @@
+# benchmarks/bench_render.py
+"""
+Microbenchmark: dashboard render after one printer's progress changes
+Compares a full rebuild of the first page (every section block +
+json.dumps) with the incremental path that only regenerates the changed
+printer's block
+
+Run: python benchmarks/bench_render.py
+"""
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm import dashboard
+from printfarm.state import FleetState
+
+
+def make_fleet(size):
+    statuses = ("printing", "available", "offline", "paused")
+    return FleetState(
+        {
+            "id": f"printer_{i}",
+            "name": f"Bambu X1 #{i}",
+            "model": "X1 Carbon",
+            "status": statuses[i % len(statuses)],
+            "ip": f"10.0.{i // 250}.{i % 250}",
+            "current_job": "benchy_test.3mf",
+            "progress": i % 100,
+            "time_remaining": 90,
+            "started_by": "@bench",
+        }
+        for i in range(1, size + 1)
+    )
+
+
+def full_rebuild(fleet):
+    """First dashboard page built from scratch, as render_page lays it out"""
+    printers = list(fleet)
+    pages = max(1, -(-len(printers) // dashboard.PAGE_SIZE))
+    blocks = list(dashboard.HEADER_BLOCKS)
+    if pages > 1:
+        blocks.append({
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": f"Page 1 of {pages} · {len(printers)} printers"}],
+        })
+    for printer in printers[:dashboard.PAGE_SIZE]:
+        blocks.append(dashboard.build_printer_block(printer))
+        blocks.append(dashboard.DIVIDER_BLOCK)
+    blocks.append(dashboard.build_footer_block(dashboard.DEFAULT_QUERY, 1, pages))
+    blocks.append(dashboard.create_timestamp_block())
+    return json.dumps({"response_type": "ephemeral", "blocks": blocks}).encode()
+
+
+def main(sizes=(10, 100, 1000)):
+    print(f"{'printers':>8} {'full (us)':>12} {'incremental (us)':>17} {'speedup':>8}")
+    for size in sizes:
+        fleet = make_fleet(size)
+        dashboard.render_dashboard_json(fleet)
+        tick = iter(range(10 ** 9))
+
+        def one_change():
+            fleet.update("printer_1", progress=next(tick) % 100)
+
+        def full():
+            one_change()
+            full_rebuild(fleet)
+
+        def incremental():
+            one_change()
+            dashboard.render_dashboard_json(fleet)
+
+        assert full_rebuild(fleet) == dashboard.render_dashboard_json(fleet)
+        number = max(10, 20000 // size)
+        full_us = min(timeit.repeat(full, number=number, repeat=5)) / number * 1e6
+        incr_us = min(timeit.repeat(incremental, number=number, repeat=5)) / number * 1e6
+        print(f"{size:>8} {full_us:>12.1f} {incr_us:>17.1f} {full_us / incr_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
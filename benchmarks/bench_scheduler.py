@@ -0,0 +1,89 @@
+# benchmarks/bench_scheduler.py
+"""
+Simulation benchmark: replay a day of job submissions through the scheduler
+Jobs arrive faster than 60 printers can print them, so thousands wait in the
+queue; reports the real time spent in scheduler operations and the simulated
+waits per client type
+
+Run: python benchmarks/bench_scheduler.py [jobs] [printers]
+"""
+
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+DAY = 24 * 3600
+
+
+def simulate(jobs=8000, printers=60, seed=7):
+    rng = random.Random(seed)
+    now = [0.0]
+    fleet = FleetState(
+        {"id": f"printer_{i}", "name": f"Bambu X1 #{i}", "model": "X1 Carbon"}
+        for i in range(1, printers + 1)
+    )
+    scheduler = Scheduler(fleet, clock=lambda: now[0])
+
+    # Simulated event queue: (time, order, kind, data)
+    events = []
+    order = iter(range(10 ** 9))
+    for _ in range(jobs):
+        heapq.heappush(events, (rng.uniform(0, DAY), next(order), "submit", None))
+
+    def on_change(old, new):
+        if new is not None and new.status == "printing" and (old is None or old.status != "printing"):
+            job = scheduler.running(new.id)
+            heapq.heappush(events, (now[0] + job.duration * 60, next(order), "finish", new.id))
+
+    fleet.subscribe(on_change)
+
+    waits = {"external": [], "internal": []}
+    submitted = []
+    max_depth = 0
+    ops = 0
+    busy = 0.0
+    while events:
+        now[0], _, kind, data = heapq.heappop(events)
+        started = time.perf_counter()
+        if kind == "submit":
+            deadline = now[0] + rng.uniform(3600, 3 * DAY) if rng.random() < 0.4 else None
+            pinned = f"printer_{rng.randint(1, printers)}" if rng.random() < 0.2 else None
+            job = scheduler.submit(
+                f"part_{rng.randint(1, 500)}.3mf",
+                client_type="external" if rng.random() < 0.3 else "internal",
+                deadline=deadline,
+                duration=rng.randint(20, 600),
+                submitted_by=f"@user{rng.randint(1, 40)}",
+                printer_id=pinned,
+            )
+            submitted.append(job)
+            if rng.random() < 0.02:
+                scheduler.cancel(submitted[rng.randrange(len(submitted))].id)
+        else:
+            fleet.update(data, status="available", progress=100, time_remaining=0)
+        busy += time.perf_counter() - started
+        ops += 1
+        max_depth = max(max_depth, len(scheduler))
+
+    for job in submitted:
+        if job.started_at is not None:
+            waits[job.client_type].append(job.started_at - job.submitted_at)
+
+    print(f"jobs={jobs} printers={printers} events={ops} max queue depth={max_depth}")
+    print(f"scheduler time: {busy * 1e3:.1f} ms total, {busy / ops * 1e6:.1f} us per operation")
+    for client_type, values in waits.items():
+        values.sort()
+        if values:
+            print(f"  {client_type:>8}: {len(values)} started, median wait "
+                  f"{values[len(values) // 2] / 3600:.1f} h, p95 {values[int(len(values) * 0.95)] / 3600:.1f} h")
+
+
+if __name__ == "__main__":
+    simulate(*(int(arg) for arg in sys.argv[1:3]))
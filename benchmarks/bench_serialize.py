@@ -0,0 +1,89 @@
+# benchmarks/bench_serialize.py
+"""
+Microbenchmark: response serialization
+Compares json.dumps(response).encode() over the whole block tree with the
+spliced pre-encoded fragments the endpoints now send, for 4-, 50- and
+500-printer dashboards (a page shows at most PAGE_SIZE printers) and for the
+start print dialog. Both sides produce identical bytes.
+
+"after change" is the first render after a printer update (render cache
+miss, other printers' blocks reused); "unchanged" is a repeat /print.
+
+Run: python benchmarks/bench_serialize.py
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from printfarm import dashboard, fragments
+from printfarm.state import FleetState
+
+
+def make_fleet(size):
+    statuses = ("printing", "available", "offline", "paused")
+    return FleetState(
+        {
+            "id": f"printer_{i}",
+            "name": f"Bambu X1 #{i}",
+            "model": "X1 Carbon",
+            "status": statuses[i % len(statuses)],
+            "ip": f"10.0.{i // 250}.{i % 250}",
+            "current_job": "benchy_test.3mf",
+            "progress": i % 100,
+            "time_remaining": 90,
+            "started_by": "@bench",
+        }
+        for i in range(1, size + 1)
+    )
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(sizes=(4, 50, 500)):
+    print(f"{'printers':>8} {'json.dumps (us)':>16} {'after change (us)':>18} {'unchanged (us)':>15}")
+    for size in sizes:
+        fleet = make_fleet(size)
+        tick = iter(range(10 ** 9))
+
+        def change():
+            fleet.update("printer_1", progress=next(tick) % 100)
+
+        def baseline():
+            change()
+            return json.dumps(dashboard.create_printer_dashboard(fleet)).encode()
+
+        def after_change():
+            change()
+            return dashboard.render_dashboard_json(fleet)
+
+        def unchanged():
+            return dashboard.render_dashboard_json(fleet)
+
+        # Same bytes (up to the "Last updated" minute, which may tick over in between)
+        ours = after_change().partition(b"Last updated")[0]
+        assert ours == json.dumps(dashboard.create_printer_dashboard(fleet)).encode().partition(b"Last updated")[0]
+        number = 2000
+        print(f"{size:>8} {per_call_us(baseline, number):>16.1f} "
+              f"{per_call_us(after_change, number):>18.1f} {per_call_us(unchanged, number):>15.1f}")
+
+    spec = importlib.util.spec_from_file_location("api_actions", os.path.join(ROOT, "api", "actions.py"))
+    actions = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(actions)
+    dialog = actions.create_start_print_dialog("printer_1")
+    plain = dict(dialog, blocks=[b.value if isinstance(b, fragments.Fragment) else b for b in dialog["blocks"]])
+    assert fragments.dumps(dialog) == json.dumps(plain).encode()
+    old = per_call_us(lambda: json.dumps(plain).encode(), 20000)
+    new = per_call_us(lambda: fragments.dumps(actions.create_start_print_dialog("printer_1")), 20000)
+    print(f"\nstart dialog: json.dumps {old:.1f} us, fragments (incl. building it) {new:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
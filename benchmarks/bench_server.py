@@ -0,0 +1,174 @@
+# benchmarks/bench_server.py
+"""
+Benchmark: one warm ASGI process vs a server per endpoint
+Replays the loadtest mix against api/print.py and api/actions.py twice.
+First each endpoint gets its own ThreadingHTTPServer, as the Vercel
+functions do; that is HTTP/1.0, with a new connection per request. Then
+both are served by printfarm/server.py from one process, with keep-alive.
+Then it times outbound Web API calls to a local fake Slack through the
+connection pool and through a fresh urlopen per call, counting the
+connections each opens
+
+Run: python benchmarks/bench_server.py [concurrency] [requests per endpoint]
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import SCENARIOS, LoadTestServer, fresh, load_endpoint, percentile
+
+from printfarm import httppool, webapi
+from printfarm.asgi import PrintfarmApp
+from printfarm.httppool import ConnectionPool
+from printfarm.server import Server
+
+
+def drive(port, path, bodies, total, concurrency):
+    """POST `total` requests from `concurrency` clients that keep their connection when the server allows"""
+    latencies, errors, lock = [], [], threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = fresh(bodies[i % len(bodies)])
+            started = time.perf_counter()
+            conn.request("POST", path, body=body, headers={"Content-Type": "application/x-www-form-urlencoded"})
+            resp = conn.getresponse()
+            resp.read()
+            mine.append(time.perf_counter() - started)
+            if resp.status != 200:
+                errors.append(resp.status)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors, time.perf_counter() - started
+
+
+def line(label, latencies, errors, elapsed):
+    print(f"  {label:<26} p50 {percentile(latencies, 50) * 1e3:6.2f} ms  p99 {percentile(latencies, 99) * 1e3:6.2f} ms  "
+          f"{len(latencies) / elapsed:6.0f} req/s  {len(errors)} errors")
+
+
+def per_endpoint(concurrency, total):
+    for name, scenarios in SCENARIOS.items():
+        server = LoadTestServer(("127.0.0.1", 0), load_endpoint(name).handler)
+        server.RequestHandlerClass.log_message = lambda *args: None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        bodies = [body for _, body in scenarios]
+        drive(server.server_port, "/", bodies, 50, concurrency)
+        line(f"{name} (own server)", *drive(server.server_port, "/", bodies, total, concurrency))
+        server.shutdown()
+        server.server_close()
+
+
+def one_process(concurrency, total):
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+    server = Server(PrintfarmApp(workers=concurrency, services="none"), port=0, grace=2.0)
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve(stop),), daemon=True)
+    thread.start()
+    while server._server is None:
+        time.sleep(0.01)
+    for name, scenarios in SCENARIOS.items():
+        bodies = [body for _, body in scenarios]
+        drive(server.port, f"/api/{name}", bodies, 50, concurrency)
+        line(f"{name} (one process)", *drive(server.port, f"/api/{name}", bodies, total, concurrency))
+    print(f"  one process: {server.requests} requests over {server.connections} connections")
+    loop.call_soon_threadsafe(stop.set)
+    thread.join()
+
+
+class FakeSlack(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True   # headers and body go out in separate writes
+    connections = 0
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"ok": True, "channel": "C1", "ts": "1.0"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def urlopen_call(url, payload):
+    """A Web API call the way it was made before the pool: a new connection every time"""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": "application/json; charset=utf-8"})
+    with urllib.request.urlopen(request, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def outbound(calls=500):
+    server = LoadTestServer(("127.0.0.1", 0), FakeSlack)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/api/"
+    payload = {"channel": "C1", "text": "3D Printer Farm Status"}
+
+    FakeSlack.connections = 0
+    started = time.perf_counter()
+    for _ in range(calls):
+        urlopen_call(base + "chat.update", payload)
+    elapsed = time.perf_counter() - started
+    print(f"  urlopen per call   {elapsed / calls * 1e3:6.2f} ms/call, {FakeSlack.connections} connections")
+
+    FakeSlack.connections = 0
+    pool = ConnectionPool()
+    httppool.POOL = pool   # webapi.call looks the pool up on every call
+    started = time.perf_counter()
+    for _ in range(calls):
+        webapi.call("chat.update", payload, token="xoxb-bench", base_url=base)
+    elapsed = time.perf_counter() - started
+    print(f"  connection pool    {elapsed / calls * 1e3:6.2f} ms/call, {FakeSlack.connections} connections "
+          f"({pool.reused} reused; each saved connection is a TLS handshake against slack.com)")
+    pool.close()
+    server.shutdown()
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    os.environ.pop("SLACK_SIGNING_SECRET", None)
+    os.environ["SLACK_ALLOW_UNSIGNED"] = "1"
+    os.environ.pop("SLACK_DEFERRED_RESPONSES", None)
+
+    print(f"{total} requests per endpoint at concurrency {concurrency}")
+    per_endpoint(concurrency, total)
+    one_process(concurrency, total)
+    print("outbound Web API calls to a local fake Slack")
+    outbound()
+
+
+if __name__ == "__main__":
+    main()
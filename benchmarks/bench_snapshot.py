@@ -0,0 +1,168 @@
+# benchmarks/bench_snapshot.py
+"""
+Benchmark: many viewers on the camera snapshot proxy
+Starts a fake MJPEG camera per printer (counting the connections it gets)
+and serves api/snapshot.py locally, then has many viewers fetch snapshots
+concurrently and a few follow the re-served stream. Reports snapshot
+latency, how many frames viewers got, and how many camera connections that
+took (one per printer, however many viewers)
+
+Run: python benchmarks/bench_snapshot.py [viewers] [requests] [printers]
+"""
+
+import http.client
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import LoadTestServer, load_endpoint, percentile
+
+from printfarm import camera
+
+FPS = 15
+
+# Snapshot links are signed; the benchmark signs its own
+PUBLIC_URL = "http://bench.local"
+SECRET = "bench-signing-secret"
+
+
+def snapshot_path(printer_id, stream=False):
+    """The signed /api/snapshot path for a printer"""
+    return camera.snapshot_url(printer_id, stream=stream).removeprefix(PUBLIC_URL)
+
+
+class FakeCamera(ThreadingHTTPServer):
+    """MJPEG server sending numbered fake frames at FPS"""
+
+    daemon_threads = True
+
+    def __init__(self, frame_bytes=40_000):
+        self.connections = 0
+        self.frames_sent = 0
+        self.frame_bytes = frame_bytes
+        super().__init__(("127.0.0.1", 0), FakeCameraHandler)
+
+
+class FakeCameraHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.connections += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.end_headers()
+        n = 0
+        try:
+            while True:
+                n += 1
+                jpeg = b"\xff\xd8" + str(n).encode().ljust(server.frame_bytes - 4, b".") + b"\xff\xd9"
+                self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                 + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+                self.wfile.flush()
+                server.frames_sent += 1
+                time.sleep(1 / FPS)
+        except OSError:
+            pass
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    return conn, resp
+
+
+def snapshots(port, printers, total, viewers):
+    """Concurrent snapshot GETs round-robin over the printers; returns (latencies, errors, elapsed)"""
+    latencies, errors, lock = [], [], threading.Lock()
+    counter = iter(range(total))
+    paths = [snapshot_path(printer_id) for printer_id in printers]
+
+    def worker():
+        mine = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            started = time.perf_counter()
+            conn, resp = get(port, paths[i % len(paths)])
+            body = resp.read()
+            conn.close()
+            mine.append(time.perf_counter() - started)
+            if resp.status != 200 or not body.startswith(b"\xff\xd8"):
+                errors.append(resp.status)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(viewers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors, time.perf_counter() - started
+
+
+def follow_stream(port, printer_id, seconds, counts, i):
+    conn, resp = get(port, snapshot_path(printer_id, stream=True))
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        line = resp.fp.readline()
+        if not line:
+            break
+        if line.startswith(b"--printfarmframe"):
+            counts[i] += 1
+    conn.close()
+
+
+def main():
+    viewers = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    printer_count = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    os.environ["PRINTFARM_PUBLIC_URL"] = PUBLIC_URL
+    os.environ["SLACK_SIGNING_SECRET"] = SECRET
+
+    module = load_endpoint("snapshot")
+    cameras = {}
+    for printer in list(module.CAMERAS.fleet)[:printer_count]:
+        cameras[printer.id] = FakeCamera()
+        threading.Thread(target=cameras[printer.id].serve_forever, daemon=True).start()
+        module.CAMERAS.fleet.update(printer.id, ip=f"127.0.0.1:{cameras[printer.id].server_port}")
+    printers = list(cameras)
+
+    server = LoadTestServer(("127.0.0.1", 0), module.handler)
+    server.RequestHandlerClass.log_message = lambda *args: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies, errors, elapsed = snapshots(server.server_port, printers, total, viewers)
+    print(f"{total} snapshots of {len(printers)} printers from {viewers} viewers in {elapsed:.2f} s "
+          f"({total / elapsed:.0f}/s), {len(errors)} errors")
+    print(f"  latency p50 {percentile(latencies, 50) * 1e3:.2f} ms, p99 {percentile(latencies, 99) * 1e3:.2f} ms, "
+          f"max {latencies[-1] * 1e3:.0f} ms (the first waits for the camera)")
+
+    streams = viewers // 2
+    counts = [0] * streams
+    threads = [threading.Thread(target=follow_stream, args=(server.server_port, printers[i % len(printers)], 3.0, counts, i))
+               for i in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"  {streams} stream viewers for 3 s got {min(counts)}-{max(counts)} frames each (camera sends {FPS}/s)")
+
+    for printer_id, fake in cameras.items():
+        feed = module.CAMERAS.feed(printer_id)
+        print(f"  {printer_id}: {fake.connections} camera connection(s), {fake.frames_sent} frames read, "
+              f"{feed.served} handed to viewers")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
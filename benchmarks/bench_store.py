@@ -0,0 +1,97 @@
+# benchmarks/bench_store.py
+"""
+Benchmark: sustained progress-update writes into the SQLite store
+Drives fleet progress updates as fast as possible for a few seconds while a
+reader thread keeps loading printers, and compares group commit with one
+commit per update
+
+Run: python benchmarks/bench_store.py [seconds] [printers]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printfarm.state import PRINTER_FIELDS, FleetState
+from printfarm.store import SCHEMA, UPSERT_PRINTER, Store
+
+
+def make_fleet(size):
+    return FleetState(
+        {"id": f"printer_{i}", "name": f"Bambu X1 #{i}", "model": "X1 Carbon", "status": "printing"}
+        for i in range(1, size + 1)
+    )
+
+
+def reader_loop(store, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        store.load_printers()
+        latencies.append(time.perf_counter() - started)
+
+
+def group_commit(path, seconds, size):
+    fleet = make_fleet(size)
+    store = Store(path)
+    fleet.subscribe(lambda old, new: store.record_printer(new))
+
+    stop = threading.Event()
+    latencies = []
+    reader = threading.Thread(target=reader_loop, args=(store, stop, latencies))
+    reader.start()
+
+    updates = 0
+    deadline = time.perf_counter() + seconds
+    ids = fleet.ids()
+    while time.perf_counter() < deadline:
+        fleet.update(ids[updates % size], progress=updates % 100, time_remaining=updates % 500)
+        updates += 1
+    started = time.perf_counter()
+    store.flush()
+    elapsed = seconds + time.perf_counter() - started
+    stop.set()
+    reader.join()
+    store.close()
+
+    latencies.sort()
+    print(f"group commit: {updates / elapsed:,.0f} updates/s, {store.commits} commits, "
+          f"{store.rows_written:,} rows; reader p50 {latencies[len(latencies) // 2] * 1e3:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.2f} ms over {len(latencies)} reads")
+
+
+def commit_per_update(path, seconds, size):
+    fleet = make_fleet(size)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+
+    def write(old, new):
+        conn.execute("BEGIN")
+        conn.execute(UPSERT_PRINTER, tuple(getattr(new, f) for f in PRINTER_FIELDS) + (time.time(),))
+        conn.execute("COMMIT")
+
+    fleet.subscribe(write)
+    updates = 0
+    deadline = time.perf_counter() + seconds
+    ids = fleet.ids()
+    while time.perf_counter() < deadline:
+        fleet.update(ids[updates % size], progress=updates % 100, time_remaining=updates % 500)
+        updates += 1
+    conn.close()
+    print(f"commit per update: {updates / seconds:,.0f} updates/s")
+
+
+def main(seconds=3, size=60):
+    with tempfile.TemporaryDirectory() as tmp:
+        group_commit(os.path.join(tmp, "group.db"), seconds, size)
+        commit_per_update(os.path.join(tmp, "single.db"), seconds, size)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
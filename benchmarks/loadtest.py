@@ -0,0 +1,296 @@
+# benchmarks/loadtest.py
+"""
+Load test for both Slack endpoints
+Serves api/print.py and api/actions.py from local ThreadingHTTPServers and
+replays a mix of realistic /print slash commands and block_actions
+interactions at a fixed concurrency. Reports p50/p95/p99 latency and
+throughput per endpoint, and server-side allocation per request (a separate
+tracemalloc pass that calls the handler directly, so the client does not
+count).
+
+Results can be saved as JSON and compared with an earlier run:
+
+Run: python benchmarks/loadtest.py [--concurrency 16] [--requests 2000]
+                                   [--output new.json] [--compare old.json]
+"""
+
+import argparse
+import hashlib
+import hmac
+import http.client
+import importlib.util
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+CHANNEL = "3d-printer-automation-test"
+
+# Every request gets its own trigger_id, or the endpoints would answer repeats
+# from the duplicate-delivery store instead of handling them
+TRIGGER_ID = "13345224609.738474920.8088930838d88f008e0"
+_triggers = itertools.count(1)
+
+
+def command(text):
+    return urllib.parse.urlencode({
+        "token": "gIkuvaNzQIHg97ATvDxqgjtO",
+        "team_id": "T0001",
+        "team_domain": "example",
+        "channel_id": "C2147483705",
+        "channel_name": CHANNEL,
+        "user_id": "U2147483697",
+        "user_name": "loadtest",
+        "command": "/print",
+        "text": text,
+        "api_app_id": "A123456",
+        "response_url": "https://hooks.slack.com/commands/1234/5678",
+        "trigger_id": TRIGGER_ID,
+    }).encode()
+
+
+def interaction(action_id, value=""):
+    return urllib.parse.urlencode({"payload": json.dumps({
+        "type": "block_actions",
+        "user": {"id": "U2147483697", "username": "loadtest", "name": "loadtest", "team_id": "T0001"},
+        "api_app_id": "A123456",
+        "token": "gIkuvaNzQIHg97ATvDxqgjtO",
+        "container": {"type": "message", "message_ts": "1548261231.000200", "channel_id": "C2147483705"},
+        "trigger_id": TRIGGER_ID,
+        "team": {"id": "T0001", "domain": "example"},
+        "channel": {"id": "C2147483705", "name": CHANNEL},
+        "response_url": "https://hooks.slack.com/actions/T0001/1234/5678",
+        "actions": [{
+            "action_id": action_id,
+            "block_id": "=qXel",
+            "value": value,
+            "type": "button",
+            "action_ts": "1548426417.840180",
+        }],
+    })}).encode()
+
+
+# endpoint -> list of (name, body); the mix is replayed round-robin
+SCENARIOS = {
+    "print": [
+        ("dashboard", command("")),
+        ("filtered", command("status:printing")),
+        ("page 2", command("page:2")),
+        ("summary", command("summary")),
+    ],
+    "actions": [
+        ("refresh", interaction("refresh_status", "")),
+        ("start dialog", interaction("printer_action_printer_1", "printer_1")),
+        ("progress", interaction("printer_action_printer_2", "printer_2")),
+        ("queue", interaction("view_queue")),
+    ],
+}
+
+
+class LoadTestServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 turns bursts into 1 s SYN retries
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def load_endpoint(name):
+    spec = importlib.util.spec_from_file_location(f"api_{name}", os.path.join(ROOT, "api", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fresh(body):
+    """The body with a trigger_id no earlier request used"""
+    return body.replace(TRIGGER_ID.encode(), f"{next(_triggers)}.{os.getpid()}.loadtest".encode())
+
+
+def sign(body, secret):
+    if not secret:
+        return {}
+    timestamp = str(int(time.time()))
+    signature = "v0=" + hmac.new(secret.encode(), b"v0:" + timestamp.encode() + b":" + body,
+                                 hashlib.sha256).hexdigest()
+    return {"X-Slack-Request-Timestamp": timestamp, "X-Slack-Signature": signature}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def drive(port, bodies, total, concurrency, secret):
+    """Send `total` requests from `concurrency` threads; returns (latencies in s, errors, elapsed)"""
+    latencies = []
+    errors = []
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        mine = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = fresh(bodies[i % len(bodies)])
+            headers = {"Content-Type": "application/x-www-form-urlencoded"}
+            headers.update(sign(body, secret))
+            start = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                conn.request("POST", "/", body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                conn.close()
+                if resp.status != 200:
+                    errors.append(resp.status)
+            except OSError as e:
+                errors.append(type(e).__name__)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def allocations(module, template, rounds=50):
+    """Median peak bytes traced while the handler answers one request in-process"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(rounds):
+            body = fresh(template)
+            headers = {"Content-Length": str(len(body))}
+            headers.update(sign(body, os.environ.get("SLACK_SIGNING_SECRET", "")))
+            h = module.handler.__new__(module.handler)
+            h.rfile, h.wfile = io.BytesIO(body), io.BytesIO()
+            h.headers = headers
+            h.request_version, h.requestline, h.command = "HTTP/1.1", "POST / HTTP/1.1", "POST"
+            h.client_address = ("127.0.0.1", 0)
+            h.log_message = lambda *args: None
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            h.do_POST()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(concurrency, total, secret, warmup=50):
+    if secret:
+        os.environ["SLACK_SIGNING_SECRET"] = secret
+    else:
+        os.environ.pop("SLACK_SIGNING_SECRET", None)
+        os.environ["SLACK_ALLOW_UNSIGNED"] = "1"
+    os.environ.pop("SLACK_DEFERRED_RESPONSES", None)
+
+    results = {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "concurrency": concurrency,
+        "requests": total,
+        "signed": bool(secret),
+        "endpoints": {},
+    }
+    for name, scenarios in SCENARIOS.items():
+        module = load_endpoint(name)
+        server = LoadTestServer(("127.0.0.1", 0), module.handler)
+        server.RequestHandlerClass.log_message = lambda *args: None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            bodies = [body for _, body in scenarios]
+            drive(server.server_port, bodies, warmup, concurrency, secret)
+            latencies, errors, elapsed = drive(server.server_port, bodies, total, concurrency, secret)
+        finally:
+            server.shutdown()
+            server.server_close()
+        latencies.sort()
+        results["endpoints"][name] = {
+            "p50_ms": percentile(latencies, 50) * 1e3,
+            "p95_ms": percentile(latencies, 95) * 1e3,
+            "p99_ms": percentile(latencies, 99) * 1e3,
+            "max_ms": latencies[-1] * 1e3 if latencies else 0.0,
+            "throughput_rps": len(latencies) / elapsed,
+            "errors": len(errors),
+            "alloc_bytes": {scenario: allocations(module, body) for scenario, body in scenarios},
+        }
+    return results
+
+
+def report(results, baseline=None):
+    print(f"{results['version'] or 'working tree'} · Python {results['python']} · "
+          f"{results['requests']} requests per endpoint at concurrency {results['concurrency']}"
+          f"{' · signed' if results['signed'] else ''}")
+    print(f"{'endpoint':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'req/s':>8} {'errors':>7}")
+    for name, r in results["endpoints"].items():
+        print(f"{name:>9} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['throughput_rps']:>8.0f} {r['errors']:>7}")
+        if baseline and name in baseline["endpoints"]:
+            b = baseline["endpoints"][name]
+            print(f"{'vs base':>9} " + " ".join(
+                f"{(r[key] / b[key] - 1) * 100 if b[key] else 0.0:>+8.0f}%"
+                for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")))
+    print("\nserver-side allocation per request (peak KiB, tracemalloc)")
+    for name, r in results["endpoints"].items():
+        for scenario, size in r["alloc_bytes"].items():
+            line = f"  {name:>8} {scenario:<13} {size / 1024:>7.1f}"
+            old = baseline and baseline["endpoints"].get(name, {}).get("alloc_bytes", {}).get(scenario)
+            if old:
+                line += f"  ({(size / old - 1) * 100:+.0f}%)"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--signed", action="store_true", help="turn on signature checks and sign every request")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.concurrency, args.requests, SECRET if args.signed else "")
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
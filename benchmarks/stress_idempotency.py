@@ -0,0 +1,196 @@
+# benchmarks/stress_idempotency.py
+"""
+Stress test for duplicate delivery suppression
+Two passes, each firing thousands of duplicate and interleaved deliveries:
+
+  store     many threads claim shuffled keys (every key delivered several
+            times) against a ResponseStore whose "handler" takes a random
+            few milliseconds; checks each key ran exactly once and every
+            duplicate got the first delivery's body, and times claim()
+  endpoint  confirm_print_* clicks, each delivered several times at once (as
+            Slack's retries would be) to api/actions.py over HTTP; checks
+            the scheduler saw exactly one job per click and that repeats got
+            the same answer
+
+Exits non-zero if a check fails.
+
+Run: python benchmarks/stress_idempotency.py [--keys 2000] [--copies 4] [--threads 32]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import CHANNEL, LoadTestServer, load_endpoint
+
+from printfarm.idempotency import ResponseStore
+
+
+def store_pass(keys, copies, threads, max_entries, seed=3):
+    rng = random.Random(seed)
+    store = ResponseStore(max_entries=max_entries, wait=5.0)
+    deliveries = [key for key in range(keys) for _ in range(copies)]
+    rng.shuffle(deliveries)
+    delays = [rng.uniform(0, 0.004) for _ in range(keys)]
+
+    runs = Counter()
+    bodies = defaultdict(set)
+    claim_times = []
+    lock = threading.Lock()
+
+    def deliver(key):
+        start = time.perf_counter()
+        replay = store.claim(key)
+        elapsed = time.perf_counter() - start
+        if replay is None:
+            with lock:
+                runs[key] += 1
+            time.sleep(delays[key])
+            body = f'{{"text": "job for {key}"}}'.encode()
+            store.complete(key, body)
+        else:
+            body = replay
+        with lock:
+            bodies[key].add(body)
+            if replay is None or replay:
+                claim_times.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(deliver, deliveries))
+    elapsed = time.perf_counter() - start
+
+    claim_times.sort()
+    return {
+        "deliveries": len(deliveries),
+        "elapsed": elapsed,
+        "ran_twice": sum(1 for count in runs.values() if count > 1),
+        "never_ran": keys - len(runs),
+        "mismatched": sum(1 for values in bodies.values() if len(values) > 1),
+        "entries": len(store),
+        "duplicates": store.duplicates,
+        "claim_p50_us": statistics.median(claim_times) * 1e6,
+    }
+
+
+def click(i, trigger_id):
+    return urllib.parse.urlencode({"payload": json.dumps({
+        "type": "block_actions",
+        "user": {"id": "U2147483697", "name": "stress"},
+        "team": {"id": "T0001"},
+        "channel": {"id": "C2147483705", "name": CHANNEL},
+        "trigger_id": trigger_id,
+        "actions": [{"action_id": "confirm_print_printer_3", "value": "printer_3",
+                     "action_ts": f"1548426417.{i:06d}"}],
+        "state": {"values": {"file": {"select_file": {"selected_option": {"value": f"stress_{i}.3mf"}}}}},
+    })}).encode()
+
+
+def endpoint_pass(clicks, copies, threads, seed=5):
+    os.environ.pop("SLACK_SIGNING_SECRET", None)
+    os.environ["SLACK_ALLOW_UNSIGNED"] = "1"
+    os.environ.pop("SLACK_DEFERRED_RESPONSES", None)
+    module = load_endpoint("actions")
+    submitted = Counter()
+    module.SCHEDULER.subscribe(lambda job: submitted.update([job.file]) if job.state == "queued" else None)
+
+    server = LoadTestServer(("127.0.0.1", 0), module.handler)
+    server.RequestHandlerClass.log_message = lambda *args: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rng = random.Random(seed)
+    deliveries = [i for i in range(clicks) for _ in range(copies)]
+    rng.shuffle(deliveries)
+    bodies = [click(i, f"{i}.{os.getpid()}.stress") for i in range(clicks)]
+    answers = defaultdict(set)
+    errors = []
+    lock = threading.Lock()
+
+    def deliver(i):
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=30)
+            conn.request("POST", "/", body=bodies[i],
+                         headers={"Content-Type": "application/x-www-form-urlencoded"})
+            resp = conn.getresponse()
+            body = resp.read()
+            conn.close()
+        except OSError as e:
+            errors.append(type(e).__name__)
+            return
+        with lock:
+            if resp.status != 200:
+                errors.append(resp.status)
+            answers[i].add(body)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(deliver, deliveries))
+    finally:
+        server.shutdown()
+        server.server_close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "deliveries": len(deliveries),
+        "elapsed": elapsed,
+        "jobs": sum(submitted[f"stress_{i}.3mf"] for i in range(clicks)),
+        "ran_twice": sum(1 for i in range(clicks) if submitted[f"stress_{i}.3mf"] > 1),
+        "never_ran": sum(1 for i in range(clicks) if not submitted[f"stress_{i}.3mf"]),
+        "mismatched": sum(1 for values in answers.values() if len(values) > 1),
+        "errors": len(errors),
+        "duplicates": module.RESPONSES.duplicates,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--keys", type=int, default=2000, help="distinct requests per pass")
+    parser.add_argument("--copies", type=int, default=4, help="deliveries of each request")
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    failed = False
+    store = store_pass(args.keys, args.copies, args.threads, max_entries=args.keys * 2)
+    print(f"store: {store['deliveries']} deliveries of {args.keys} keys in {store['elapsed']:.2f} s, "
+          f"claim p50 {store['claim_p50_us']:.1f} µs, {store['duplicates']} answered as duplicates")
+    for check in ("ran_twice", "never_ran", "mismatched"):
+        if store[check]:
+            print(f"  FAIL {check}: {store[check]}")
+            failed = True
+
+    # Fewer entries than keys: eviction has to keep the store bounded
+    small = store_pass(args.keys, args.copies, args.threads, max_entries=args.keys // 4)
+    print(f"store (max {args.keys // 4} entries): {small['entries']} kept, "
+          f"{small['ran_twice']} keys ran again after eviction")
+    if small["entries"] > args.keys // 4:
+        print("  FAIL store grew past max_entries")
+        failed = True
+
+    endpoint = endpoint_pass(args.keys, args.copies, args.threads)
+    print(f"endpoint: {endpoint['deliveries']} deliveries of {args.keys} confirm_print clicks in "
+          f"{endpoint['elapsed']:.2f} s ({endpoint['deliveries'] / endpoint['elapsed']:.0f} req/s), "
+          f"{endpoint['jobs']} jobs submitted, {endpoint['duplicates']} answered as duplicates")
+    for check in ("ran_twice", "never_ran", "mismatched", "errors"):
+        if endpoint[check]:
+            print(f"  FAIL {check}: {endpoint[check]}")
+            failed = True
+
+    if failed:
+        raise SystemExit(1)
+    print("ok: every request ran exactly once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# printfarm/__init__.py
+"""
+Shared code for the Slack 3D printer bot
+The Vercel functions in /api import from here so both endpoints see the same fleet
+"""
@@ -0,0 +1,263 @@
+# printfarm/alerts.py
+"""
+Alerts for printers that need someone: offline, error, paused or stalled
+Everything is driven by fleet changes. A transition into a problem status
+raises an alert on the spot, and a printing printer gets a stall deadline
+that each progress change pushes back. Deadlines sit in one heap, so a quiet
+fleet costs nothing however many printers it has, and there is no rescan.
+
+Alerts for a printer wait DEBOUNCE seconds before they are posted, and each
+printer has a token bucket. A printer that flaps between statuses therefore
+ends up as one digest message rather than a stream. An alert that repeats
+the printer's current problem is dropped. When the problem clears, a
+recovery follows.
+
+Opt in with PRINTFARM_ALERT_CHANNEL (a channel id the bot can post to). Like
+the live dashboards, this needs the long-running process that applies the
+printer updates (the poller or the MQTT ingest).
+"""
+
+import heapq
+import os
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+from printfarm import webapi
+from printfarm.live import TokenBucket
+from printfarm.state import FLEET
+
+# Statuses that raise an alert, with their icons
+ALERT_STATUSES = {"offline": "🔌", "error": "❌", "paused": "⏸️"}
+ICONS = dict(ALERT_STATUSES, stalled="🐌", recovered="✅")
+VERBS = {"offline": "went offline", "error": "reported an error", "paused": "was paused", "stalled": "has stalled"}
+
+# Progress that hasn't moved for this long means a stalled print
+STALL_AFTER = float(os.environ.get("PRINTFARM_STALL_MINUTES", "20")) * 60
+
+# Alerts kept per printer while waiting to be posted (a digest counts the rest)
+MAX_PENDING = 20
+
+Alert = namedtuple("Alert", "at printer_id kind detail")   # kind: a status, "stalled" or "recovered"
+
+
+class _Watch:
+    """What the pipeline knows about one printer"""
+
+    __slots__ = ("pending", "dropped", "active", "bucket", "flush_at", "stall_at", "stall_entry", "progress")
+
+    def __init__(self, bucket):
+        self.pending = []       # alerts not posted yet, oldest first
+        self.dropped = 0        # alerts beyond MAX_PENDING, still counted in the digest
+        self.active = None      # the problem last raised (None once recovered)
+        self.bucket = bucket
+        self.flush_at = None    # when the pending alerts go out
+        self.stall_at = None    # when the print counts as stalled
+        self.stall_entry = None  # deadline of this printer's one stall entry in the heap
+        self.progress = None    # progress when stall_at was set
+
+
+class AlertPipeline:
+    """Turns fleet changes into deduplicated, rate-limited alert messages"""
+
+    def __init__(self, fleet=FLEET, channel=None, debounce=15.0, stall_after=STALL_AFTER,
+                 rate=1 / 300, burst=1, api=webapi.call, clock=time.monotonic, background=True):
+        self.fleet = fleet
+        self.channel = channel
+        self.debounce = debounce
+        self.stall_after = stall_after
+        self.rate = rate
+        self.burst = burst
+        self.api = api
+        self.clock = clock
+        self.background = background
+        self.raised = 0
+        self.suppressed = 0     # repeats of a printer's current problem
+        self.sent = 0
+        self.digests = 0
+        self.failed = 0
+        self._watches = {}      # printer id -> _Watch
+        self._due = []          # heap of (when, kind, printer id); kind is "flush" or "stall"
+        self._cond = threading.Condition()
+        self._thread = None
+        if channel:
+            fleet.subscribe(self._on_change)
+
+    def _watch(self, printer_id):
+        watch = self._watches.get(printer_id)
+        if watch is None:
+            watch = self._watches[printer_id] = _Watch(TokenBucket(self.rate, self.burst, self.clock))
+        return watch
+
+    def _schedule(self, when, kind, printer_id):
+        heapq.heappush(self._due, (when, kind, printer_id))
+        if self.background:
+            self._ensure_thread()
+        self._cond.notify()
+
+    def _on_change(self, old, new):
+        if new is None:
+            with self._cond:
+                self._watches.pop(old.id, None)
+            return
+        if old is None:
+            return   # a printer joining the fleet is not a transition
+        if old.status == new.status and (new.status != "printing" or old.progress == new.progress):
+            return
+        now = self.clock()
+        with self._cond:
+            watch = self._watches.get(new.id)
+            if new.status == "printing":
+                # Every progress change pushes the stall deadline back; the heap
+                # entry is moved when it comes up, so there is one per printer
+                watch = watch or self._watch(new.id)
+                if watch.active == "stalled":
+                    self._raise(watch, Alert(now, new.id, "recovered", f"progressing again at {new.progress}%"))
+                watch.stall_at, watch.progress = now + self.stall_after, new.progress
+                if watch.stall_entry is None:
+                    watch.stall_entry = watch.stall_at
+                    self._schedule(watch.stall_at, "stall", new.id)
+            elif watch is not None:
+                watch.stall_at = None
+            if old.status == new.status:
+                return
+            if new.status in ALERT_STATUSES:
+                self._raise(watch or self._watch(new.id), Alert(now, new.id, new.status, new.error or ""))
+            elif watch is not None and watch.active is not None:
+                self._raise(watch, Alert(now, new.id, "recovered", f"now {new.status}"))
+
+    def _raise(self, watch, alert):
+        # Caller holds the condition
+        if alert.kind == watch.active:
+            self.suppressed += 1
+            return
+        self.raised += 1
+        watch.active = None if alert.kind == "recovered" else alert.kind
+        if len(watch.pending) < MAX_PENDING:
+            watch.pending.append(alert)
+        else:
+            watch.dropped += 1
+        if watch.flush_at is None:
+            watch.flush_at = alert.at + self.debounce
+            self._schedule(watch.flush_at, "flush", alert.printer_id)
+
+    def _stalled(self, printer_id, now):
+        # Caller holds the condition
+        watch = self._watches.get(printer_id)
+        printer = self.fleet.get(printer_id)
+        if printer is None or printer.status != "printing" or printer.progress != watch.progress:
+            return
+        watch.stall_at = None   # re-armed by the next progress change
+        minutes = round(self.stall_after / 60)
+        self._raise(watch, Alert(now, printer_id, "stalled",
+                                 f"stuck at {printer.progress}% for {minutes} min"
+                                 + (f" on {printer.current_job}" if printer.current_job else "")))
+
+    def _take_due(self):
+        """Pop everything due: stalls raise alerts, flushes hand back (printer id, alerts, dropped)"""
+        ready = []
+        with self._cond:
+            now = self.clock()
+            while self._due and self._due[0][0] <= now:
+                when, kind, printer_id = heapq.heappop(self._due)
+                watch = self._watches.get(printer_id)
+                if watch is None:
+                    continue
+                if kind == "stall":
+                    if watch.stall_entry != when:
+                        continue
+                    watch.stall_entry = None
+                    if watch.stall_at is not None and watch.stall_at > now:
+                        watch.stall_entry = watch.stall_at
+                        self._schedule(watch.stall_at, "stall", printer_id)
+                    elif watch.stall_at is not None:
+                        self._stalled(printer_id, now)
+                    continue
+                if watch.flush_at != when:
+                    continue
+                wait = watch.bucket.take()
+                if wait:
+                    # Over this printer's rate: keep collecting, post it all as one digest later
+                    watch.flush_at = now + wait
+                    self._schedule(watch.flush_at, "flush", printer_id)
+                    continue
+                ready.append((printer_id, watch.pending, watch.dropped))
+                watch.pending, watch.dropped, watch.flush_at = [], 0, None
+        return ready
+
+    def _requeue(self, printer_id, alerts, dropped, delay):
+        with self._cond:
+            watch = self._watch(printer_id)
+            watch.pending[:0] = alerts
+            watch.dropped += dropped
+            if watch.flush_at is None:
+                watch.flush_at = self.clock() + delay
+                self._schedule(watch.flush_at, "flush", printer_id)
+
+    def run_due(self):
+        """Post every alert that is due; returns how many messages went out"""
+        posted = 0
+        for printer_id, alerts, dropped in self._take_due():
+            try:
+                self.api("chat.postMessage", {"channel": self.channel,
+                                              "text": self.format(printer_id, alerts, dropped)})
+            except webapi.SlackApiError as e:
+                if e.retry_after:
+                    self._requeue(printer_id, alerts, dropped, e.retry_after)
+                else:
+                    self.failed += 1
+                continue
+            except OSError:
+                self._requeue(printer_id, alerts, dropped, self.debounce)
+                continue
+            except Exception:
+                # One bad alert (a formatting bug, say) must not hold up the others
+                traceback.print_exc()
+                self.failed += 1
+                continue
+            self.sent += 1
+            if len(alerts) + dropped > 1:
+                self.digests += 1
+            posted += 1
+        return posted
+
+    def format(self, printer_id, alerts, dropped=0):
+        """One message: the alert itself, or a digest of a burst"""
+        printer = self.fleet.get(printer_id)
+        name = printer.name if printer else printer_id
+        if len(alerts) == 1 and not dropped:
+            alert = alerts[0]
+            if alert.kind == "recovered":
+                return f"{ICONS['recovered']} *{name}* recovered: {alert.detail}"
+            detail = f": {alert.detail}" if alert.detail else ""
+            return f"{ICONS[alert.kind]} *{name}* {VERBS[alert.kind]}{detail}"
+
+        span = max(1, round((alerts[-1].at - alerts[0].at) / 60))
+        steps = " → ".join(f"{ICONS[a.kind]} {a.kind}" for a in alerts[-8:])
+        now = printer.status if printer else "removed"
+        return (f"🔁 *{name}* changed {len(alerts) + dropped} times in {span} min: "
+                f"{'… → ' if len(alerts) > 8 or dropped else ''}{steps}\nNow {now}"
+                + (f" ({printer.error})" if printer and printer.error and now in ALERT_STATUSES else ""))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > self.clock():
+                    self._cond.wait(self._due[0][0] - self.clock() if self._due else None)
+            try:
+                self.run_due()
+            except Exception:
+                traceback.print_exc()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="printer-alerts", daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        return {"raised": self.raised, "suppressed": self.suppressed, "sent": self.sent,
+                "digests": self.digests, "failed": self.failed, "scheduled": len(self._due)}
+
+
+ALERTS = AlertPipeline(channel=os.environ.get("PRINTFARM_ALERT_CHANNEL") or None)
@@ -0,0 +1,311 @@
+# printfarm/asgi.py
+"""
+ASGI app serving every api/ endpoint from one long-running process
+Serverless deploys run api/print.py, api/actions.py and api/snapshot.py as
+separate functions. Each pays its own cold start and keeps its own copy of
+the fleet, caches and connections. This app mounts the same `handler`
+classes, unchanged, under their Vercel paths in one process. The fleet
+state, render caches, duplicate-delivery store, camera feeds and outbound
+connection pool then stay warm and shared between all endpoints.
+
+The same process runs what keeps that fleet live: the MQTT ingest (with
+printer commands sent through it) and/or the HTTP status poller, chosen by
+PRINTFARM_SERVICES ("mqtt", "poller", both comma-separated, or "none"). The
+default, "auto", uses MQTT when printers in PRINTFARM_PRINTERS have a
+serial, else polls when that fleet file is set, else runs neither.
+
+Handlers are blocking code, so each request runs on a pool of `workers`
+threads. The response streams back as the handler writes it, so camera
+streams work too. Serve it with printfarm/server.py, or any ASGI server:
+
+    uvicorn printfarm.asgi:app
+"""
+
+import asyncio
+import importlib.util
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from http.client import HTTPMessage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mounted at /api/<name>, as Vercel routes api/<name>.py
+ENDPOINTS = ("print", "actions", "snapshot")
+
+WORKERS = int(os.environ.get("PRINTFARM_WORKERS", "8"))
+
+# Chunks a handler may write ahead of a slow client before it blocks
+MAX_BUFFERED_CHUNKS = 16
+
+# What keeps the fleet live in this process (see above)
+SERVICES = os.environ.get("PRINTFARM_SERVICES", "auto")
+
+# How long shutdown waits for handlers still running (the server's grace period comes first)
+SHUTDOWN_TIMEOUT = 5.0
+
+
+def load_handler(name):
+    """The `handler` class of api/<name>.py"""
+    spec = importlib.util.spec_from_file_location(f"api_{name}", os.path.join(ROOT, "api", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+class _Workers(Executor):
+    """Handler threads, as daemons: a handler still serving a departed client (a camera
+    stream with no frames never writes, so never notices) must not keep the process alive"""
+
+    def __init__(self, count):
+        self._queue = queue.SimpleQueue()
+        self._threads = [threading.Thread(target=self._run, name=f"printfarm-{i}", daemon=True)
+                         for i in range(count)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True, *, cancel_futures=False, timeout=None):
+        """Let queued work finish, waiting at most `timeout` seconds for it"""
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in self._threads:
+                thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+class _ResponseWriter:
+    """The handler's wfile: parses the status line and headers, then hands body chunks to the event loop
+
+    Runs on the worker thread. Writes only wait when MAX_BUFFERED_CHUNKS are
+    still unsent, so a slow client holds back the handler instead of letting
+    memory grow, and a quick one costs no round trip through the loop.
+    """
+
+    def __init__(self, loop, outbox):
+        self.loop = loop
+        self.outbox = outbox
+        self.room = threading.Semaphore(MAX_BUFFERED_CHUNKS)
+        self.head = b""
+        self.started = False
+        self.closed = False
+
+    def _emit(self, message):
+        self.room.acquire()
+        if self.closed:
+            raise BrokenPipeError("client went away")
+        self.loop.call_soon_threadsafe(self.outbox.put_nowait, message)
+
+    def close(self):
+        """The client is gone: fail the handler's next write (and wake one that is waiting)"""
+        self.closed = True
+        self.room.release(MAX_BUFFERED_CHUNKS)
+
+    def write(self, data):
+        if self.started:
+            if data:
+                self._emit(("body", bytes(data)))
+            return len(data)
+        self.head += data
+        end = self.head.find(b"\r\n\r\n")
+        if end >= 0:
+            head, rest = self.head[:end].decode("latin-1"), self.head[end + 4:]
+            status_line, *lines = head.split("\r\n")
+            headers = [(name.strip().lower().encode("latin-1"), value.strip().encode("latin-1"))
+                       for name, _, value in (line.partition(":") for line in lines) if value]
+            self.started = True
+            self._emit(("start", int(status_line.split()[1]), headers))
+            if rest:
+                self._emit(("body", rest))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def _run_handler(handler_class, scope, body, writer):
+    """Call the handler's do_<METHOD> the way BaseHTTPRequestHandler would, on a worker thread"""
+    h = handler_class.__new__(handler_class)
+    path = scope.get("raw_path") or scope["path"].encode()
+    if scope.get("query_string"):
+        path += b"?" + scope["query_string"]
+    h.command = scope["method"]
+    h.path = path.decode("latin-1")
+    h.request_version = "HTTP/1.1"
+    h.requestline = f"{h.command} {h.path} HTTP/1.1"
+    h.client_address = tuple(scope.get("client") or ("", 0))
+    h.server = None
+    h.close_connection = True
+    h.headers = HTTPMessage()
+    for name, value in scope["headers"]:
+        h.headers[name.decode("latin-1")] = value.decode("latin-1")
+    h.rfile, h.wfile = io.BytesIO(body), writer
+    h.log_message = lambda *args: None
+    try:
+        method = getattr(h, f"do_{h.command}", None)
+        if method is None:
+            h.send_error(501, f"Unsupported method ({h.command})")
+        else:
+            method()
+    finally:
+        if not writer.started and not writer.closed:
+            writer._emit(("start", 500, [(b"content-type", b"text/plain")]))
+        if not writer.closed:
+            writer._emit(("end",))
+
+
+class PrintfarmApp:
+    """ASGI 3 app for the api/ handlers, all in this process"""
+
+    def __init__(self, endpoints=ENDPOINTS, workers=WORKERS, services=SERVICES):
+        self.endpoints = endpoints
+        self.workers = workers
+        self.services = services
+        self.routes = None
+        self.ingest = None
+        self.poller = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import every endpoint (and with it the shared state), start the workers and services"""
+        with self._lock:
+            if self.routes is None:
+                routes = {f"/api/{name}": load_handler(name) for name in self.endpoints}
+                # imported lazily: loaded with the endpoints (which only hook up the job
+                # history and store when their files are configured; this process always does)
+                from printfarm import deferred, history, store
+
+                deferred.LONG_RUNNING = True   # background work outlives the request here
+                self._start_services()
+                self._pool = _Workers(self.workers)
+                self.routes = routes
+        return self
+
+    def _start_services(self):
+        from printfarm import alerts, mqtt  # imported lazily: alerts posts to PRINTFARM_ALERT_CHANNEL when set
+        from printfarm.commands import CONTROL
+        from printfarm.poller import Poller
+
+        names = {name.strip().lower() for name in self.services.split(",")} - {"", "none"}
+        unknown = names - {"auto", "mqtt", "poller"}
+        if unknown:
+            raise ValueError(f"unknown PRINTFARM_SERVICES: {', '.join(sorted(unknown))}")
+        targets = mqtt.load_targets() if names & {"auto", "mqtt"} else []
+        if "auto" in names:
+            names = {"mqtt"} if targets else {"poller"} if os.environ.get("PRINTFARM_PRINTERS") else set()
+        if "mqtt" in names and targets:
+            self.ingest = CONTROL.attach_mqtt(mqtt.MqttIngest(targets).start())
+        if "poller" in names:
+            self.poller = Poller().start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.load)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.get_running_loop().run_in_executor(None, self.close)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        if self.routes is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+        handler_class = self.routes.get(scope["path"].rstrip("/"))
+        if handler_class is None:
+            body = f"No endpoint at {scope['path']}".encode()
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        loop = asyncio.get_running_loop()
+        outbox = asyncio.Queue()
+        writer = _ResponseWriter(loop, outbox)
+        done = loop.run_in_executor(self._pool, _run_handler, handler_class, scope, b"".join(chunks), writer)
+        try:
+            while True:
+                message = await outbox.get()
+                writer.room.release()
+                if message[0] == "start":
+                    await send({"type": "http.response.start", "status": message[1], "headers": message[2]})
+                elif message[0] == "body":
+                    await send({"type": "http.response.body", "body": message[1], "more_body": True})
+                else:
+                    await send({"type": "http.response.body", "body": b""})
+                    break
+        except (OSError, asyncio.CancelledError):
+            # The client is gone: the handler's next write fails and it finishes on its own
+            writer.close()
+            done.add_done_callback(lambda f: f.cancelled() or f.exception())   # nobody awaits it now
+            raise
+        await done
+
+    def close(self):
+        """Finish in-flight handlers, stop the services, then flush what the shared state still holds"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, timeout=SHUTDOWN_TIMEOUT)
+        from printfarm import deferred, history, store  # imported lazily: loaded with the endpoints
+        from printfarm.commands import CONTROL
+        from printfarm.httppool import POOL
+
+        if self.poller is not None:
+            self.poller.stop()
+            self.poller = None
+        if self.ingest is not None:
+            if CONTROL.mqtt is self.ingest:
+                CONTROL.mqtt = None
+            self.ingest.stop()
+            self.ingest = None
+
+        if deferred._dispatcher is not None:
+            deferred._dispatcher.join()
+        if store.STORE is not None:
+            store.STORE.close()
+        history.HISTORY.close()
+        POOL.close()
+
+
+app = PrintfarmApp()
@@ -0,0 +1,290 @@
+# printfarm/camera.py
+"""
+Camera snapshots for the printing status view
+Each printer's MJPEG stream is read by one background thread over one
+connection, however many people are looking. The newest JPEG frames go into
+a small per-printer ring buffer and every viewer is served from memory. A
+feed starts on the first request for its printer and stops after
+IDLE_TIMEOUT seconds without one, so idle cameras are not streamed.
+
+Slack clients can't reach the printers' LAN addresses, so frames are served
+by api/snapshot.py under PRINTFARM_PUBLIC_URL. The URLs are signed with
+SLACK_SIGNING_SECRET and expire; without both settings nothing is served
+and the status view keeps the direct stream link and shows no image.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from urllib.parse import urlencode
+
+from printfarm.state import FLEET
+
+CAMERA_PORT = int(os.environ.get("PRINTFARM_CAMERA_PORT", "8080"))
+CAMERA_PATH = os.environ.get("PRINTFARM_CAMERA_PATH", "/stream")
+
+# Frames kept per printer, and how long a feed runs after its last viewer
+RING_SIZE = 8
+IDLE_TIMEOUT = 30.0
+
+# How long a request for a cold feed waits for its first frame
+FIRST_FRAME_WAIT = 2.0
+
+# Reconnect delays after a camera error double up to this
+MAX_BACKOFF = 30.0
+
+# Frames bigger than this (or header lines longer than MAX_LINE) mean a broken stream
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+MAX_LINE = 8192
+
+# Snapshot URLs change every URL_REFRESH seconds (so Slack fetches a new
+# frame) and stay valid for URL_LIFETIME seconds after that
+URL_REFRESH = 60
+URL_LIFETIME = 600
+
+Frame = namedtuple("Frame", "seq at jpeg")
+
+
+def stream_url(printer):
+    """The camera's MJPEG URL (`printer.ip` may carry its own port, as for the poller)"""
+    host = printer.ip if ":" in printer.ip else f"{printer.ip}:{CAMERA_PORT}"
+    return f"http://{host}{CAMERA_PATH}"
+
+
+def open_stream(url, timeout):
+    import urllib.request  # imported lazily: only running feeds need it
+
+    return urllib.request.urlopen(url, timeout=timeout)
+
+
+def read_frames(resp):
+    """Yield the JPEG parts of a multipart/x-mixed-replace response
+
+    Parts with a Content-Length are read in one go; parts without one are
+    read line by line up to the next boundary.
+    """
+    content_type = resp.headers.get("Content-Type", "")
+    boundary = None
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError(f"not an MJPEG stream ({content_type or 'no content type'})")
+    delimiter = b"--" + boundary.encode().removeprefix(b"--")
+
+    at_part = False   # True when the last read consumed a boundary line
+    while True:
+        if not at_part:
+            line = resp.readline(MAX_LINE)
+            if not line:
+                return
+            if not line.startswith(delimiter):
+                continue
+        at_part = False
+
+        length = None
+        while True:
+            line = resp.readline(MAX_LINE)
+            if not line:
+                return
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length" and value.strip().isdigit():
+                length = int(value.strip())
+
+        if length is not None:
+            if length > MAX_FRAME_BYTES:
+                raise ValueError(f"camera frame of {length} bytes")
+            jpeg = resp.read(length)
+            if len(jpeg) != length:
+                return
+        else:
+            chunks, size = [], 0
+            while True:
+                line = resp.readline(MAX_LINE)
+                if not line:
+                    return
+                if line.startswith(delimiter):
+                    at_part = True
+                    break
+                chunks.append(line)
+                size += len(line)
+                if size > MAX_FRAME_BYTES:
+                    raise ValueError("camera frame too large")
+            jpeg = b"".join(chunks).removesuffix(b"\n").removesuffix(b"\r")
+        if jpeg:
+            yield jpeg
+
+
+class CameraFeed:
+    """One printer's camera: a reader thread feeding a ring buffer of recent frames"""
+
+    def __init__(self, printer_id, url, ring_size=RING_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 timeout=5.0, opener=open_stream):
+        self.printer_id = printer_id
+        self.url = url
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.opener = opener
+        self.frames = deque(maxlen=ring_size)
+        self.connections = 0   # times the camera was connected to
+        self.served = 0        # frames handed to viewers
+        self.error = None
+        self._seq = 0
+        self._wanted = 0.0     # monotonic time of the last viewer
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def _want(self):
+        # Caller holds the condition
+        self._wanted = time.monotonic()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"camera-{self.printer_id}", daemon=True)
+            self._thread.start()
+
+    def latest(self, wait=FIRST_FRAME_WAIT):
+        """The newest frame (waiting up to `wait` seconds on a cold feed), or None"""
+        with self._cond:
+            self._want()
+            if not self.frames and wait:
+                self._cond.wait_for(lambda: self.frames, wait)
+            if not self.frames:
+                return None
+            self.served += 1
+            return self.frames[-1]
+
+    def next_frame(self, after, wait):
+        """The first frame newer than sequence number `after`, or None after `wait` seconds"""
+        with self._cond:
+            self._want()
+            if not self._cond.wait_for(lambda: self.frames and self.frames[-1].seq > after, wait):
+                return None
+            self.served += 1
+            return self.frames[-1]
+
+    def _idle(self):
+        return time.monotonic() - self._wanted >= self.idle_timeout
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            with self._cond:
+                if self._idle():
+                    self._thread = None
+                    return
+            try:
+                with self.opener(self.url, self.timeout) as resp:
+                    self.connections += 1
+                    self.error = None
+                    backoff = 1.0
+                    for jpeg in read_frames(resp):
+                        with self._cond:
+                            self._seq += 1
+                            self.frames.append(Frame(self._seq, time.time(), jpeg))
+                            self._cond.notify_all()
+                            if self._idle():
+                                break
+            except Exception as e:
+                self.error = str(e) or type(e).__name__
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+class CameraHub:
+    """The camera feeds of a fleet, created on first use"""
+
+    def __init__(self, fleet=FLEET, **feed_options):
+        self.fleet = fleet
+        self.feed_options = feed_options
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def feed(self, printer_id):
+        """The feed for a printer (None if the fleet doesn't know it)"""
+        feed = self._feeds.get(printer_id)
+        if feed is None:
+            printer = self.fleet.get(printer_id)
+            if printer is None or not printer.ip:
+                return None
+            with self._lock:
+                feed = self._feeds.get(printer_id)
+                if feed is None:
+                    feed = self._feeds[printer_id] = CameraFeed(printer_id, stream_url(printer), **self.feed_options)
+        return feed
+
+    def snapshot(self, printer_id, wait=FIRST_FRAME_WAIT):
+        """The printer's newest frame, or None if there is none (yet)"""
+        feed = self.feed(printer_id)
+        return feed.latest(wait) if feed is not None else None
+
+    def stats(self):
+        return {
+            printer_id: {"connections": feed.connections, "served": feed.served,
+                         "frames": feed._seq, "error": feed.error}
+            for printer_id, feed in list(self._feeds.items())
+        }
+
+
+CAMERAS = CameraHub()
+
+
+# Signed public URLs (api/snapshot.py)
+
+def _signature(secret, printer_id, expires, stream):
+    message = f"snapshot:{printer_id}:{expires}:{'stream' if stream else 'frame'}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def snapshot_url(printer_id, stream=False, now=None):
+    """Public URL of a printer's snapshot (or its re-served stream)
+
+    None unless both PRINTFARM_PUBLIC_URL and SLACK_SIGNING_SECRET are set.
+    """
+    base = os.environ.get("PRINTFARM_PUBLIC_URL", "")
+    secret = os.environ.get("SLACK_SIGNING_SECRET", "")
+    if not base or not secret:
+        return None
+    now = time.time() if now is None else now
+    expires = (int(now) // URL_REFRESH + 1) * URL_REFRESH + URL_LIFETIME
+    query = {"printer": printer_id, "expires": expires}
+    if stream:
+        query["stream"] = 1
+    query["sig"] = _signature(secret, printer_id, expires, stream)
+    return f"{base.rstrip('/')}/api/snapshot?{urlencode(query)}"
+
+
+def check_url(printer_id, expires, sig, stream=False, now=None):
+    """Whether a snapshot URL's signature is valid and unexpired (never without a secret)"""
+    secret = os.environ.get("SLACK_SIGNING_SECRET", "")
+    if not secret:
+        return False
+    if not expires.isdigit() or int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(_signature(secret, printer_id, int(expires), stream), sig)
+
+
+_placeholder = None
+
+
+def placeholder_png():
+    """A plain grey 320x180 PNG for printers without a frame (Slack rejects image blocks that fail to load)"""
+    global _placeholder
+    if _placeholder is None:
+        import struct
+        import zlib
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        rows = (b"\x00" + b"\x30" * 320) * 180
+        _placeholder = (b"\x89PNG\r\n\x1a\n"
+                        + chunk(b"IHDR", struct.pack(">IIBBBBB", 320, 180, 8, 0, 0, 0, 0))
+                        + chunk(b"IDAT", zlib.compress(rows, 9))
+                        + chunk(b"IEND", b""))
+    return _placeholder
@@ -0,0 +1,295 @@
+# printfarm/catalog.py
+"""
+Catalog of sliced .3mf files for the start print picker
+Scans PRINTFARM_CATALOG for .3mf archives and reads only their slicer
+metadata (print time, filament grams, plate count) through the zip central
+directory; meshes and G-code are never decompressed. The index is saved next
+to the library and refreshed incrementally: only files whose mtime or size
+changed are read again. Refreshes run on a background thread while requests
+keep searching the previous index, and an index that cannot be saved (a
+read-only filesystem) just stays in memory.
+
+Search is a prefix match over file names and their words ("case" finds
+phone_case.3mf) served from a sorted key list, for Slack's external_select.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+# Slack shows at most 100 options per external_select response
+MAX_OPTIONS = 100
+
+# How long a scan stays fresh before the next search triggers another one
+REFRESH_INTERVAL = 60.0
+
+# How long a request waits for the very first scan when there is no saved index
+FIRST_SCAN_WAIT = 2.0
+
+INDEX_NAME = ".printfarm-catalog.json"
+
+_PLATE_FILE = re.compile(r"Metadata/plate_(\d+)\.(?:gcode|json|png)$")
+_WORD = re.compile(r"[^a-z0-9]+")
+
+
+class CatalogEntry:
+    __slots__ = ("path", "mtime_ns", "size", "print_time", "filament_grams", "plates")
+
+    def __init__(self, path, mtime_ns, size, print_time=None, filament_grams=None, plates=None):
+        self.path = path                      # relative to the catalog root, '/'-separated
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.print_time = print_time          # seconds, as predicted by the slicer
+        self.filament_grams = filament_grams
+        self.plates = plates
+
+    @property
+    def name(self):
+        return self.path.rsplit("/", 1)[-1]
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def describe(self):
+        """Short label for the picker: name · 2h 15m · 38 g · 2 plates"""
+        parts = [self.name]
+        if self.print_time:
+            minutes = round(self.print_time / 60)
+            parts.append(f"{minutes // 60}h {minutes % 60}m" if minutes >= 60 else f"{minutes}m")
+        if self.filament_grams:
+            parts.append(f"{self.filament_grams:.0f} g")
+        if self.plates and self.plates > 1:
+            parts.append(f"{self.plates} plates")
+        return " · ".join(parts)
+
+
+def read_metadata(path):
+    """Print time, filament and plates from a sliced 3MF without extracting it
+
+    Bambu Studio / OrcaSlicer write Metadata/slice_info.config with one
+    <plate> per sliced plate; files that were never sliced only give a plate
+    count (from the per-plate entries) and no estimates.
+    """
+    import zipfile  # imported lazily: only scans need it
+    from xml.etree import ElementTree
+
+    print_time = filament_grams = None
+    with zipfile.ZipFile(path) as archive:   # reads the central directory only
+        names = archive.namelist()
+        plates = len({m.group(1) for m in map(_PLATE_FILE.match, names) if m}) or None
+        if "Metadata/slice_info.config" in names:
+            root = ElementTree.fromstring(archive.read("Metadata/slice_info.config"))
+            sliced = root.findall("plate")
+            for plate in sliced:
+                values = {m.get("key"): m.get("value") for m in plate.findall("metadata")}
+                if values.get("prediction"):
+                    print_time = (print_time or 0) + int(float(values["prediction"]))
+                if values.get("weight"):
+                    filament_grams = (filament_grams or 0) + float(values["weight"])
+            plates = max(plates or 0, len(sliced)) or None
+    return {"print_time": print_time, "filament_grams": filament_grams, "plates": plates}
+
+
+def search_keys(path):
+    """Lowercase keys a file can be found by: its name, its path and each word of its name"""
+    name = path.rsplit("/", 1)[-1].lower()
+    keys = {name, path.lower()}
+    keys.update(word for word in _WORD.split(name[:-4] if name.endswith(".3mf") else name) if word)
+    return keys
+
+
+class Catalog:
+    """Index of the .3mf files under `root`, persisted to `index_path`"""
+
+    def __init__(self, root, index_path=None, refresh_interval=REFRESH_INTERVAL):
+        self.root = root
+        self.index_path = index_path or os.path.join(root, INDEX_NAME)
+        self.refresh_interval = refresh_interval
+        self.scanned_at = 0.0
+        self.save_error = None
+        self._entries = {}   # path -> CatalogEntry
+        self._keys = []      # sorted (key, path)
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        return self._entries.get(path)
+
+    def load(self):
+        """Read the saved index (missing or unreadable just means a full scan next time)"""
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._entries = {row["path"]: CatalogEntry(**row) for row in rows}
+            self._reindex()
+
+    def save(self):
+        """Write the index atomically (a half-written file would force a full rescan)
+
+        Returns whether it was written; on failure the reason is kept in
+        save_error and the index lives on in memory only.
+        """
+        rows = [entry.to_dict() for entry in self._entries.values()]
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            self.save_error = f"{type(e).__name__}: {e}"
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return False
+        self.save_error = None
+        return True
+
+    def _scan(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.lower().endswith(".3mf"):
+                    full = os.path.join(dirpath, filename)
+                    yield os.path.relpath(full, self.root).replace(os.sep, "/"), full
+
+    def refresh(self):
+        """Rescan the library, re-reading only new or modified files; returns (read, removed)"""
+        entries = {}
+        read = 0
+        for path, full in self._scan():
+            try:
+                stat = os.stat(full)
+            except OSError:
+                continue
+            entry = self._entries.get(path)
+            if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                try:
+                    metadata = read_metadata(full)
+                except Exception:
+                    # Not a readable 3MF (yet); list it without estimates
+                    metadata = {}
+                entry = CatalogEntry(path, stat.st_mtime_ns, stat.st_size, **metadata)
+                read += 1
+            entries[path] = entry
+        removed = len(self._entries.keys() - entries.keys())
+
+        with self._lock:
+            self._entries = entries
+            if read or removed:
+                self._reindex()
+            self.scanned_at = time.monotonic()
+        if read or removed:
+            self.save()
+        return read, removed
+
+    def refresh_in_background(self):
+        """Start a refresh on a daemon thread unless one is running; returns that thread"""
+        with self._lock:
+            if self._refreshing is None:
+                self._refreshing = threading.Thread(target=self._background_refresh, name="catalog-scan",
+                                                    daemon=True)
+                self._refreshing.start()
+            return self._refreshing
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                # A failed scan waits for the next interval too, rather than retrying on every request
+                self.scanned_at = time.monotonic()
+                self._refreshing = None
+
+    def refresh_if_stale(self):
+        """Refresh in the background once the last scan is older than refresh_interval
+
+        Only a catalog with no entries at all (no saved index yet) waits for
+        the scan, and then at most FIRST_SCAN_WAIT seconds.
+        """
+        if time.monotonic() - self.scanned_at >= self.refresh_interval:
+            thread = self.refresh_in_background()
+            if not self._entries:
+                thread.join(FIRST_SCAN_WAIT)
+
+    def _reindex(self):
+        self._keys = sorted((key, path) for path in self._entries for key in search_keys(path))
+
+    @staticmethod
+    def _prefixed(keys, prefix, limit=None):
+        """Paths with a key starting with `prefix`, in key order"""
+        found = {}
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix) and (limit is None or len(found) < limit):
+            found[keys[i][1]] = None
+            i += 1
+        return found
+
+    def search(self, query, limit=MAX_OPTIONS):
+        """Entries whose name, path or a word of the name starts with `query`, by path
+
+        Several words ("stand 12") must each start some word of the name.
+        """
+        query = query.strip().lower()
+        with self._lock:
+            keys, entries = self._keys, self._entries
+        found = self._prefixed(keys, query, limit)
+        words = [word for word in _WORD.split(query) if word]
+        if len(words) > 1 and len(found) < limit:
+            for path in self._prefixed(keys, words[0]):
+                if path not in found:
+                    keys = search_keys(path)
+                    if all(any(key.startswith(word) for key in keys) for word in words[1:]):
+                        found[path] = None
+                        if len(found) >= limit:
+                            break
+        return sorted((entries[path] for path in found), key=lambda entry: entry.path)
+
+
+def options(entries):
+    """Slack option objects for catalog entries (text is capped at 75 characters)"""
+    return [
+        {"text": {"type": "plain_text", "text": entry.describe()[:75]}, "value": entry.path}
+        for entry in entries
+        if len(entry.path) <= 150
+    ]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def enabled():
+    """Whether a catalog directory is configured"""
+    return bool(os.environ.get("PRINTFARM_CATALOG"))
+
+
+def get_catalog():
+    """The shared catalog for PRINTFARM_CATALOG (None when unset), refreshed in the background when stale"""
+    global _catalog
+    if not enabled():
+        return None
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog(os.environ["PRINTFARM_CATALOG"], os.environ.get("PRINTFARM_CATALOG_INDEX"))
+    _catalog.refresh_if_stale()
+    return _catalog
+
+
+if __name__ == "__main__":
+    if not enabled():
+        raise SystemExit("Set PRINTFARM_CATALOG to the directory holding the .3mf files")
+    catalog = Catalog(os.environ["PRINTFARM_CATALOG"], os.environ.get("PRINTFARM_CATALOG_INDEX"))
+    catalog.refresh()
+    print(f"{len(catalog)} files indexed in {catalog.index_path}"
+          + (f" (not saved: {catalog.save_error})" if catalog.save_error else ""))
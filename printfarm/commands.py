@@ -0,0 +1,185 @@
+# printfarm/commands.py
+"""
+Printer commands, one at a time or across many printers at once
+pause, resume and cancel go to the printer itself: over its MQTT connection
+when an MqttIngest is attached, otherwise straight to the fleet state as the
+scheduler does for starts. start queues a job pinned to the printer.
+
+A batch fans one command out on a bounded thread pool (BATCH_PARALLELISM at
+once, each printer with its own timeout) and hands back results as printers
+answer, so a recall across 30 printers takes a few round trips rather than
+30 and ends in one summary.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from printfarm.scheduler import SCHEDULER
+from printfarm.state import FLEET
+
+BATCH_PARALLELISM = int(os.environ.get("PRINTFARM_BATCH_PARALLELISM", "8"))
+
+# Seconds a printer gets to take a command before it counts as failed
+COMMAND_TIMEOUT = 10.0
+
+# Bambu local MQTT requests for each printer command
+MQTT_COMMANDS = {"pause": "pause", "resume": "resume", "cancel": "stop"}
+
+# command -> (statuses it applies to, fleet fields it leads to, past tense)
+COMMANDS = {
+    "pause": (("printing",), {"status": "paused"}, "paused"),
+    "resume": (("paused",), {"status": "printing"}, "resumed"),
+    "cancel": (("printing", "paused"), {"status": "available", "current_job": None,
+                                        "progress": 0, "time_remaining": 0}, "cancelled"),
+    "start": (("available", "printing", "paused"), None, "started"),
+}
+
+Result = namedtuple("Result", "printer_id name outcome detail")   # outcome: done, skipped, failed
+
+
+class CommandError(Exception):
+    """A printer refused or never answered a command"""
+
+
+class PrinterCommands:
+    """Runs printer commands against a fleet, over MQTT when attached"""
+
+    def __init__(self, fleet=FLEET, scheduler=SCHEDULER, parallelism=BATCH_PARALLELISM,
+                 timeout=COMMAND_TIMEOUT):
+        self.fleet = fleet
+        self.scheduler = scheduler
+        self.parallelism = parallelism
+        self.timeout = timeout
+        self.mqtt = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def attach_mqtt(self, ingest):
+        """Send commands through a running MqttIngest instead of setting the state directly"""
+        self.mqtt = ingest
+        return ingest
+
+    def _executor(self):
+        from concurrent.futures import ThreadPoolExecutor  # imported lazily: most invocations never batch
+
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="batch")
+            return self._pool
+
+    def run(self, command, printer_id, **options):
+        """Run one command on one printer; returns a Result (never raises)"""
+        printer = self.fleet.get(printer_id)
+        if printer is None:
+            return Result(printer_id, printer_id, "failed", "unknown printer")
+        statuses, fields, done = COMMANDS[command]
+        if printer.status not in statuses:
+            return Result(printer_id, printer.name, "skipped", printer.status)
+        try:
+            if command == "start":
+                job = self.scheduler.submit(options["file"], printer_id=printer_id, **options.get("job", {}))
+                if job.state != "running":
+                    return Result(printer_id, printer.name, "done", f"queued #{self.scheduler.position(job.id)}")
+                return Result(printer_id, printer.name, "done", done)
+            if self.mqtt is not None:
+                request = {"print": {"sequence_id": "0", "command": MQTT_COMMANDS[command]}}
+                if not self.mqtt.publish_threadsafe(printer_id, request, timeout=self.timeout):
+                    raise CommandError("not on MQTT")
+            else:
+                self.fleet.update(printer_id, **fields)
+        except Exception as e:
+            return Result(printer_id, printer.name, "failed", str(e) or type(e).__name__)
+        return Result(printer_id, printer.name, "done", done)
+
+    def batch(self, command, printer_ids, **options):
+        """Run a command on many printers concurrently, yielding Results as they finish"""
+        from concurrent.futures import as_completed
+
+        pool = self._executor()
+        futures = {pool.submit(self.run, command, printer_id, **options): printer_id
+                   for printer_id in dict.fromkeys(printer_ids)}
+        try:
+            for future in as_completed(futures, timeout=self.timeout * (len(futures) / self.parallelism + 1)):
+                yield future.result()
+        except TimeoutError:
+            for future, printer_id in futures.items():
+                if not future.done():
+                    future.cancel()
+                    printer = self.fleet.get(printer_id)
+                    yield Result(printer_id, printer.name if printer else printer_id, "failed", "timed out")
+
+
+def summarize(command, results, total=None, finished=True):
+    """One Slack message for a batch: counts, then the printers that were skipped or failed"""
+    _, _, done = COMMANDS[command]
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        counts[result.outcome] += 1
+    answered = sum(counts.values())
+    total = answered if total is None else total
+
+    queued = sum(1 for r in results if r.outcome == "done" and r.detail.startswith("queued"))
+    parts = [f"{counts['done'] - queued} {done}"] + ([f"{queued} queued"] if queued else [])
+    if counts["skipped"]:
+        parts.append(f"{counts['skipped']} skipped")
+    if counts["failed"]:
+        parts.append(f"{counts['failed']} failed")
+    if finished:
+        title = f"{'✅' if not counts['failed'] else '⚠️'} *Batch {command}* on {total} printer{'s' if total != 1 else ''}"
+    else:
+        title = f"⏳ *Batch {command}* · {answered} of {total} printers answered"
+
+    lines = [f"{title}\n{' · '.join(parts)}"]
+    details = [r for r in results if r.outcome != "done" or r.detail.startswith("queued")]
+    for result in sorted(details, key=lambda r: (r.outcome, r.name))[:20]:
+        icon = {"done": "📋", "skipped": "➖", "failed": "❌"}[result.outcome]
+        reason = f"skipped ({result.detail})" if result.outcome == "skipped" else result.detail
+        lines.append(f"{icon} {result.name}: {reason}")
+    if len(details) > 20:
+        lines.append(f"…and {len(details) - 20} more")
+    return {"text": "\n".join(lines)}
+
+
+def run_batch(command, printer_ids, report=None, interval=1.0, commands=None, **options):
+    """Run a batch and return its summary; `report(message)` gets progress every `interval` seconds"""
+    commands = commands or CONTROL
+    printer_ids = list(dict.fromkeys(printer_ids))
+    results = []
+    last = time.monotonic()
+    for result in commands.batch(command, printer_ids, **options):
+        results.append(result)
+        if report is not None and len(results) < len(printer_ids) and time.monotonic() - last >= interval:
+            report(summarize(command, results, len(printer_ids), finished=False))
+            last = time.monotonic()
+    return summarize(command, results, len(printer_ids))
+
+
+def start_batch(command, printer_ids, response_url, **options):
+    """Run a batch in the background, editing the message at response_url as printers answer
+
+    Like deferred responses, this needs a process that outlives the request;
+    callers check deferred.background_ok() first.
+    """
+    from printfarm import deferred  # imported lazily: only batches post progress
+
+    def post(message):
+        try:
+            deferred.post_json(response_url, dict(message, replace_original=True))
+        except Exception:
+            pass   # progress is best effort; the summary is retried below
+
+    def work():
+        summary = run_batch(command, printer_ids, report=post, **options)
+        for attempt in range(3):
+            try:
+                deferred.post_json(response_url, dict(summary, replace_original=True))
+                return
+            except Exception:
+                time.sleep(0.5 * 2 ** attempt)
+
+    threading.Thread(target=work, name=f"batch-{command}", daemon=True).start()
+
+
+CONTROL = PrinterCommands()
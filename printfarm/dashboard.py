@@ -0,0 +1,423 @@
+# printfarm/dashboard.py
+"""
+Printer dashboard rendering shared by /print and the refresh button
+Rendered blocks and their JSON bytes are cached per fleet version, so a refresh
+with no state change only re-renders the "Last updated" line; when the fleet
+does change, only the printers that changed get a new section block.
+`/print` arguments (status:, model:, page:, summary) select a filtered page of
+printers so large fleets stay under Slack's 50-block limit
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from printfarm import metrics
+from printfarm.state import FLEET
+
+def get_status_emoji(status):
+    """Get emoji for printer status"""
+    status_emojis = {
+        "available": "✅",
+        "printing": "🔒",
+        "paused": "⏸️",
+        "offline": "⚠️",
+        "maintenance": "🔧",
+        "error": "❌"
+    }
+    return status_emojis.get(status, "❓")
+
+def format_time_remaining(minutes):
+    """Format time remaining in readable format"""
+    if minutes <= 0:
+        return ""
+
+    hours = minutes // 60
+    mins = minutes % 60
+
+    if hours > 0:
+        return f"{hours}h {mins}m"
+    else:
+        return f"{mins}m"
+
+# Static blocks, built once
+HEADER_BLOCKS = [
+    {
+        "type": "header",
+        "text": {
+            "type": "plain_text",
+            "text": "🏭 3D Printer Farm Status"
+        }
+    },
+    {
+        "type": "divider"
+    }
+]
+
+DIVIDER_BLOCK = {"type": "divider"}
+
+# Footer with actions
+FOOTER_BLOCK = {
+    "type": "actions",
+    "elements": [
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "🔄 Refresh Status"
+            },
+            "action_id": "refresh_status",
+            "style": "primary"
+        },
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "📋 View Queue"
+            },
+            "action_id": "view_queue"
+        },
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "🧰 Batch Actions"
+            },
+            "action_id": "batch_actions"
+        }
+    ]
+}
+
+HEADER_JSON = "".join(json.dumps(block) + ", " for block in HEADER_BLOCKS).encode()
+DIVIDER_JSON = (json.dumps(DIVIDER_BLOCK) + ", ").encode()
+FOOTER_JSON = (json.dumps(FOOTER_BLOCK) + ", ").encode()
+
+def build_printer_block(printer, remaining=None):
+    """Build the section block for one printer (`remaining`: estimated minutes left, if known)"""
+    status_emoji = get_status_emoji(printer.status)
+
+    # Main printer info
+    if printer.status == "printing":
+        status_text = f"*{printer.name}* {status_emoji} Printing\n" \
+                     f"📄 Job: {printer.current_job}\n" \
+                     f"📊 Progress: {printer.progress}%\n" \
+                     f"⏱️ Remaining: {format_time_remaining(printer.time_remaining if remaining is None else remaining)}\n" \
+                     f"👤 Started by: {printer.started_by or 'Unknown'}"
+
+        button_text = "View Progress"
+        button_style = "primary"
+
+    elif printer.status == "available":
+        status_text = f"*{printer.name}* {status_emoji} Available\n" \
+                     f"🔧 Model: {printer.model}\n" \
+                     f"📁 Last job: {printer.last_job or 'None'}"
+
+        button_text = "Start Print"
+        button_style = "primary"
+
+    elif printer.status == "offline":
+        status_text = f"*{printer.name}* {status_emoji} Offline\n" \
+                     f"❌ Error: {printer.error or 'Unknown error'}\n" \
+                     f"🌐 IP: {printer.ip}"
+
+        button_text = "Check Status"
+        button_style = "danger"
+
+    else:
+        status_text = f"*{printer.name}* {status_emoji} {printer.status.title()}"
+        button_text = "View Details"
+        button_style = "default"
+
+    return {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": status_text
+        },
+        "accessory": {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": button_text
+            },
+            "style": button_style,
+            "action_id": f"printer_action_{printer.id}",
+            "value": printer.id
+        }
+    }
+
+class PrinterBlockCache:
+    """Per-printer memo of section blocks, keyed by each record's version
+
+    A record's version only changes when that printer changes, so after one
+    printer reports progress every other block (and its JSON) is reused. The
+    estimated time left is part of the key, as it may move on its own.
+    Entries are kept in LRU order and bounded by max_entries, so printers on
+    other pages and other tenants' printers stay memoized between renders.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()   # printer id -> (version, block, encoded block + divider)
+
+    def get(self, printer, remaining=None):
+        key = (printer.version, remaining)
+        with self._lock:
+            entry = self._blocks.get(printer.id)
+            if entry is not None and entry[0] == key:
+                self._blocks.move_to_end(printer.id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        block = build_printer_block(printer, remaining)
+        entry = (key, block, (json.dumps(block) + ", ").encode() + DIVIDER_JSON)
+        with self._lock:
+            self._blocks[printer.id] = entry
+            self._blocks.move_to_end(printer.id)
+            while len(self._blocks) > self.max_entries:
+                self._blocks.popitem(last=False)
+        return entry
+
+    def prune(self, printer_ids):
+        """Forget printers that are no longer in the fleet"""
+        keep = set(printer_ids)
+        with self._lock:
+            for printer_id in [p for p in self._blocks if p not in keep]:
+                del self._blocks[printer_id]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._blocks)}
+
+    def __len__(self):
+        return len(self._blocks)
+
+
+PRINTER_BLOCKS = PrinterBlockCache()
+metrics.METRICS.cache("printer_blocks", PRINTER_BLOCKS.stats)
+
+def assemble_dashboard(printers, extra_blocks=(), footer=FOOTER_BLOCK, estimates=None):
+    """Return (blocks, json_prefix) for the given printers, reusing per-printer blocks
+
+    blocks excludes the "Last updated" timestamp; json_prefix is the encoded
+    response up to (and including the separator before) that block.
+    `estimates` ({printer id: Estimate}) replaces the printers' own time left.
+    """
+    estimates = estimates or {}
+    blocks = HEADER_BLOCKS + list(extra_blocks)
+    chunks = [b'{"response_type": "ephemeral", "blocks": [', HEADER_JSON]
+    chunks.extend((json.dumps(block) + ", ").encode() for block in extra_blocks)
+    for printer in printers:
+        estimate = estimates.get(printer.id)
+        _, block, encoded = PRINTER_BLOCKS.get(printer, estimate.remaining if estimate else None)
+        blocks.append(block)
+        blocks.append(DIVIDER_BLOCK)
+        chunks.append(encoded)
+    blocks.append(footer)
+    chunks.append(FOOTER_JSON if footer is FOOTER_BLOCK else (json.dumps(footer) + ", ").encode())
+    return blocks, b"".join(chunks)
+
+# Slack rejects messages with more than 50 blocks and each printer takes two
+PAGE_SIZE = 20
+
+DashboardQuery = namedtuple("DashboardQuery", "status model page summary")
+DEFAULT_QUERY = DashboardQuery(None, None, 1, False)
+
+def parse_query(text):
+    """Parse `/print` arguments such as "status:printing model:X1 page:2 summary" """
+    status = model = None
+    page = 1
+    summary = False
+    for token in (text or "").split():
+        key, _, value = token.partition(":")
+        key = key.lower()
+        if key == "status" and value:
+            status = value.lower()
+        elif key == "model" and value:
+            model = value.lower()
+        elif key == "page" and value.isdigit():
+            page = max(1, int(value))
+        elif key == "summary" and not value:
+            summary = True
+    return DashboardQuery(status, model, page, summary)
+
+def format_query(query, page=None):
+    """Turn a query back into `/print` arguments (used as button values)"""
+    page = query.page if page is None else page
+    parts = []
+    if query.status:
+        parts.append(f"status:{query.status}")
+    if query.model:
+        parts.append(f"model:{query.model}")
+    if page > 1:
+        parts.append(f"page:{page}")
+    if query.summary:
+        parts.append("summary")
+    return " ".join(parts)
+
+def build_footer_block(query, page, pages):
+    """Footer actions, with the query carried along and page navigation if needed"""
+    if query == DEFAULT_QUERY and pages == 1:
+        return FOOTER_BLOCK
+
+    refresh, *others = FOOTER_BLOCK["elements"]
+    current = format_query(query, page)
+    elements = [dict(refresh, value=current) if current else refresh, *others]
+    if page > 1:
+        elements.append({
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "◀️ Previous"
+            },
+            "action_id": "page_prev",
+            "value": format_query(query, page - 1) or "page:1"
+        })
+    if page < pages:
+        elements.append({
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "Next ▶️"
+            },
+            "action_id": "page_next",
+            "value": format_query(query, page + 1)
+        })
+    return {"type": "actions", "elements": elements}
+
+def build_summary_block(counts):
+    """One line of per-status counts, standing in for the collapsed idle printers"""
+    parts = [
+        f"{get_status_emoji(status)} {count} {status}"
+        for status, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    return {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": "*Summary:* " + (" · ".join(parts) or "no printers")
+        }
+    }
+
+def render_page(fleet, query):
+    """Return (blocks, json_prefix) for one page of the (filtered) dashboard"""
+    if query.summary and query.status is None:
+        # Idle printers only show up in the counts line
+        printers = fleet.select(model=query.model, exclude_status="available")
+    else:
+        printers = fleet.select(status=query.status, model=query.model)
+    metrics.stage("lookup")
+
+    pages = max(1, -(-len(printers) // PAGE_SIZE))
+    page = min(query.page, pages)
+    shown = printers[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+
+    extra_blocks = []
+    if query != DEFAULT_QUERY or pages > 1:
+        filters = format_query(query._replace(page=1))
+        info = f"Page {page} of {pages} · {len(printers)} printer{'s' if len(printers) != 1 else ''}"
+        if filters:
+            info += f" · `{filters}`"
+        extra_blocks.append({
+            "type": "context",
+            "elements": [
+                {
+                    "type": "mrkdwn",
+                    "text": info
+                }
+            ]
+        })
+    if query.summary:
+        extra_blocks.append(build_summary_block(fleet.status_counts(query.model)))
+
+    from printfarm.estimate import estimate_fleet  # imported lazily: it pulls in the scheduler and catalog
+
+    estimates = estimate_fleet(fleet, printers=shown)
+    page_blocks = assemble_dashboard(shown, extra_blocks, build_footer_block(query, page, pages), estimates)
+    metrics.stage("blocks")
+    return page_blocks
+
+def create_timestamp_block():
+    """The "Last updated" context block (the only part that changes every call)"""
+    return {
+        "type": "context",
+        "elements": [
+            {
+                "type": "mrkdwn",
+                "text": f"Last updated: {time.strftime('%I:%M %p')}"
+            }
+        ]
+    }
+
+
+class RenderCache:
+    """Small LRU of rendered dashboards with a TTL, plus hit/miss counters
+
+    Shared by the server's worker threads, so every access holds a lock.
+    """
+
+    def __init__(self, max_entries=32, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+RENDER_CACHE = RenderCache()
+metrics.METRICS.cache("render", RENDER_CACHE.stats)
+
+
+def cached_page(fleet, query=DEFAULT_QUERY):
+    """Return (blocks, json_prefix) for the fleet's current version, from cache if possible"""
+    key = (id(fleet), fleet.version, query)
+    cached = RENDER_CACHE.get(key)
+    if cached is None:
+        cached = render_page(fleet, query)
+        RENDER_CACHE.put(key, cached)
+    return cached
+
+def create_printer_dashboard(fleet=FLEET, query=DEFAULT_QUERY):
+    """Create the main printer dashboard Slack message"""
+    blocks, _ = cached_page(fleet, query)
+    return {
+        "response_type": "ephemeral",
+        "blocks": blocks + [create_timestamp_block()]
+    }
+
+def render_dashboard_json(fleet=FLEET, query=DEFAULT_QUERY):
+    """Dashboard as JSON bytes, equal to json.dumps(create_printer_dashboard()).encode()"""
+    _, prefix = cached_page(fleet, query)
+    return prefix + json.dumps(create_timestamp_block()).encode() + b"]}"
@@ -0,0 +1,142 @@
+# printfarm/deferred.py
+"""
+Deferred Slack responses
+The handler acknowledges Slack with an empty 200 straight away and a background
+worker builds the real message and POSTs it to the request's response_url.
+
+Opt in with SLACK_DEFERRED_RESPONSES=1. Background work needs a process that
+stays alive after the response is written (a long-running server); a frozen
+serverless instance may never deliver.
+"""
+
+import os
+import threading
+import time
+
+from printfarm import fragments
+
+# Set by printfarm.asgi when every endpoint runs in one long-lived process
+LONG_RUNNING = False
+
+
+def enabled():
+    """Whether deferred mode is switched on"""
+    return os.environ.get("SLACK_DEFERRED_RESPONSES", "") in ("1", "true", "yes")
+
+
+def background_ok():
+    """Whether work may go on after the response is written (deferred mode or a warm process)"""
+    return LONG_RUNNING or enabled()
+
+
+def post_json(url, payload, timeout=5.0):
+    """POST a JSON body and return the HTTP status (over the shared keep-alive pool)"""
+    from printfarm.httppool import POOL  # imported lazily: most invocations never post anything
+
+    body = fragments.dumps(payload)
+    return POOL.request("POST", url, body=body, timeout=timeout,
+                        headers={"Content-Type": "application/json; charset=utf-8"}).status
+
+
+class ResponseDispatcher:
+    """Bounded queue of pending response_url deliveries, drained by worker threads
+
+    Failed deliveries (network errors, 429 and 5xx) are retried with
+    exponential backoff; a Retry-After header from Slack wins if present.
+    """
+
+    def __init__(self, workers=2, max_pending=100, max_attempts=3, backoff=0.5,
+                 timeout=5.0, post=post_json):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.post = post
+        self.delivered = 0
+        self.failed = 0
+        import queue  # imported lazily: only processes that defer a response need it
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._workers = [
+            threading.Thread(target=self._run, name=f"slack-responder-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, response_url, build):
+        """Queue `build()` for delivery to response_url
+
+        Returns False when the queue is full so the caller can answer inline instead.
+        """
+        import queue
+
+        try:
+            self._queue.put_nowait((response_url, build))
+            return True
+        except queue.Full:
+            return False
+
+    def join(self):
+        """Block until every queued delivery has been attempted"""
+        self._queue.join()
+
+    def _deliver(self, response_url, payload):
+        import urllib.error
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self.backoff * (2 ** (attempt - 1))
+            try:
+                self.post(response_url, payload, timeout=self.timeout)
+                return True
+            except urllib.error.HTTPError as e:
+                if e.code != 429 and e.code < 500:
+                    return False
+                retry_after = e.headers.get("Retry-After") if e.headers else None
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+            except OSError:
+                pass
+            if attempt < self.max_attempts:
+                time.sleep(delay)
+        return False
+
+    def _run(self):
+        while True:
+            response_url, build = self._queue.get()
+            try:
+                try:
+                    payload = build()
+                except Exception as e:
+                    payload = {"text": f"❌ Error: {str(e)}"}
+                if self._deliver(response_url, payload):
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+            finally:
+                self._queue.task_done()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process-wide dispatcher, started on first use"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = ResponseDispatcher(
+                    workers=int(os.environ.get("SLACK_DEFERRED_WORKERS", "2")),
+                    max_pending=int(os.environ.get("SLACK_DEFERRED_QUEUE", "100")),
+                )
+    return _dispatcher
+
+
+def defer(response_url, build):
+    """Hand a response off to the background dispatcher if deferred mode is on
+
+    Returns True if the caller should just acknowledge the request.
+    """
+    if not response_url or not enabled():
+        return False
+    return get_dispatcher().submit(response_url, build)
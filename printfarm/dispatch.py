@@ -0,0 +1,93 @@
+# printfarm/dispatch.py
+"""
+Routing table for Slack interaction action ids
+Exact ids resolve with one dict lookup; prefixed ids ("confirm_print_<printer>")
+are parsed once by slicing per distinct prefix length, and the result is
+remembered so the next click on the same button is a single lookup too
+"""
+
+from printfarm.metrics import METRICS
+
+# Parsed prefixed ids we remember (one per button, e.g. actions x printers)
+MAX_ROUTES = 8192
+
+
+class ActionRouter:
+    """Dispatches interaction payloads to registered handler functions
+
+    Exact handlers are called as handler(payload, action); prefix handlers as
+    handler(payload, action, suffix), where suffix is the rest of the action id.
+    Unknown action ids are counted in `metrics` (printfarm_unknown_actions_total).
+    """
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self._exact = {}
+        self._routes = {}
+        self._prefixes = {}
+        self._prefix_lengths = ()
+        self._fallback = None
+
+    def action(self, *action_ids):
+        """Register a handler for one or more exact action ids"""
+        def register(handler):
+            for action_id in action_ids:
+                self._exact[action_id] = handler
+            self._routes.clear()
+            return handler
+        return register
+
+    def prefix(self, prefix):
+        """Register a handler for every action id starting with `prefix`"""
+        def register(handler):
+            self._prefixes[prefix] = handler
+            # Longest first, so the most specific prefix wins
+            self._prefix_lengths = tuple(sorted({len(p) for p in self._prefixes}, reverse=True))
+            self._routes.clear()
+            return handler
+        return register
+
+    def fallback(self, handler):
+        """Register the handler for unknown action ids"""
+        self._fallback = handler
+        return handler
+
+    def resolve(self, action_id):
+        """Return (handler, suffix) for an action id; suffix is None for exact matches"""
+        route = self._routes.get(action_id)
+        if route is not None:
+            return route
+        handler = self._exact.get(action_id)
+        if handler is not None:
+            route = (handler, None)
+        else:
+            for length in self._prefix_lengths:
+                handler = self._prefixes.get(action_id[:length])
+                if handler is not None:
+                    route = (handler, action_id[length:])
+                    break
+            else:
+                return None, None
+        if len(self._routes) < MAX_ROUTES:
+            self._routes[action_id] = route
+        return route
+
+    def label(self, action_id):
+        """A bounded name for metrics: the exact id, "prefix*" or "(unknown)" """
+        handler, suffix = self.resolve(action_id)
+        if handler is None:
+            return "(unknown)"
+        return action_id if suffix is None else action_id[:len(action_id) - len(suffix)] + "*"
+
+    def dispatch(self, payload):
+        """Run the handler for the payload's first action and return its response"""
+        action = payload['actions'][0]
+        handler, suffix = self.resolve(action['action_id'])
+        if handler is None:
+            self.metrics.unknown_action(action['action_id'])
+            if self._fallback is None:
+                raise KeyError(f"no handler for action '{action['action_id']}'")
+            return self._fallback(payload, action)
+        if suffix is None:
+            return handler(payload, action)
+        return handler(payload, action, suffix)
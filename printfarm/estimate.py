@@ -0,0 +1,188 @@
+# printfarm/estimate.py
+"""
+Time and cost estimates for running prints
+Remaining time comes from the printer's own progress rate, smoothed over
+recent samples; until there are enough samples it falls back to what the
+printer reports, then to the slicer's estimate. Cost is filament (grams x
+price) plus machine time (hours x rate), with a markup per client type.
+
+Per-file baselines (slicer time and grams) come from the catalog index,
+which refreshes in the background, so an estimate never scans the library.
+They are memoized per file version, and estimate_fleet() estimates every
+printing printer in one pass with a single catalog lookup.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from printfarm import catalog
+from printfarm.scheduler import SCHEDULER
+from printfarm.state import FLEET
+
+FILAMENT_PRICE_PER_KG = float(os.environ.get("PRINTFARM_FILAMENT_PRICE", "25"))
+MACHINE_RATE_PER_HOUR = float(os.environ.get("PRINTFARM_MACHINE_RATE", "2"))
+
+# Multiplier on the total per client type (unknown types pay the internal rate)
+CLIENT_MARKUP = {"internal": 1.0, "external": 1.5}
+
+# Used when the file is not in the catalog, so its filament weight is unknown
+GRAMS_PER_HOUR = 12.0
+
+# Weight of the newest rate sample in the moving average
+SMOOTHING = 0.3
+
+# Samples closer together than this are folded into the next one
+MIN_SAMPLE_INTERVAL = 5.0
+
+# Baselines memoized before the memo starts over
+MAX_BASELINES = 4096
+
+Baseline = namedtuple("Baseline", "minutes grams")
+Estimate = namedtuple("Estimate", "remaining cost basis")
+
+_baselines = {}   # (path, mtime_ns) -> Baseline
+_baselines_lock = threading.Lock()
+
+
+def file_baseline(entry):
+    """Slicer minutes and grams for a catalog entry, memoized per file version"""
+    key = (entry.path, entry.mtime_ns)
+    baseline = _baselines.get(key)
+    if baseline is None:
+        baseline = Baseline(round(entry.print_time / 60) if entry.print_time else None, entry.filament_grams)
+        with _baselines_lock:
+            if len(_baselines) >= MAX_BASELINES:
+                _baselines.clear()
+            _baselines[key] = baseline
+    return baseline
+
+
+def baseline_for(file, library=None):
+    """Baseline for a job's file, or None if the catalog does not know it
+
+    Pass `library` (the catalog) when looking up many files at once.
+    """
+    if not file:
+        return None
+    library = catalog.get_catalog() if library is None else library
+    entry = library.get(file) if library is not None else None
+    return file_baseline(entry) if entry is not None else None
+
+
+def job_cost(minutes, grams, client_type):
+    """Filament plus machine time, marked up for the client type"""
+    if grams is None:
+        grams = minutes / 60 * GRAMS_PER_HOUR
+    cost = grams / 1000 * FILAMENT_PRICE_PER_KG + minutes / 60 * MACHINE_RATE_PER_HOUR
+    return cost * CLIENT_MARKUP.get(client_type, 1.0)
+
+
+class ProgressRates:
+    """Smoothed progress rate (percent per minute) per printer, fed by fleet changes"""
+
+    def __init__(self, fleet=FLEET, clock=time.time):
+        self.clock = clock
+        self._samples = {}   # printer id -> (time, progress, job, rate or None)
+        self._lock = threading.Lock()
+        fleet.subscribe(self._on_change)
+
+    def _on_change(self, old, new):
+        if new is None or new.status != "printing":
+            if old is not None:
+                with self._lock:
+                    self._samples.pop(old.id, None)
+            return
+        now = self.clock()
+        with self._lock:
+            sample = self._samples.get(new.id)
+            if sample is None or sample[2] != new.current_job or new.progress < sample[1]:
+                # New job (or a restart): start over
+                self._samples[new.id] = (now, new.progress, new.current_job, None)
+                return
+            then, progress, job, rate = sample
+            if new.progress == progress or now - then < MIN_SAMPLE_INTERVAL:
+                return
+            latest = (new.progress - progress) / ((now - then) / 60)
+            rate = latest if rate is None else rate + SMOOTHING * (latest - rate)
+            self._samples[new.id] = (now, new.progress, job, rate)
+
+    def rate(self, printer_id):
+        sample = self._samples.get(printer_id)
+        return sample[3] if sample is not None else None
+
+    def snapshot(self, printer_ids):
+        """{printer id: rate or None} for the given printers, read under one lock"""
+        with self._lock:
+            samples = self._samples
+            return {printer_id: samples[printer_id][3] for printer_id in printer_ids if printer_id in samples}
+
+
+RATES = ProgressRates()
+
+
+def _estimate(pct, device, rate, base, client, spent):
+    """Progress %, printer-reported minutes, smoothed rate, baseline, client type, minutes so far"""
+    if rate and rate > 0:
+        remaining, basis = (100 - pct) / rate, "progress rate"
+    elif device:
+        remaining, basis = device, "printer"
+    elif base is not None and base.minutes:
+        remaining, basis = base.minutes * (100 - pct) / 100, "slicer"
+    else:
+        remaining, basis = None, None
+
+    # Whole-job minutes: the slicer's figure if known, else time so far plus time left
+    if base is not None and base.minutes:
+        total = base.minutes
+    elif remaining is not None:
+        total = (spent if spent is not None else remaining * pct / max(100 - pct, 1)) + remaining
+    else:
+        total = None
+    cost = job_cost(total, base.grams if base else None, client) if total else None
+    return Estimate(round(remaining) if remaining is not None else None, cost, basis)
+
+
+def estimate_fleet(fleet=FLEET, scheduler=SCHEDULER, rates=RATES, now=None, printers=None):
+    """{printer id: Estimate} for every printing printer (or those of `printers`), in one pass
+
+    The catalog is looked up once and the rates are read under one lock,
+    however many printers are printing.
+    """
+    printing = [p for p in printers if p.status == "printing"] if printers is not None \
+        else fleet.select(status="printing")
+    if not printing:
+        return {}
+    now = time.time() if now is None else now
+    library = catalog.get_catalog()
+    current = rates.snapshot([p.id for p in printing])
+    estimates = {}
+    for printer in printing:
+        job = scheduler.running(printer.id)
+        estimates[printer.id] = _estimate(
+            printer.progress,
+            printer.time_remaining,
+            current.get(printer.id),
+            baseline_for(job.file if job else printer.current_job, library),
+            job.client_type if job else "internal",
+            (now - job.started_at) / 60 if job and job.started_at else None,
+        )
+    return estimates
+
+
+def estimate_printer(printer_id, fleet=FLEET, scheduler=SCHEDULER, rates=RATES, now=None):
+    """Estimate for one printer (None unless it is printing)"""
+    printer = fleet.get(printer_id)
+    if printer is None or printer.status != "printing":
+        return None
+    now = time.time() if now is None else now
+    job = scheduler.running(printer_id)
+    return _estimate(
+        printer.progress,
+        printer.time_remaining,
+        rates.rate(printer_id),
+        baseline_for(job.file if job else printer.current_job),
+        job.client_type if job else "internal",
+        (now - job.started_at) / 60 if job and job.started_at else None,
+    )
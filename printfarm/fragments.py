@@ -0,0 +1,65 @@
+# printfarm/fragments.py
+"""
+JSON encoding with pre-encoded fragments
+Constant blocks are wrapped in Fragment once at import; dumps() splices their
+bytes into the response and only runs json.dumps over the parts that change.
+The output is byte-for-byte what json.dumps(response).encode() would give.
+"""
+
+import json
+
+
+class Fragment:
+    """A JSON value encoded once; dumps() copies its bytes instead of re-encoding"""
+
+    __slots__ = ("value", "encoded")
+
+    def __init__(self, value):
+        self.value = value
+        self.encoded = json.dumps(value).encode()
+
+    def __repr__(self):
+        return f"Fragment({self.encoded[:40]!r}...)"
+
+
+def dumps(response):
+    """Encode a response dict to bytes, splicing in fragments
+
+    Fragments may appear as values of the top-level dict or as items of its
+    lists (the "blocks"), which is where the constant parts of a Slack
+    message live; anything else goes through one json.dumps call per item.
+    """
+    if isinstance(response, bytes):
+        return response
+    if isinstance(response, Fragment):
+        return response.encoded
+    if not isinstance(response, dict):
+        return json.dumps(response).encode()
+    chunks = [b"{"]
+    for key, value in response.items():
+        if len(chunks) > 1:
+            chunks.append(b", ")
+        chunks.append(json.dumps(str(key)).encode() + b": ")
+        if isinstance(value, Fragment):
+            chunks.append(value.encoded)
+        elif isinstance(value, list):
+            chunks.append(b"[")
+            for i, item in enumerate(value):
+                if i:
+                    chunks.append(b", ")
+                chunks.append(item.encoded if isinstance(item, Fragment) else json.dumps(item).encode())
+            chunks.append(b"]")
+        else:
+            chunks.append(json.dumps(value).encode())
+    chunks.append(b"}")
+    return b"".join(chunks)
+
+
+def send_json(handler, status, response):
+    """Answer a BaseHTTPRequestHandler request with a JSON body in one write"""
+    body = dumps(response)
+    handler.send_response(status)
+    handler.send_header('Content-type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
@@ -0,0 +1,353 @@
+# printfarm/history.py
+"""
+Print history for /print stats
+An append-only log of job events (start, pause, resume, finish, error) read
+off fleet changes. Each column is its own typed array, and who printed what
+is one small integer per row: a code for the (printer, user, client type)
+triple. A year of events is a few MB, and a report is a grouped sum over one
+time slice keyed by that code, rolled up per printer, user and client type at
+the end. Closing events (pause, finish, error) carry the printing seconds
+since the matching start or resume, so utilization needs no pairing. A
+printer that drops offline mid-job is logged as paused until it reports again.
+
+Opt in to keeping the log across restarts with PRINTFARM_HISTORY, a
+directory that gets one file per column (appended to as events happen) plus
+the code tables in names.json. Each process reports from its own log, so
+point a single long-running process at the directory.
+"""
+
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from itertools import compress
+
+from printfarm.scheduler import SCHEDULER
+from printfarm.state import FLEET
+
+EVENTS = ("start", "pause", "resume", "finish", "error")
+START, PAUSE, RESUME, FINISH, ERROR = range(len(EVENTS))
+
+# Column name -> array typecode (also the file name in PRINTFARM_HISTORY)
+COLUMNS = (
+    ("times", "d"),      # unix time, never decreasing
+    ("events", "B"),     # index into EVENTS
+    ("keys", "I"),       # (printer, user, client type) code
+    ("seconds", "f"),    # printing time a pause/finish/error closes (0 otherwise)
+)
+
+DAY = 24 * 3600
+
+Totals = namedtuple("Totals", "seconds jobs errors")
+Stats = namedtuple("Stats", "since until printers users clients")
+
+
+class _Codes:
+    """Values <-> small integer codes for one table"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _group_sum(codes, values, size):
+    """Sum values per code (codes are small ints, so the totals are a list)"""
+    totals = [0.0] * size
+    for code, value in zip(codes, values):
+        totals[code] += value
+    return totals
+
+
+class History:
+    """Columnar job event log, fed by fleet changes"""
+
+    def __init__(self, fleet=FLEET, scheduler=SCHEDULER, path=None, clock=time.time):
+        self.scheduler = scheduler
+        self.path = path
+        self.clock = clock
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.printer_codes = _Codes()
+        self.user_codes = _Codes()
+        self.client_codes = _Codes()
+        self.key_codes = _Codes()   # (printer code, user code, client code)
+        self.longest = 0.0          # longest interval in the log (how far back a window can reach)
+        self._open = {}             # printer id -> (printing since or None if paused, key code)
+        self._files = None
+        self._saved = 0
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+        fleet.subscribe(self._on_change)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _on_change(self, old, new):
+        if new is None:
+            return
+        was = old.status if old is not None else None
+        if was == new.status:
+            return
+        job_open = new.id in self._open
+        if new.status == "printing":
+            self.record(RESUME if job_open else START, new)
+        elif new.status in ("paused", "offline"):
+            # Offline is a gap in what we hear, not the end of the job: it pauses the
+            # printing time, and the job resumes or ends when the printer reports again
+            if was == "printing":
+                self.record(PAUSE, new)
+        elif job_open:
+            self.record(FINISH if new.status == "available" else ERROR, new)
+
+    def _key(self, printer):
+        """Code for who is printing on `printer` (the scheduler's job if it started one)"""
+        job = self.scheduler.running(printer.id)
+        user = printer.started_by or (job.submitted_by if job else None) or "unknown"
+        return self.key_codes.code((
+            self.printer_codes.code(printer.id),
+            self.user_codes.code(user),
+            self.client_codes.code(job.client_type if job else "internal"),
+        ))
+
+    def record(self, event, printer, at=None):
+        """Append one event for a printer record (user and client are the ones it started with)"""
+        at = self.clock() if at is None else at
+        with self._lock:
+            if self.times and at < self.times[-1]:
+                at = self.times[-1]
+            opened = self._open.pop(printer.id, None)
+            key = self._key(printer) if event == START or opened is None else opened[1]
+            seconds = 0.0
+            if event in (PAUSE, FINISH, ERROR) and opened is not None and opened[0] is not None:
+                seconds = at - opened[0]
+                self.longest = max(self.longest, seconds)
+            if event in (START, RESUME):
+                self._open[printer.id] = (at, key)
+            elif event == PAUSE:
+                self._open[printer.id] = (None, key)
+            self._append((at, event, key, seconds))
+
+    def _append(self, row):
+        for (name, _), value in zip(COLUMNS, row):
+            getattr(self, name).append(value)
+        if self._files is not None:
+            if len(self.key_codes) != self._saved:
+                self._save_names()
+            for (_, typecode), value, f in zip(COLUMNS, row, self._files):
+                f.write(array(typecode, (value,)).tobytes())
+            for f in self._files:
+                f.flush()
+
+    # Persistence (PRINTFARM_HISTORY)
+
+    def _save_names(self):
+        """Write the code tables atomically, before any row that uses a new code"""
+        path = os.path.join(self.path, "names.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"printers": self.printer_codes.values, "users": self.user_codes.values,
+                       "clients": self.client_codes.values, "keys": self.key_codes.values}, f)
+        os.replace(tmp, path)
+        self._saved = len(self.key_codes)
+
+    def load(self):
+        """Read the saved columns (one read each) and reopen them for appending"""
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(os.path.join(self.path, "names.json"), encoding="utf-8") as f:
+                names = json.load(f)
+        except (OSError, ValueError):
+            names = {}
+        self.printer_codes = _Codes(names.get("printers", ()))
+        self.user_codes = _Codes(names.get("users", ()))
+        self.client_codes = _Codes(names.get("clients", ()))
+        self.key_codes = _Codes(map(tuple, names.get("keys", ())))
+        self._saved = len(self.key_codes)
+
+        for name, typecode in COLUMNS:
+            column = array(typecode)
+            try:
+                with open(os.path.join(self.path, name), "rb") as f:
+                    data = f.read()
+                column.frombytes(data[:len(data) - len(data) % column.itemsize])
+            except OSError:
+                pass
+            setattr(self, name, column)
+        # A crash mid-append can leave some columns one row longer
+        rows = min(len(getattr(self, name)) for name, _ in COLUMNS)
+        self._files = []
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            del column[rows:]
+            f = open(os.path.join(self.path, name), "ab")
+            f.truncate(rows * column.itemsize)
+            self._files.append(f)
+        self.longest = max(self.seconds, default=0.0)
+
+        # Printers still printing (or paused) when the log was written
+        seen = set()
+        for i in range(rows - 1, -1, -1):
+            key = self.keys[i]
+            printer_id = self.printer_codes.values[self.key_codes.values[key][0]]
+            if printer_id in seen:
+                continue
+            seen.add(printer_id)
+            if self.events[i] in (START, RESUME, PAUSE):
+                self._open[printer_id] = (self.times[i] if self.events[i] != PAUSE else None, key)
+            if len(seen) == len(self.printer_codes):
+                break
+
+    # Reports
+
+    def report(self, since, until=None, printer_ids=None):
+        """Printing seconds, jobs started and errors per printer, user and client type
+
+        Only time inside [since, until) counts: intervals that began before
+        `since` are clipped, and jobs still printing count up to `until`.
+        With `printer_ids`, only those printers' events are included.
+        """
+        until = self.clock() if until is None else until
+        with self._lock:
+            lo = bisect_left(self.times, since)
+            hi = bisect_left(self.times, until, lo)
+            edge = bisect_left(self.times, since + self.longest, lo, hi)
+            head = list(zip(self.times[lo:edge], self.keys[lo:edge], self.seconds[lo:edge]))
+            events, keys, seconds = self.events[lo:hi], self.keys[lo:hi], self.seconds[lo:hi]
+            still_open = [opened for opened in self._open.values() if opened[0] is not None]
+            printers, users, clients = self.printer_codes.values[:], self.user_codes.values[:], self.client_codes.values[:]
+            triples = self.key_codes.values[:]
+
+        if printer_ids is not None:
+            allowed = {key for key, triple in enumerate(triples) if printers[triple[0]] in printer_ids}
+            mask = list(map(allowed.__contains__, keys))
+            events, keys, seconds = (list(compress(column, mask)) for column in (events, keys, seconds))
+            head = [row for row in head if row[1] in allowed]
+            still_open = [opened for opened in still_open if opened[1] in allowed]
+
+        # One grouped sum over the closing rows, C-level counts of the start and error rows
+        busy = _group_sum(compress(keys, seconds), filter(None, seconds), len(triples))
+        starts = Counter(compress(keys, map(START.__eq__, events)))
+        failures = Counter(compress(keys, map(ERROR.__eq__, events)))
+
+        # Intervals that began before the window only count from `since`
+        for t, key, s in head:
+            if s and t - s < since:
+                busy[key] -= since - (t - s)
+        # Jobs still printing count up to `until`
+        for started, key in still_open:
+            if started < until:
+                busy[key] += until - max(started, since)
+
+        groups = ({}, {}, {})
+        for key, triple in enumerate(triples):
+            jobs, errors = starts[key], failures[key]
+            if not (busy[key] or jobs or errors):
+                continue
+            for group, labels, code in zip(groups, (printers, users, clients), triple):
+                label = labels[code]
+                total = group.get(label)
+                group[label] = Totals(busy[key], jobs, errors) if total is None else Totals(
+                    total.seconds + busy[key], total.jobs + jobs, total.errors + errors)
+        return Stats(since, until, *groups)
+
+    def close(self):
+        if self._files:
+            for f in self._files:
+                f.close()
+            self._files = None
+
+
+def _hours(seconds):
+    return f"{seconds / 3600:.1f} h"
+
+
+def _count(n, noun):
+    return f"{n} {noun}{'s' if n != 1 else ''}"
+
+
+# Slack rejects section text longer than this
+SECTION_TEXT_LIMIT = 3000
+
+# Utilization sections at most (the message must also stay under 50 blocks)
+MAX_PRINTER_SECTIONS = 10
+
+
+def _printer_sections(lines, max_sections=MAX_PRINTER_SECTIONS):
+    """The utilization lines as mrkdwn sections, each under Slack's length limit"""
+    texts = ["*🖨️ Utilization*"]
+    shown = 0
+    for line in lines or ["No printers"]:
+        if len(texts[-1]) + 1 + len(line) > SECTION_TEXT_LIMIT - 40:
+            if len(texts) == max_sections:
+                break
+            texts.append(line)
+        else:
+            texts[-1] += "\n" + line
+        shown += 1
+    if shown < len(lines):
+        texts[-1] += f"\n…and {_count(len(lines) - shown, 'more printer')}"
+    return [{"type": "section", "text": {"type": "mrkdwn", "text": text}} for text in texts]
+
+
+def stats_message(days=7, printer_ids=None, fleet=FLEET, history=None):
+    """Slack message for /print stats: utilization per printer, hours per user and client type"""
+    history = history or HISTORY
+    until = history.clock()
+    stats = history.report(until - days * DAY, until, printer_ids)
+    window = until - stats.since
+
+    printers = []
+    for printer in fleet:
+        if printer_ids is not None and printer.id not in printer_ids:
+            continue
+        totals = stats.printers.get(printer.id, Totals(0.0, 0, 0))
+        line = (f"*{printer.name}* · {totals.seconds / window:.0%} utilized · "
+                f"{_hours(totals.seconds)} · {_count(totals.jobs, 'job')}")
+        if totals.errors:
+            line += f" · {_count(totals.errors, 'error')}"
+        printers.append(line)
+
+    top_users = sorted(stats.users.items(), key=lambda item: -item[1].seconds)[:10]
+    users = [f"{user} · {_hours(totals.seconds)} · {_count(totals.jobs, 'job')}" for user, totals in top_users]
+    clients = [f"{client} · {_hours(totals.seconds)} · {_count(totals.jobs, 'job')}"
+               for client, totals in sorted(stats.clients.items())]
+
+    return {
+        "response_type": "ephemeral",
+        "blocks": [
+            {
+                "type": "header",
+                "text": {"type": "plain_text", "text": f"📈 Printer stats - last {_count(days, 'day')}"}
+            },
+            *_printer_sections(printers),
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": "*👤 Hours by user*\n" + ("\n".join(users) or "No prints yet")}
+            },
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": "*💼 Hours by client type*\n" + ("\n".join(clients) or "No prints yet")}
+            },
+            {
+                "type": "context",
+                "elements": [{"type": "mrkdwn", "text": f"{len(history)} events recorded"}]
+            }
+        ]
+    }
+
+
+HISTORY = History(path=os.environ.get("PRINTFARM_HISTORY") or None)
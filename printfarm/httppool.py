@@ -0,0 +1,112 @@
+# printfarm/httppool.py
+"""
+Keep-alive connections for outbound HTTP (Slack's Web API and response_urls)
+urlopen opens a new connection, and a new TLS handshake, for every call.
+The pool keeps a few idle connections per host and reuses them. A warm
+process (printfarm/server.py) then talks to Slack over connections that are
+already open. Errors look like urlopen's: a 4xx/5xx raises
+urllib.error.HTTPError and network failures raise OSError.
+"""
+
+import io
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+# Idle connections kept per host, and how long one may sit unused
+MAX_IDLE = 4
+IDLE_TIMEOUT = 50.0
+
+Response = namedtuple("Response", "status headers body")
+
+
+class ConnectionPool:
+    """Idle http.client connections by (scheme, host, port), safe to share between threads"""
+
+    def __init__(self, max_idle=MAX_IDLE, idle_timeout=IDLE_TIMEOUT, clock=time.monotonic):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.opened = 0
+        self.reused = 0
+        self._idle = {}   # (scheme, host, port) -> [(connection, idle since)]
+        self._lock = threading.Lock()
+
+    def _connect(self, key, timeout):
+        import http.client  # imported lazily: most invocations never call out
+
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self.opened += 1
+        return cls(host, port, timeout=timeout)
+
+    def _get(self, key, timeout):
+        """An idle connection for `key` (reused=True) or a new one"""
+        now = self.clock()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, since = idle.pop()
+                if now - since < self.idle_timeout:
+                    self.reused += 1
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        return self._connect(key, timeout), False
+
+    def _put(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((conn, self.clock()))
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=5.0):
+        """Send one request and read the whole response; returns a Response"""
+        import http.client
+        import urllib.error
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._get(key, timeout)
+            try:
+                conn.request(method, target, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    continue   # the server dropped the idle connection before we sent; try a fresh one
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._put(key, conn)
+            if resp.status >= 400:
+                raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(data))
+            return Response(resp.status, resp.headers, data)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                conn.close()
+
+    def stats(self):
+        with self._lock:
+            idle = sum(len(connections) for connections in self._idle.values())
+        return {"opened": self.opened, "reused": self.reused, "idle": idle}
+
+
+POOL = ConnectionPool()
@@ -0,0 +1,121 @@
+# printfarm/idempotency.py
+"""
+Duplicate delivery suppression for Slack retries
+Slack retries a request it got no answer to within 3 seconds (with an
+X-Slack-Retry-Num header), so a slow confirm_print_* could start two jobs.
+Each request's trigger_id / action_ts is claimed here before it is handled:
+the first delivery runs, later ones get its encoded response back without
+running anything. A duplicate that arrives while the first is still running
+waits for it, up to just under Slack's timeout.
+
+Keys live in a bounded LRU with a TTL that outlasts Slack's retry schedule
+(immediately, after 1 minute, after 5 minutes); a failed request is
+forgotten so its retry runs again.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 4096
+TTL = 600.0
+
+# How long a duplicate waits for the first delivery's response before
+# acknowledging with an empty body (Slack gives up after 3 s)
+WAIT = 2.5
+
+
+def interaction_key(payload):
+    """Slack's ids for one interaction, or None for ones that are safe to repeat"""
+    if payload.get('type') == 'block_suggestion':
+        return None
+    trigger_id = payload.get('trigger_id')
+    action_ts = (payload.get('actions') or [{}])[0].get('action_ts')
+    if not trigger_id and not action_ts:
+        return None
+    return ("action", trigger_id, action_ts)
+
+
+def command_key(fields):
+    """Slack's id for one slash command, or None if it did not send one"""
+    trigger_id = fields.get('trigger_id')
+    return ("command", trigger_id) if trigger_id else None
+
+
+class ResponseStore:
+    """Bounded TTL + LRU map of request key -> encoded response, with in-flight tracking"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, wait=WAIT, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait = wait
+        self.clock = clock
+        self.duplicates = 0
+        self._entries = OrderedDict()   # key -> [expires, body or None while running, Event]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def claim(self, key):
+        """None if the caller owns `key` and must handle the request, else the response to replay
+
+        The replayed response is the first delivery's body, or b"" if that
+        one is still running after `wait` seconds.
+        """
+        deadline = None
+        while True:
+            with self._lock:
+                now = self.clock()
+                entry = self._entries.get(key)
+                if entry is None or entry[0] < now:
+                    self._entries[key] = [now + self.ttl, None, threading.Event()]
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        _, evicted = self._entries.popitem(last=False)
+                        evicted[2].set()
+                    return None
+                self._entries.move_to_end(key)
+                body, done = entry[1], entry[2]
+                if body is not None:
+                    self.duplicates += 1
+                    return body
+            # Still running: wait for it, then look again (it may have failed)
+            if deadline is None:
+                deadline = time.monotonic() + self.wait
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not done.wait(remaining):
+                with self._lock:
+                    self.duplicates += 1
+                return b""
+
+    def complete(self, key, body):
+        """Remember the encoded response for `key` and wake any waiting duplicates"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Evicted while running; keep it for later retries all the same
+                entry = self._entries[key] = [self.clock() + self.ttl, None, threading.Event()]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            entry[1] = body
+        entry[2].set()
+
+    def abandon(self, key):
+        """Forget a request that failed, so a retry handles it again"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[2].set()
+
+    def clear(self):
+        with self._lock:
+            entries, self._entries = self._entries, OrderedDict()
+        for entry in entries.values():
+            entry[2].set()
+
+    def stats(self):
+        return {"duplicates": self.duplicates, "entries": len(self._entries)}
+
+
+RESPONSES = ResponseStore()
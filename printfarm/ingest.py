@@ -0,0 +1,115 @@
+# printfarm/ingest.py
+"""
+Slack request intake shared by both endpoints
+Reads the body once, checks its size, verifies the X-Slack-Signature HMAC
+over the raw bytes and pulls out only the form fields a handler asks for
+
+Requests are refused (401) unless SLACK_SIGNING_SECRET is set. For local
+development, SLACK_ALLOW_UNSIGNED=1 accepts unsigned requests while no
+secret is configured; a warning goes to the log when the process starts.
+"""
+
+import hashlib
+import hmac
+import os
+import sys
+import time
+from urllib.parse import unquote_to_bytes
+
+# Slack's own payloads stay well below this; anything bigger is refused unread
+MAX_BODY_BYTES = int(os.environ.get("SLACK_MAX_BODY_BYTES", str(256 * 1024)))
+
+# Requests older (or newer) than this are treated as replays
+MAX_CLOCK_SKEW = 5 * 60
+
+
+class RequestRejected(Exception):
+    """A request we refuse before doing any work; carries the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def read_body(headers, rfile, max_bytes=MAX_BODY_BYTES):
+    """Read exactly Content-Length bytes, refusing missing, bad or oversized lengths"""
+    length = headers.get('Content-Length')
+    if length is None or not length.isdigit():
+        raise RequestRejected(411, "Content-Length required")
+    length = int(length)
+    if length > max_bytes:
+        raise RequestRejected(413, "Request body too large")
+    body = rfile.read(length)
+    if len(body) != length:
+        raise RequestRejected(400, "Truncated request body")
+    return body
+
+
+def allow_unsigned():
+    """Whether unsigned requests are accepted while no signing secret is set (development only)"""
+    return os.environ.get("SLACK_ALLOW_UNSIGNED", "") in ("1", "true", "yes")
+
+
+def verify_signature(headers, body, secret=None, now=None):
+    """Check X-Slack-Signature against the raw body
+
+    Without a signing secret every request is refused, unless allow_unsigned().
+    """
+    secret = secret if secret is not None else os.environ.get("SLACK_SIGNING_SECRET", "")
+    if not secret:
+        if allow_unsigned():
+            return
+        raise RequestRejected(401, "Slack signing secret not configured")
+    timestamp = headers.get('X-Slack-Request-Timestamp', '')
+    signature = headers.get('X-Slack-Signature', '')
+    if not timestamp.isdigit() or not signature:
+        raise RequestRejected(401, "Missing Slack signature")
+    if abs((now or time.time()) - int(timestamp)) > MAX_CLOCK_SKEW:
+        raise RequestRejected(401, "Stale Slack request")
+
+    mac = hmac.new(secret.encode(), b"v0:" + timestamp.encode() + b":", hashlib.sha256)
+    mac.update(body)
+    if not hmac.compare_digest("v0=" + mac.hexdigest(), signature):
+        raise RequestRejected(401, "Invalid Slack signature")
+
+
+def form_fields(body, names):
+    """Decode only the named fields of a form-encoded body into {name: str}
+
+    Scans the raw bytes for each `name=` pair and stops as soon as every
+    requested field is found; other fields are never decoded. The first
+    occurrence of a field wins, as with parse_qs(...)[name][0].
+    """
+    wanted = {name.encode(): name for name in names}
+    found = {}
+    start = 0
+    end = len(body)
+    while start < end and len(found) < len(wanted):
+        amp = body.find(b"&", start)
+        if amp < 0:
+            amp = end
+        eq = body.find(b"=", start, amp)
+        if eq >= 0:
+            name = wanted.get(body[start:eq])
+            if name is not None and name not in found:
+                try:
+                    found[name] = unquote_to_bytes(body[eq + 1:amp].replace(b"+", b" ")).decode("utf-8")
+                except UnicodeDecodeError:
+                    raise RequestRejected(400, f"Malformed form field '{name}'")
+        start = amp + 1
+    return found
+
+
+def read_form(handler, names):
+    """Read, size-check and verify a Slack request, then return the named form fields"""
+    body = read_body(handler.headers, handler.rfile)
+    verify_signature(handler.headers, body)
+    return form_fields(body, names)
+
+
+if not os.environ.get("SLACK_SIGNING_SECRET"):
+    if allow_unsigned():
+        print("printfarm: SLACK_ALLOW_UNSIGNED is on and no SLACK_SIGNING_SECRET is set; "
+              "Slack signatures are NOT verified", file=sys.stderr)
+    else:
+        print("printfarm: SLACK_SIGNING_SECRET is not set; every Slack request will be refused", file=sys.stderr)
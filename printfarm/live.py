@@ -0,0 +1,185 @@
+# printfarm/live.py
+"""
+Live dashboards: one posted message kept current with chat.update
+Fleet changes mark live messages dirty; each message is edited at most once
+per debounce window (so a burst of printer changes becomes one edit), and
+edits per channel go through a token bucket to stay under Slack's limits.
+
+Like the deferred mode, this needs a long-running process.
+"""
+
+import heapq
+import threading
+import time
+import traceback
+
+from printfarm import webapi
+from printfarm.dashboard import DEFAULT_QUERY, cached_page, create_timestamp_block
+from printfarm.state import FLEET
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    def take(self):
+        """Take a token; returns 0 on success, else seconds to wait"""
+        now = self.clock()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def block(self, seconds):
+        """Stop handing out tokens for a while (Slack sent Retry-After)"""
+        self.blocked_until = self.clock() + seconds
+
+
+class LiveMessage:
+    __slots__ = ("channel", "ts", "fleet", "query", "rendered", "expires", "scheduled")
+
+    def __init__(self, channel, ts, fleet, query, rendered, expires):
+        self.channel = channel
+        self.ts = ts
+        self.fleet = fleet           # the fleet (or a tenant's subset) this message shows
+        self.query = query
+        self.rendered = rendered     # JSON of the blocks last sent, to skip no-op edits
+        self.expires = expires
+        self.scheduled = False
+
+
+class LiveDashboards:
+    """Posts live dashboards and keeps them updated from fleet changes"""
+
+    def __init__(self, fleet=FLEET, debounce=2.0, rate=1.0, burst=3, lifetime=4 * 3600,
+                 api=webapi.call, clock=time.monotonic):
+        self.fleet = fleet
+        self.debounce = debounce
+        self.rate = rate
+        self.burst = burst
+        self.lifetime = lifetime
+        self.api = api
+        self.clock = clock
+        self.edits = 0
+        self.skipped = 0
+        self._messages = {}   # (channel, ts) -> LiveMessage
+        self._buckets = {}    # channel -> TokenBucket
+        self._due = []        # heap of (when, key)
+        self._cond = threading.Condition()
+        self._thread = None
+        fleet.subscribe(self._on_change)
+
+    def start(self, channel, query=DEFAULT_QUERY, fleet=None):
+        """Post a dashboard to `channel` and keep it live; returns the message ts
+
+        `fleet` may be a subset that follows the service's fleet (a tenant's printers).
+        """
+        fleet = self.fleet if fleet is None else fleet
+        blocks, rendered = cached_page(fleet, query)
+        result = self.api("chat.postMessage", {
+            "channel": channel,
+            "text": "3D Printer Farm Status",
+            "blocks": blocks + [create_timestamp_block()],
+        })
+        message = LiveMessage(result["channel"], result["ts"], fleet, query, rendered,
+                              self.clock() + self.lifetime)
+        with self._cond:
+            self._messages[(message.channel, message.ts)] = message
+            self._ensure_thread()
+        return message.ts
+
+    def stop(self, channel, ts):
+        with self._cond:
+            return self._messages.pop((channel, ts), None) is not None
+
+    def __len__(self):
+        return len(self._messages)
+
+    def _bucket(self, channel):
+        bucket = self._buckets.get(channel)
+        if bucket is None:
+            bucket = self._buckets[channel] = TokenBucket(self.rate, self.burst, self.clock)
+        return bucket
+
+    def _schedule(self, key, delay):
+        heapq.heappush(self._due, (self.clock() + delay, key))
+        self._cond.notify()
+
+    def _on_change(self, old, new):
+        with self._cond:
+            for key, message in self._messages.items():
+                if not message.scheduled:
+                    # First change opens the debounce window; later ones fold into it
+                    message.scheduled = True
+                    self._schedule(key, self.debounce)
+
+    def _edit(self, message):
+        blocks, rendered = cached_page(message.fleet, message.query)
+        if rendered == message.rendered:
+            # Nothing this message shows has changed
+            self.skipped += 1
+            return
+        self.api("chat.update", {
+            "channel": message.channel,
+            "ts": message.ts,
+            "text": "3D Printer Farm Status",
+            "blocks": blocks + [create_timestamp_block()],
+        })
+        message.rendered = rendered
+        self.edits += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > self.clock():
+                    self._cond.wait(self._due[0][0] - self.clock() if self._due else None)
+                _, key = heapq.heappop(self._due)
+                message = self._messages.get(key)
+                if message is None:
+                    continue
+                if self.clock() > message.expires:
+                    del self._messages[key]
+                    continue
+                wait = self._bucket(message.channel).take()
+                if wait:
+                    self._schedule(key, wait)
+                    continue
+                message.scheduled = False
+
+            try:
+                self._edit(message)
+            except webapi.SlackApiError as e:
+                with self._cond:
+                    if e.retry_after:
+                        self._bucket(message.channel).block(e.retry_after)
+                        message.scheduled = True
+                        self._schedule(key, e.retry_after)
+                    elif e.error in ("message_not_found", "channel_not_found", "cant_update_message"):
+                        self._messages.pop(key, None)
+            except OSError:
+                with self._cond:
+                    message.scheduled = True
+                    self._schedule(key, self.debounce)
+            except Exception:
+                # A bug rendering or posting one message must not stop every live dashboard;
+                # the message is edited again on the next change
+                traceback.print_exc()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="live-dashboards", daemon=True)
+            self._thread.start()
+
+
+LIVE = LiveDashboards()
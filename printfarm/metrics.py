@@ -0,0 +1,194 @@
+# printfarm/metrics.py
+"""
+Request metrics for the Slack endpoints
+Request and error counters, latency histograms per action and per stage of
+do_POST (parse, state lookup, block building, encode, write), served in the
+Prometheus text format by the endpoints' do_GET. Caches registered with
+Metrics.cache() have their hit, miss and entry counts exported alongside.
+
+METRICS_SAMPLE_RATE (0 to 1, default 0.1) limits which requests get timed;
+counters always see every request. Timing every request (a rate of 1) costs
+several microseconds of bookkeeping each. Each Vercel instance keeps its own
+numbers.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Distinct unknown action ids counted separately; the rest share "(other)"
+MAX_UNKNOWN_IDS = 256
+
+# Share of requests whose latency and stages are timed
+SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "0.1"))
+
+# Upper bounds in seconds; one more bucket catches everything slower (+Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_current = threading.local()
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTimer:
+    """Times one request; stage(name) records the time since the previous mark"""
+
+    __slots__ = ("metrics", "endpoint", "label", "sampled", "start", "last", "stages")
+
+    def __init__(self, metrics, endpoint, sampled):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.label = "(unknown)"
+        self.sampled = sampled
+        self.stages = []
+        if sampled:
+            self.start = self.last = time.perf_counter()
+
+    def stage(self, name):
+        if self.sampled:
+            now = time.perf_counter()
+            self.stages.append((name, now - self.last))
+            self.last = now
+
+    def finish(self):
+        _current.timer = None
+        self.metrics._record(self, time.perf_counter() - self.start if self.sampled else None)
+
+
+def stage(name):
+    """Mark a stage of the request being handled on this thread (no-op outside one)"""
+    timer = getattr(_current, "timer", None)
+    if timer is not None:
+        timer.stage(name)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        # Deterministic sampling: time every Nth request
+        self.sample_every = round(1 / sample_rate) if sample_rate > 0 else 0
+        self._seen = 0
+        self._lock = threading.Lock()
+        self._requests = {}   # (endpoint, label) -> count
+        self._errors = {}     # (endpoint, kind) -> count
+        self._latency = {}    # (endpoint, label) -> Histogram
+        self._stages = {}     # (endpoint, stage) -> Histogram
+        self._caches = {}     # cache name -> its stats() method
+        self._unknown = {}    # unknown interaction action id -> count
+
+    def request(self, endpoint):
+        """Start timing a request; the timer also becomes this thread's current one"""
+        self._seen += 1
+        sampled = self.sample_every > 0 and self._seen % self.sample_every == 0
+        timer = _current.timer = RequestTimer(self, endpoint, sampled)
+        return timer
+
+    def error(self, endpoint, kind):
+        key = (endpoint, kind)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def unknown_action(self, action_id):
+        """Count an interaction whose action id no handler knows"""
+        with self._lock:
+            if action_id not in self._unknown and len(self._unknown) >= MAX_UNKNOWN_IDS:
+                action_id = "(other)"
+            self._unknown[action_id] = self._unknown.get(action_id, 0) + 1
+
+    def cache(self, name, stats):
+        """Export a cache's counters; `stats()` returns a dict with hits, misses and entries"""
+        self._caches[name] = stats
+
+    def _record(self, timer, elapsed):
+        key = (timer.endpoint, timer.label)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if elapsed is None:
+                return
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram()
+            histogram.observe(elapsed)
+            for name, seconds in timer.stages:
+                stage_key = (timer.endpoint, name)
+                histogram = self._stages.get(stage_key)
+                if histogram is None:
+                    histogram = self._stages[stage_key] = Histogram()
+                histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._errors.clear()
+            self._latency.clear()
+            self._stages.clear()
+            self._unknown.clear()
+
+    def render(self):
+        """Everything in the Prometheus text exposition format, as bytes"""
+        lines = []
+
+        def counter(name, help_text, label, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (endpoint, value), count in sorted(values.items()):
+                lines.append(f'{name}{{endpoint="{_escape(endpoint)}",{label}="{_escape(value)}"}} {count}')
+
+        def histogram(name, help_text, label, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (endpoint, value), h in sorted(values.items()):
+                labels = f'endpoint="{_escape(endpoint)}",{label}="{_escape(value)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        def cache_metric(name, kind, help_text, key, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for cache, stats in values:
+                lines.append(f'{name}{{cache="{_escape(cache)}"}} {stats[key]}')
+
+        # Caches take their own locks, so read them before taking ours
+        caches = sorted((name, stats()) for name, stats in list(self._caches.items()))
+        with self._lock:
+            counter("printfarm_requests_total", "Requests handled, by endpoint and action",
+                    "action", self._requests)
+            counter("printfarm_errors_total", "Failed requests, by endpoint and error kind",
+                    "kind", self._errors)
+            histogram("printfarm_request_seconds", "Sampled request latency, by endpoint and action",
+                      "action", self._latency)
+            histogram("printfarm_stage_seconds", "Sampled time per request stage",
+                      "stage", self._stages)
+            lines.append("# HELP printfarm_unknown_actions_total Interactions with an action id no handler knows")
+            lines.append("# TYPE printfarm_unknown_actions_total counter")
+            for action_id, count in sorted(self._unknown.items()):
+                lines.append(f'printfarm_unknown_actions_total{{action_id="{_escape(action_id)}"}} {count}')
+        cache_metric("printfarm_cache_hits_total", "counter", "Cache lookups answered from the cache", "hits", caches)
+        cache_metric("printfarm_cache_misses_total", "counter", "Cache lookups that had to build", "misses", caches)
+        cache_metric("printfarm_cache_entries", "gauge", "Entries held", "entries", caches)
+        return ("\n".join(lines) + "\n").encode()
+
+
+METRICS = Metrics()
@@ -0,0 +1,360 @@
+# printfarm/mqtt.py
+"""
+Real-time printer state from the Bambu local MQTT reports
+A long-running asyncio service keeps one MQTT connection per broker (each
+Bambu printer is its own broker on port 8883), subscribes to every printer's
+device/<serial>/report topic and folds the deltas into the shared fleet state.
+Bursts are coalesced: each printer gets at most one fleet update per interval.
+
+The client speaks just enough MQTT 3.1.1 for this (connect, subscribe,
+QoS 0 publish, keepalive) so there is no extra dependency.
+"""
+
+import asyncio
+import json
+import os
+import ssl
+import struct
+import threading
+
+from printfarm.state import FLEET
+
+BAMBU_PORT = 8883
+BAMBU_USERNAME = "bblp"
+
+# gcode_state from the printer -> our status
+GCODE_STATUS = {
+    "RUNNING": "printing",
+    "PREPARE": "printing",
+    "SLICING": "printing",
+    "PAUSE": "paused",
+    "FINISH": "available",
+    "IDLE": "available",
+    "FAILED": "error",
+}
+
+CONNECT, CONNACK, PUBLISH, PUBACK, SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = (
+    1, 2, 3, 4, 8, 9, 12, 13, 14)
+
+
+class MqttError(Exception):
+    """Protocol-level failure (refused connection, bad packet)"""
+
+
+def _encode_str(value):
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def _packet(kind, flags, body):
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+    return bytes([(kind << 4) | flags]) + bytes(encoded) + body
+
+
+async def _read_packet(reader):
+    header = await reader.readexactly(1)
+    length = 0
+    shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 21:
+            raise MqttError("malformed remaining length")
+    return header[0] >> 4, header[0] & 0x0F, await reader.readexactly(length)
+
+
+class MqttClient:
+    """Minimal asyncio MQTT 3.1.1 client (QoS 0 out, QoS 0/1 in)"""
+
+    def __init__(self, host, port=BAMBU_PORT, username=None, password=None, tls=True,
+                 client_id="printfarm", keepalive=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.tls = tls
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self._reader = None
+        self._writer = None
+        self._packet_id = 0
+
+    async def connect(self, timeout=10):
+        context = None
+        if self.tls:
+            # Bambu printers present a self-signed certificate
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), timeout)
+
+        flags = 0x02
+        payload = _encode_str(self.client_id)
+        if self.username is not None:
+            flags |= 0x80
+            payload += _encode_str(self.username)
+        if self.password is not None:
+            flags |= 0x40
+            payload += _encode_str(self.password)
+        body = _encode_str("MQTT") + bytes([4, flags]) + struct.pack("!H", self.keepalive) + payload
+        self._writer.write(_packet(CONNECT, 0, body))
+        await self._writer.drain()
+
+        kind, _, body = await asyncio.wait_for(_read_packet(self._reader), timeout)
+        if kind != CONNACK or len(body) < 2 or body[1] != 0:
+            raise MqttError(f"connection refused (code {body[1] if len(body) > 1 else '?'})")
+
+    async def subscribe(self, topics):
+        self._packet_id = self._packet_id % 65535 + 1
+        body = struct.pack("!H", self._packet_id) + b"".join(_encode_str(t) + b"\x00" for t in topics)
+        self._writer.write(_packet(SUBSCRIBE, 0x02, body))
+        await self._writer.drain()
+
+    async def publish(self, topic, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self._writer.write(_packet(PUBLISH, 0, _encode_str(topic) + payload))
+        await self._writer.drain()
+
+    async def messages(self):
+        """Yield (topic, payload) for incoming publishes, sending keepalive pings as needed"""
+        while True:
+            try:
+                kind, flags, body = await asyncio.wait_for(_read_packet(self._reader), self.keepalive / 2)
+            except asyncio.TimeoutError:
+                self._writer.write(_packet(PINGREQ, 0, b""))
+                await self._writer.drain()
+                continue
+            if kind == PUBLISH:
+                # A truncated packet or a topic that is not UTF-8 means the stream can't be trusted
+                try:
+                    (topic_length,) = struct.unpack_from("!H", body)
+                    if 2 + topic_length > len(body):
+                        raise MqttError("truncated PUBLISH topic")
+                    topic = body[2:2 + topic_length].decode()
+                    offset = 2 + topic_length
+                    packet_id = None
+                    if (flags >> 1) & 0x03:
+                        (packet_id,) = struct.unpack_from("!H", body, offset)
+                        offset += 2
+                except (struct.error, UnicodeDecodeError) as e:
+                    raise MqttError(f"malformed PUBLISH: {e}") from e
+                if packet_id is not None:
+                    self._writer.write(_packet(PUBACK, 0, struct.pack("!H", packet_id)))
+                yield topic, body[offset:]
+
+    async def close(self):
+        if self._writer is not None:
+            try:
+                self._writer.write(_packet(DISCONNECT, 0, b""))
+                self._writer.close()
+                await self._writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+            self._writer = None
+
+
+def fold_report(report):
+    """Translate one Bambu report delta into fleet fields (only what it mentions)
+
+    Raises ValueError or TypeError for values of the wrong type.
+    """
+    if not isinstance(report, dict):
+        return {}
+    data = report.get("print")
+    if not isinstance(data, dict):
+        return {}
+    fields = {}
+    if "gcode_state" in data:
+        fields["status"] = GCODE_STATUS.get(data["gcode_state"], "maintenance")
+    if "mc_percent" in data:
+        fields["progress"] = int(data["mc_percent"])
+    if "mc_remaining_time" in data:
+        fields["time_remaining"] = int(data["mc_remaining_time"])
+    if "subtask_name" in data:
+        fields["current_job"] = data["subtask_name"] or None
+    if data.get("print_error"):
+        fields["error"] = f"Printer error {data['print_error']}"
+    return fields
+
+
+class MqttIngest:
+    """Subscribes to every configured printer and keeps FLEET up to date
+
+    `printers` is a list of dicts with id, host, serial and access_code (and
+    optionally port/tls). Printers that share a broker share one connection.
+    """
+
+    def __init__(self, printers, fleet=FLEET, coalesce_interval=0.5, max_backoff=60.0):
+        self.fleet = fleet
+        self.coalesce_interval = coalesce_interval
+        self.max_backoff = max_backoff
+        self.messages = 0
+        self.updates = 0
+        self._by_serial = {p["serial"]: p for p in printers}
+        self._brokers = {}
+        for printer in printers:
+            key = (printer["host"], printer.get("port", BAMBU_PORT), printer.get("tls", True),
+                   printer.get("access_code"))
+            self._brokers.setdefault(key, []).append(printer)
+        self._pending = {}   # printer id -> merged fields not yet applied
+        self._clients = {}
+        self._tasks = []
+        self._loop = None
+        self._thread = None
+
+    def _merge(self, printer_id, fields):
+        self._pending.setdefault(printer_id, {}).update(fields)
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        for printer_id, fields in pending.items():
+            current = self.fleet.get(printer_id)
+            if current is None:
+                continue
+            if fields.get("status") == "available":
+                # Finished (or idle): the job moves to last_job
+                if current.status == "printing":
+                    fields["last_job"] = fields.get("current_job") or current.current_job
+                fields.update(current_job=None, progress=0, time_remaining=0)
+            if fields.get("status") not in (None, "error", "offline"):
+                fields.setdefault("error", None)
+            self.fleet.update(printer_id, **fields)
+            self.updates += 1
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.coalesce_interval)
+            self._flush()
+
+    async def _run_broker(self, key, printers):
+        host, port, tls, access_code = key
+        backoff = 1.0
+        while True:
+            client = MqttClient(host, port, username=BAMBU_USERNAME if access_code else None,
+                                password=access_code, tls=tls,
+                                client_id=f"printfarm-{os.getpid()}-{printers[0]['id']}")
+            self._clients[key] = client
+            try:
+                await client.connect()
+                await client.subscribe([f"device/{p['serial']}/report" for p in printers])
+                for printer in printers:
+                    # Ask for a full state dump; later reports are deltas
+                    await client.publish(f"device/{printer['serial']}/request",
+                                         json.dumps({"pushing": {"sequence_id": "0", "command": "pushall"}}))
+                backoff = 1.0
+                async for topic, payload in client.messages():
+                    self.messages += 1
+                    printer = self._by_serial.get(topic.split("/")[1] if topic.count("/") >= 2 else None)
+                    if printer is None:
+                        continue
+                    try:
+                        fields = fold_report(json.loads(payload))
+                    except (ValueError, TypeError):
+                        continue   # not JSON, or a field of the wrong type (e.g. "mc_percent": null)
+                    if fields:
+                        self._merge(printer["id"], fields)
+            except asyncio.CancelledError:
+                await client.close()
+                raise
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, MqttError) as e:
+                for printer in printers:
+                    self._merge(printer["id"], {"status": "offline", "error": f"MQTT: {str(e) or type(e).__name__}"})
+            await client.close()
+            self._clients.pop(key, None)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def publish(self, printer_id, payload):
+        """Send a request (e.g. a print command) to one printer over its broker connection"""
+        for key, printers in self._brokers.items():
+            for printer in printers:
+                if printer["id"] == printer_id:
+                    client = self._clients.get(key)
+                    if client is None:
+                        raise MqttError(f"{printer_id} is not connected")
+                    await client.publish(f"device/{printer['serial']}/request", json.dumps(payload))
+                    return True
+        return False
+
+    def publish_threadsafe(self, printer_id, payload, timeout=5.0):
+        """publish() from a thread other than the service's own loop"""
+        future = asyncio.run_coroutine_threadsafe(self.publish(printer_id, payload), self._loop)
+        return future.result(timeout)
+
+    async def run(self):
+        """Run until cancelled (one broker failing does not stop the others)"""
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._flusher())]
+        self._tasks += [asyncio.create_task(self._run_broker(key, printers))
+                        for key, printers in self._brokers.items()]
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    def _run_in_thread(self):
+        try:
+            self._loop.run_until_complete(self.run())
+        except asyncio.CancelledError:
+            pass
+
+    def start(self):
+        """Run the service on its own event loop thread"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_in_thread, name="mqtt-ingest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            for task in self._tasks:
+                self._loop.call_soon_threadsafe(task.cancel)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+
+def load_targets(path=None):
+    """Printers with MQTT details from the PRINTFARM_PRINTERS file
+
+    Entries need "serial" and "access_code"; "ip" is the broker host.
+    """
+    path = path or os.environ.get("PRINTFARM_PRINTERS")
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        printers = json.load(f)
+    return [
+        {
+            "id": p["id"],
+            "host": p.get("mqtt_host", p["ip"]),
+            "port": p.get("mqtt_port", BAMBU_PORT),
+            "tls": p.get("mqtt_tls", True),
+            "serial": p["serial"],
+            "access_code": p.get("access_code"),
+        }
+        for p in printers if p.get("serial")
+    ]
+
+
+if __name__ == "__main__":
+    from printfarm import alerts  # posts to PRINTFARM_ALERT_CHANNEL when it is set
+    targets = load_targets()
+    if not targets:
+        raise SystemExit("No printers with a serial in PRINTFARM_PRINTERS")
+    try:
+        asyncio.run(MqttIngest(targets).run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,139 @@
+# printfarm/poller.py
+"""
+Background poller that keeps the fleet state fresh
+Every printer is queried concurrently on a bounded thread pool; the Slack
+handlers only ever read the resulting FLEET snapshot and never touch the network
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from printfarm.state import FLEET
+
+# Fields a status query is allowed to change
+POLLED_FIELDS = ("status", "current_job", "progress", "time_remaining", "started_by", "last_job", "error")
+
+STATUS_PORT = int(os.environ.get("PRINTFARM_STATUS_PORT", "8080"))
+STATUS_PATH = os.environ.get("PRINTFARM_STATUS_PATH", "/status")
+
+
+def fetch_status(printer, timeout):
+    """Query one printer's status endpoint and return the polled fields
+
+    `printer.ip` may carry its own port ("10.0.0.5:9000"), which is handy for
+    pointing the poller at a local fake printer.
+    """
+    host = printer.ip if ":" in printer.ip else f"{printer.ip}:{STATUS_PORT}"
+    with urllib.request.urlopen(f"http://{host}{STATUS_PATH}", timeout=timeout) as resp:
+        data = json.loads(resp.read())
+    return {name: data[name] for name in POLLED_FIELDS if name in data}
+
+
+class Poller:
+    """Polls the whole fleet concurrently and folds results into a FleetState
+
+    - at most `max_connections` queries are in flight at once
+    - each query gets `timeout` seconds; a printer that is still hanging from a
+      previous round is skipped rather than queried twice
+    - printers that fail (or report offline) back off exponentially, up to
+      `max_backoff` seconds between attempts
+    """
+
+    def __init__(self, fleet=FLEET, fetch=fetch_status, interval=5.0, timeout=2.0,
+                 max_connections=16, max_backoff=300.0):
+        self.fleet = fleet
+        self.fetch = fetch
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="poller")
+        self._in_flight = set()
+        self._failures = {}   # printer id -> consecutive failures
+        self._next_due = {}   # printer id -> monotonic time of next attempt
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _backoff(self, printer_id, now):
+        failures = self._failures.get(printer_id, 0) + 1
+        self._failures[printer_id] = failures
+        delay = min(self.interval * (2 ** failures), self.max_backoff)
+        self._next_due[printer_id] = now + delay
+
+    def _query(self, printer):
+        try:
+            return printer, self.fetch(printer, self.timeout), None
+        except Exception as e:
+            return printer, None, e
+        finally:
+            self._in_flight.discard(printer.id)
+
+    def _apply(self, printer, fields, error, now):
+        if error is not None:
+            self.fleet.update(printer.id, status="offline", error=str(error) or type(error).__name__)
+            self._backoff(printer.id, now)
+            return
+        if fields.get("status", printer.status) != "offline":
+            fields.setdefault("error", None)
+        self.fleet.update(printer.id, **fields)
+        if fields.get("status") == "offline":
+            self._backoff(printer.id, now)
+        else:
+            self._failures.pop(printer.id, None)
+            self._next_due.pop(printer.id, None)
+
+    def poll_once(self):
+        """Run one polling round; returns the number of printers queried"""
+        now = time.monotonic()
+        due = [
+            printer for printer in self.fleet
+            if printer.id not in self._in_flight and self._next_due.get(printer.id, 0) <= now
+        ]
+        futures = []
+        for printer in due:
+            self._in_flight.add(printer.id)
+            futures.append(self._pool.submit(self._query, printer))
+
+        # Give the round one timeout (plus slack); stragglers are applied whenever they finish
+        done, pending = wait(futures, timeout=self.timeout + 0.5)
+        finished = time.monotonic()
+        for future in done:
+            self._apply(*future.result(), finished)
+        for future in pending:
+            future.add_done_callback(lambda f: self._apply(*f.result(), time.monotonic()))
+        return len(due)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """Poll in a background thread until stop() is called"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="fleet-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop polling and release the worker pool"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    from printfarm import alerts  # posts to PRINTFARM_ALERT_CHANNEL when it is set
+    poller = Poller().start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        poller.stop()
@@ -0,0 +1,271 @@
+# printfarm/scheduler.py
+"""
+Print job queue with a priority scheduler
+Jobs wait in binary heaps ordered by client type, deadline and estimated
+duration; whenever a printer becomes available the best waiting job that may
+run on it is started. A job may run on any printer, on any printer of a pool
+(say, a lab's printers of one model) or on one specific printer.
+
+Submitting, starting and cancelling cost O(log n) per heap a printer draws
+from; the queue views (pending() and position()) walk the heaps.
+"""
+
+import heapq
+import threading
+import time
+
+from printfarm.state import FLEET
+
+# Lower rank runs first
+CLIENT_PRIORITY = {"external": 0, "internal": 1}
+
+# Used for ordering when a job has no duration estimate yet
+DEFAULT_DURATION = 120
+
+NO_DEADLINE = float("inf")
+
+
+class Job:
+    """One print job
+
+    `printer_id` pins it to one printer; otherwise `pool` (a frozenset of
+    printer ids) limits where it may run, and None for both means any printer.
+    """
+
+    __slots__ = ("id", "file", "client_type", "deadline", "duration", "submitted_by",
+                 "project", "printer_id", "submitted_at", "state", "assigned_to", "started_at", "pool")
+
+    def __init__(self, id, file, client_type="internal", deadline=None, duration=None,
+                 submitted_by=None, project=None, printer_id=None, submitted_at=None, pool=None):
+        self.id = id
+        self.file = file
+        self.client_type = client_type
+        self.deadline = deadline
+        self.duration = duration
+        self.submitted_by = submitted_by
+        self.project = project
+        self.printer_id = printer_id
+        self.submitted_at = submitted_at
+        self.state = "queued"
+        self.assigned_to = None
+        self.started_at = None
+        self.pool = frozenset(pool) if pool is not None and printer_id is None else None
+
+    def sort_key(self):
+        return (
+            CLIENT_PRIORITY.get(self.client_type, len(CLIENT_PRIORITY)),
+            self.deadline if self.deadline is not None else NO_DEADLINE,
+            self.duration if self.duration is not None else DEFAULT_DURATION,
+        )
+
+    def __repr__(self):
+        return f"Job({self.id!r}, {self.file!r}, {self.state})"
+
+
+class Scheduler:
+    """Priority job queue that starts jobs as printers become available
+
+    Jobs for any printer share one heap, each pool has a heap, and jobs
+    pinned to a printer sit in that printer's heap. A free printer takes the
+    best top of its own heap, the shared heap and the heaps of its pools.
+    Cancelled jobs are dropped lazily when they reach the top of a heap.
+    """
+
+    def __init__(self, fleet=FLEET, clock=time.time):
+        self.fleet = fleet
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._listeners = []
+        self._shared = []
+        self._pinned = {}   # printer id -> heap
+        self._pools = {}    # pool (frozenset of printer ids) -> heap
+        self._pools_of = {} # printer id -> pools it belongs to
+        self._jobs = {}     # job id -> Job (queued or running)
+        self._running = {}  # printer id -> Job
+        self._queued = 0
+        fleet.subscribe(self._on_change)
+
+    def __len__(self):
+        """Number of jobs waiting"""
+        return self._queued
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def subscribe(self, listener):
+        """Call listener(job) whenever a job is queued, started, finished or cancelled"""
+        self._listeners.append(listener)
+        return listener
+
+    def _notify(self, job):
+        for listener in self._listeners:
+            listener(job)
+
+    def _heap_for(self, job):
+        if job.printer_id is not None:
+            return self._pinned.setdefault(job.printer_id, [])
+        if job.pool is None:
+            return self._shared
+        heap = self._pools.get(job.pool)
+        if heap is None:
+            heap = self._pools[job.pool] = []
+            for printer_id in job.pool:
+                self._pools_of.setdefault(printer_id, []).append(job.pool)
+        return heap
+
+    def _push(self, job, seq):
+        self._jobs[job.id] = job
+        heapq.heappush(self._heap_for(job), (job.sort_key(), seq, job))
+        self._queued += 1
+
+    def requeue(self, job):
+        """Put back a waiting job restored from storage (keeps its id and order)"""
+        with self._lock:
+            seq = int(job.id.rsplit("_", 1)[1])
+            self._seq = max(self._seq, seq)
+            job.state = "queued"
+            self._push(job, seq)
+
+    def submit(self, file, client_type="internal", deadline=None, duration=None,
+               submitted_by=None, project=None, printer_id=None, pool=None, prefer=None):
+        """Queue a job and start it right away if a suitable printer is free
+
+        An unpinned job starts on `prefer` when that printer is free and may
+        take it, else on the first free printer it may run on.
+        """
+        with self._lock:
+            self._seq += 1
+            job = Job(f"job_{self._seq}", file, client_type, deadline, duration,
+                      submitted_by, project, printer_id, self.clock(), pool)
+            self._push(job, self._seq)
+            self._notify(job)
+
+            if printer_id is None:
+                preferred = self.fleet.get(prefer) if prefer is not None else None
+                free = self.fleet.select(status="available")
+                if preferred is not None and preferred.status == "available":
+                    free.insert(0, preferred)
+                for printer in free:
+                    if job.pool is None or printer.id in job.pool:
+                        self.assign(printer.id)
+                        break
+            else:
+                printer = self.fleet.get(printer_id)
+                if printer is not None and printer.status == "available":
+                    self.assign(printer_id)
+            return job
+
+    def cancel(self, job_id):
+        """Cancel a waiting job (O(1); it is skipped when popped)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != "queued":
+                return False
+            job.state = "cancelled"
+            del self._jobs[job_id]
+            self._queued -= 1
+            self._notify(job)
+            return True
+
+    @staticmethod
+    def _top(heap):
+        while heap and heap[0][2].state != "queued":
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def assign(self, printer_id):
+        """Start the best waiting job on `printer_id`; returns the job or None"""
+        with self._lock:
+            pinned = self._pinned.get(printer_id, [])
+            heaps = [pinned, self._shared] + [self._pools[pool] for pool in self._pools_of.get(printer_id, ())]
+            candidates = [
+                (entry, heap) for heap in heaps
+                for entry in (self._top(heap),) if entry is not None
+            ]
+            if not candidates:
+                return None
+            _, heap = min(candidates, key=lambda c: c[0][:2])
+            _, _, job = heapq.heappop(heap)
+            if not pinned and printer_id in self._pinned:
+                del self._pinned[printer_id]
+            self._queued -= 1
+            job.state = "running"
+            job.assigned_to = printer_id
+            job.started_at = self.clock()
+            self._running[printer_id] = job
+            self._notify(job)
+
+            # Still under the lock, so no other job can grab the printer first
+            self.fleet.update(
+                printer_id,
+                status="printing",
+                current_job=job.file,
+                progress=0,
+                time_remaining=job.duration or 0,
+                started_by=job.submitted_by,
+                error=None,
+            )
+            return job
+
+    def finish(self, printer_id):
+        """Forget the running job on a printer (called when it stops printing)"""
+        with self._lock:
+            job = self._running.pop(printer_id, None)
+            if job is not None:
+                job.state = "done"
+                self._jobs.pop(job.id, None)
+                self._notify(job)
+            return job
+
+    def _on_change(self, old, new):
+        if new is None or new.status != "available":
+            return
+        if old is None or old.status != "available":
+            self.finish(new.id)
+            self.assign(new.id)
+
+    def running(self, printer_id):
+        """The job currently printing on a printer (None if it was not started here)"""
+        return self._running.get(printer_id)
+
+    def pending(self, limit=10, printer_ids=None):
+        """The next `limit` waiting jobs in priority order (pinned, pooled and shared)
+
+        With `printer_ids`, only the jobs that can only run on those printers.
+        This walks the heaps, so it is meant for the queue view, not the hot path.
+        """
+        with self._lock:
+            if printer_ids is None:
+                heaps = (self._shared, *self._pools.values(), *self._pinned.values())
+            else:
+                heaps = [self._pinned[p] for p in printer_ids if p in self._pinned]
+                heaps += [heap for pool, heap in self._pools.items() if pool <= printer_ids]
+            entries = [e for heap in heaps for e in heap if e[2].state == "queued"]
+            return [job for _, _, job in heapq.nsmallest(limit, entries, key=lambda e: e[:2])]
+
+    def position(self, job_id):
+        """1-based position of a waiting job among the waiting jobs that compete with it
+
+        A job competes when it may run on one of this job's printers: shared
+        jobs compete with everything, pooled and pinned jobs with the jobs
+        whose printers overlap theirs. None if the job is not waiting.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != "queued":
+                return None
+            key = (job.sort_key(), int(job.id.rsplit("_", 1)[1]))
+            printers = {job.printer_id} if job.printer_id is not None else job.pool
+            heaps = [self._shared]
+            if printers is None:
+                heaps += [*self._pools.values(), *self._pinned.values()]
+            else:
+                heaps += [heap for pool, heap in self._pools.items() if not printers.isdisjoint(pool)]
+                heaps += [self._pinned[p] for p in printers if p in self._pinned]
+            return 1 + sum(
+                1 for heap in heaps for e in heap
+                if e[2].state == "queued" and e[:2] < key
+            )
+
+SCHEDULER = Scheduler()
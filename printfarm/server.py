@@ -0,0 +1,262 @@
+# printfarm/server.py
+"""
+Small asyncio HTTP/1.1 server for the ASGI app (stdlib only)
+Runs printfarm.asgi.app in one warm process: keep-alive connections, request
+bodies read by Content-Length, and responses either sized or chunked. The
+app's pool of `workers` threads runs the handlers. They share the one fleet
+and cache, so this is one process with several threads, not one process per
+worker.
+
+SIGTERM or SIGINT stops the server gracefully. It stops accepting, closes
+idle connections, and gives in-flight requests `grace` seconds to finish.
+The app's shutdown then flushes queued Slack responses, the store and the
+history before the process exits.
+
+Run: python -m printfarm.server [--host 0.0.0.0] [--port 8000] [--workers 8] [--grace 10]
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from http import HTTPStatus
+
+from printfarm import ingest
+
+# Limits on what a client may send before the app sees it
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT = 5.0
+
+
+class Server:
+    """Serves one ASGI app over HTTP/1.1"""
+
+    def __init__(self, app, host="127.0.0.1", port=8000, grace=10.0, keepalive=KEEPALIVE_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.grace = grace
+        self.keepalive = keepalive
+        self.requests = 0
+        self.connections = 0
+        self.stopping = False
+        self._server = None
+        self._busy = set()       # connection tasks inside a request
+        self._idle = set()       # connection tasks waiting for the next request
+        self._lifespan = None
+        self._lifespan_queue = None
+        self._lifespan_done = None
+
+    # Lifespan (startup and shutdown of the app)
+
+    async def _start_lifespan(self):
+        self._lifespan_queue = asyncio.Queue()
+        self._lifespan_done = asyncio.Queue()
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+
+        async def send(message):
+            await self._lifespan_done.put(message)
+
+        self._lifespan = asyncio.create_task(self.app(scope, self._lifespan_queue.get, send))
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        message = await self._lifespan_done.get()
+        if message["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"app failed to start: {message.get('message', '')}")
+
+    async def _stop_lifespan(self):
+        await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+        await self._lifespan_done.get()
+        await self._lifespan
+
+    # Connections
+
+    async def _connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections += 1
+        client = writer.get_extra_info("peername")
+        server = writer.get_extra_info("sockname")
+        try:
+            while not self.stopping:
+                self._idle.add(task)
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.CancelledError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._simple(writer, 431, "Request headers too large")
+                    return
+                finally:
+                    self._idle.discard(task)
+
+                self._busy.add(task)
+                try:
+                    if not await self._request(head, reader, writer, client, server):
+                        return
+                finally:
+                    self._busy.discard(task)
+        except (ConnectionError, OSError, asyncio.CancelledError):
+            pass   # the client left, or shutdown cut the request off after the grace period
+        finally:
+            writer.close()
+
+    async def _simple(self, writer, status, text):
+        body = text.encode()
+        writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: text/plain\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _request(self, head, reader, writer, client, server):
+        """Serve one request; returns whether the connection can be kept open"""
+        try:
+            request_line, *lines = head[:-4].decode("latin-1").split("\r\n")
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            await self._simple(writer, 400, "Malformed request line")
+            return False
+        headers = []
+        for line in lines:
+            name, _, value = line.partition(":")
+            headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+        fields = dict(headers)
+
+        if b"chunked" in fields.get(b"transfer-encoding", b"").lower():
+            await self._simple(writer, 411, "Content-Length required")
+            return False
+        length = fields.get(b"content-length", b"0")
+        if not length.isdigit():
+            await self._simple(writer, 400, "Bad Content-Length")
+            return False
+        if int(length) > ingest.MAX_BODY_BYTES:
+            await self._simple(writer, 413, "Request body too large")
+            return False
+        body = await reader.readexactly(int(length))
+
+        keep_alive = version == "HTTP/1.1" and fields.get(b"connection", b"").lower() != b"close"
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": version.removeprefix("HTTP/"),
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "headers": headers,
+            "client": client[:2] if client else None,
+            "server": server[:2] if server else None,
+        }
+        received = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        state = {"chunked": False, "started": False}
+
+        async def send(message):
+            nonlocal keep_alive
+            if message["type"] == "http.response.start":
+                out = [f"HTTP/1.1 {message['status']} {HTTPStatus(message['status']).phrase}\r\n".encode()]
+                names = set()
+                for name, value in message.get("headers", ()):
+                    names.add(name.lower())
+                    out.append(name + b": " + value + b"\r\n")
+                if b"content-length" not in names and keep_alive:
+                    # Unsized (streamed) body: chunked, so the connection survives it
+                    state["chunked"] = True
+                    out.append(b"Transfer-Encoding: chunked\r\n")
+                if not keep_alive or self.stopping:
+                    keep_alive = False
+                    out.append(b"Connection: close\r\n")
+                writer.write(b"".join(out) + b"\r\n")
+                state["started"] = True
+            elif message["type"] == "http.response.body":
+                data = message.get("body", b"")
+                if state["chunked"]:
+                    if data:
+                        writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+                    if not message.get("more_body"):
+                        writer.write(b"0\r\n\r\n")
+                elif data:
+                    writer.write(data)
+                try:
+                    await writer.drain()
+                except (ConnectionError, OSError):
+                    disconnected.set()
+                    raise
+
+        self.requests += 1
+        try:
+            await self.app(scope, receive, send)
+        except (ConnectionError, OSError):
+            return False
+        except Exception:
+            import traceback
+
+            traceback.print_exc()
+            if not state["started"]:
+                await self._simple(writer, 500, "Internal Server Error")
+            return False
+        return keep_alive and not self.stopping
+
+    # Running
+
+    async def serve(self, stop=None):
+        """Serve until `stop` (an asyncio.Event) is set or a SIGTERM/SIGINT arrives"""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass   # not the main thread (or not supported here); `stop` still works
+
+        await self._start_lifespan()
+        self._server = await asyncio.start_server(self._connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"printfarm serving on http://{self.host}:{self.port}", file=sys.stderr)
+        try:
+            await stop.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Stop accepting, let in-flight requests finish (up to `grace` s), then shut the app down"""
+        self.stopping = True
+        self._server.close()
+        for task in list(self._idle):
+            task.cancel()
+        if self._busy:
+            _, late = await asyncio.wait(list(self._busy), timeout=self.grace)
+            for task in late:
+                task.cancel()
+            if late:
+                await asyncio.wait(late, timeout=1.0)
+        await self._server.wait_closed()
+        await self._stop_lifespan()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Slack endpoints from one process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="handler threads (PRINTFARM_WORKERS, 8)")
+    parser.add_argument("--grace", type=float, default=10.0, help="seconds in-flight requests get on shutdown")
+    args = parser.parse_args(argv)
+
+    from printfarm.asgi import app  # imported lazily: the app pulls in every endpoint
+
+    if args.workers:
+        app.workers = args.workers
+    asyncio.run(Server(app, args.host, args.port, args.grace).serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# printfarm/state.py
+"""
+Fleet state shared by every endpoint
+One record per printer, looked up by id, with a version counter so callers
+can read only what changed since their last look, and status/model indexes
+so filtered views never scan the whole fleet
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+PRINTER_FIELDS = (
+    "id",
+    "name",
+    "model",
+    "status",
+    "ip",
+    "current_job",
+    "progress",
+    "time_remaining",
+    "started_by",
+    "last_job",
+    "error",
+)
+
+
+class PrinterRecord:
+    """Compact, read-only snapshot of one printer"""
+
+    __slots__ = PRINTER_FIELDS + ("version",)
+
+    def __init__(self, id, name, model="", status="available", ip="",
+                 current_job=None, progress=0, time_remaining=0,
+                 started_by=None, last_job=None, error=None, version=0):
+        self.id = id
+        self.name = name
+        self.model = model
+        self.status = status
+        self.ip = ip
+        self.current_job = current_job
+        self.progress = progress
+        self.time_remaining = time_remaining
+        self.started_by = started_by
+        self.last_job = last_job
+        self.error = error
+        self.version = version
+
+    def evolve(self, version, **changes):
+        """Return a copy with some fields replaced"""
+        fields = {name: getattr(self, name) for name in PRINTER_FIELDS}
+        fields.update(changes)
+        return PrinterRecord(version=version, **fields)
+
+    def to_dict(self):
+        """Plain dict view (for JSON and debugging)"""
+        return {name: getattr(self, name) for name in PRINTER_FIELDS}
+
+    def __repr__(self):
+        return f"PrinterRecord({self.id!r}, status={self.status!r}, v{self.version})"
+
+
+class FleetState:
+    """In-memory printer store with O(1) lookup and versioned change tracking
+
+    Records are never mutated in place: an update swaps in a new record, so a
+    reader holding a record always sees a consistent printer.
+    """
+
+    def __init__(self, printers=()):
+        self._lock = threading.Lock()
+        self._printers = {}
+        # printer id -> version of its last change, oldest change first
+        self._changes = OrderedDict()
+        # Secondary indexes: status -> ids, model token -> ids, id -> display position
+        self._by_status = {}
+        self._by_model = {}
+        self._position = {}
+        self._next_position = 0
+        self._listeners = []
+        self.version = 0
+        for printer in printers:
+            self.upsert(printer)
+
+    def __len__(self):
+        return len(self._printers)
+
+    def __iter__(self):
+        return iter(list(self._printers.values()))
+
+    def __contains__(self, printer_id):
+        return printer_id in self._printers
+
+    def get(self, printer_id):
+        """Look up a printer record by id (None if unknown)"""
+        return self._printers.get(printer_id)
+
+    def ids(self):
+        """Printer ids in display order"""
+        return list(self._printers)
+
+    @staticmethod
+    def _model_tokens(model):
+        model = (model or "").lower()
+        return {model, *model.split()} if model else set()
+
+    def _index(self, record):
+        self._by_status.setdefault(record.status, set()).add(record.id)
+        for token in self._model_tokens(record.model):
+            self._by_model.setdefault(token, set()).add(record.id)
+
+    def _unindex(self, record):
+        ids = self._by_status.get(record.status)
+        if ids is not None:
+            ids.discard(record.id)
+            if not ids:
+                del self._by_status[record.status]
+        for token in self._model_tokens(record.model):
+            ids = self._by_model.get(token)
+            if ids is not None:
+                ids.discard(record.id)
+                if not ids:
+                    del self._by_model[token]
+
+    def _store(self, record):
+        previous = self._printers.get(record.id)
+        if previous is not None:
+            self._unindex(previous)
+        else:
+            self._position[record.id] = self._next_position
+            self._next_position += 1
+        self._printers[record.id] = record
+        self._index(record)
+
+    def _touch(self, printer_id):
+        self.version += 1
+        self._changes[printer_id] = self.version
+        self._changes.move_to_end(printer_id)
+        return self.version
+
+    def subscribe(self, listener):
+        """Call listener(old, new) after every change (old is None for new printers, new is None on removal)"""
+        self._listeners.append(listener)
+        return listener
+
+    def _notify(self, old, new):
+        for listener in self._listeners:
+            listener(old, new)
+
+    def upsert(self, printer, keep_version=False):
+        """Insert or replace a printer (a PrinterRecord or a plain dict)
+
+        keep_version stores another fleet's record as it is (see follow()),
+        and ignores it if an equal or newer version is already stored, since
+        notifications from the source can arrive out of order.
+        """
+        if isinstance(printer, dict):
+            printer = PrinterRecord(**{k: v for k, v in printer.items() if k in PRINTER_FIELDS})
+        with self._lock:
+            old = self._printers.get(printer.id)
+            if keep_version and old is not None and old.version >= printer.version:
+                return old
+            version = self._touch(printer.id)
+            record = printer if keep_version else printer.evolve(version)
+            self._store(record)
+        self._notify(old, record)
+        return record
+
+    def update(self, printer_id, **changes):
+        """Change some fields of one printer
+
+        Returns the new record, or None if the printer is unknown. An update
+        that changes nothing does not bump the version.
+        """
+        with self._lock:
+            current = self._printers.get(printer_id)
+            if current is None:
+                return None
+            if all(getattr(current, name) == value for name, value in changes.items()):
+                return current
+            version = self._touch(printer_id)
+            record = current.evolve(version, **changes)
+            self._store(record)
+        self._notify(current, record)
+        return record
+
+    def remove(self, printer_id, version=None):
+        """Drop a printer; it shows up in changes_since() as a missing id
+
+        With `version`, the printer is only dropped if the stored record is
+        not newer than that (see follow()).
+        """
+        with self._lock:
+            record = self._printers.get(printer_id)
+            if record is None or (version is not None and record.version > version):
+                return False
+            del self._printers[printer_id]
+            self._unindex(record)
+            del self._position[printer_id]
+            self._touch(printer_id)
+        self._notify(record, None)
+        return True
+
+    def select(self, status=None, model=None, exclude_status=None):
+        """Printers matching a status and/or model token, in display order
+
+        Answered from the indexes: the cost grows with the number of matches,
+        not the fleet size. `model` matches the full model name or any word of
+        it, case-insensitively ("x1" matches "X1 Carbon").
+        """
+        with self._lock:
+            candidates = None
+            if status is not None:
+                candidates = set(self._by_status.get(status, ()))
+            if model is not None:
+                matches = self._by_model.get(model.lower(), set())
+                candidates = set(matches) if candidates is None else candidates & matches
+            if exclude_status is not None:
+                if candidates is None:
+                    candidates = set().union(*(
+                        ids for s, ids in self._by_status.items() if s != exclude_status
+                    ))
+                else:
+                    candidates -= self._by_status.get(exclude_status, set())
+            if candidates is None:
+                return list(self._printers.values())
+            return [self._printers[i] for i in sorted(candidates, key=self._position.__getitem__)]
+
+    def status_counts(self, model=None):
+        """Number of printers per status (optionally for one model token)"""
+        with self._lock:
+            if model is None:
+                return {status: len(ids) for status, ids in self._by_status.items()}
+            matches = self._by_model.get(model.lower(), set())
+            counts = {status: len(ids & matches) for status, ids in self._by_status.items()}
+            return {status: n for status, n in counts.items() if n}
+
+    def changes_since(self, version):
+        """Return (current_version, ids changed after `version`)
+
+        Walks the change log from the newest end, so the cost is proportional
+        to the number of changed printers, not the fleet size.
+        """
+        with self._lock:
+            changed = []
+            for printer_id, changed_at in reversed(self._changes.items()):
+                if changed_at <= version:
+                    break
+                changed.append(printer_id)
+            changed.reverse()
+            return self.version, changed
+
+
+def follow(source, printer_ids):
+    """A FleetState with only `printer_ids` from `source`, kept in sync with it
+
+    The records are shared with the source (same objects, same versions), so
+    per-printer caches keyed on record versions stay valid for both. The
+    source notifies after releasing its lock, so two updates to one printer
+    can arrive here in either order; the older one is dropped by version.
+    """
+    printer_ids = frozenset(printer_ids)
+    subset = FleetState()
+
+    def sync(old, new):
+        printer_id = (new or old).id
+        if printer_id in printer_ids:
+            if new is None:
+                subset.remove(printer_id, version=old.version)
+            else:
+                subset.upsert(new, keep_version=True)
+
+    source.subscribe(sync)
+    for printer in source:
+        if printer.id in printer_ids:
+            subset.upsert(printer, keep_version=True)
+    return subset
+
+
+# Dummy printer data, used until a real fleet file is configured
+DUMMY_PRINTERS = [
+    {
+        "id": "printer_1",
+        "name": "Bambu X1 #1",
+        "model": "X1 Carbon",
+        "status": "available",
+        "ip": "192.168.1.101",
+        "last_job": "phone_case.3mf"
+    },
+    {
+        "id": "printer_2",
+        "name": "Bambu X1 #2",
+        "model": "X1 Carbon",
+        "status": "printing",
+        "ip": "192.168.1.102",
+        "current_job": "testslide1f",
+        "progress": 45,
+        "time_remaining": 135,
+        "started_by": "@shobhit"
+    },
+    {
+        "id": "printer_3",
+        "name": "Bambu X1 #3",
+        "model": "X1 Carbon",
+        "status": "available",
+        "ip": "192.168.1.103",
+        "last_job": "benchy_test.3mf"
+    },
+    {
+        "id": "printer_4",
+        "name": "Bambu X1 #4",
+        "model": "X1 Carbon",
+        "status": "offline",
+        "ip": "192.168.1.104",
+        "error": "Network connection lost"
+    }
+]
+
+
+def load_fleet(path=None):
+    """Build the fleet from a JSON list of printers (PRINTFARM_PRINTERS) or the dummy data"""
+    path = path or os.environ.get("PRINTFARM_PRINTERS")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return FleetState(json.load(f))
+    return FleetState(DUMMY_PRINTERS)
+
+
+# The process-wide fleet both endpoints read from
+FLEET = load_fleet()
@@ -0,0 +1,214 @@
+# printfarm/store.py
+"""
+Persistent printer/job store on SQLite in WAL mode
+Writes are queued and group-committed by one writer thread (progress updates
+for the same printer coalesce to the latest row); reads go through per-thread
+connections and, thanks to WAL, never wait for the writer.
+
+Opt in by pointing PRINTFARM_DB at a database file (on Vercel, somewhere
+under /tmp).
+"""
+
+import os
+import threading
+import time
+import traceback
+
+from printfarm.scheduler import SCHEDULER, Job
+from printfarm.state import FLEET, PRINTER_FIELDS
+
+JOB_FIELDS = ("id", "file", "client_type", "deadline", "duration", "submitted_by", "project",
+              "printer_id", "submitted_at", "state", "assigned_to", "started_at", "pool")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS printers (
+    {", ".join(PRINTER_FIELDS)},
+    updated_at REAL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    {", ".join(JOB_FIELDS)},
+    updated_at REAL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, submitted_at);
+"""
+
+# Statements are module constants so sqlite3's statement cache keeps them prepared
+UPSERT_PRINTER = (
+    f"INSERT OR REPLACE INTO printers ({', '.join(PRINTER_FIELDS)}, updated_at) "
+    f"VALUES ({', '.join('?' * (len(PRINTER_FIELDS) + 1))})"
+)
+UPSERT_JOB = (
+    f"INSERT OR REPLACE INTO jobs ({', '.join(JOB_FIELDS)}, updated_at) "
+    f"VALUES ({', '.join('?' * (len(JOB_FIELDS) + 1))})"
+)
+DELETE_PRINTER = "DELETE FROM printers WHERE id = ?"
+SELECT_PRINTERS = f"SELECT {', '.join(PRINTER_FIELDS)} FROM printers ORDER BY rowid"
+SELECT_PRINTER = f"SELECT {', '.join(PRINTER_FIELDS)} FROM printers WHERE id = ?"
+SELECT_JOBS_BY_STATE = f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE state = ? ORDER BY submitted_at LIMIT ?"
+SELECT_JOBS_BY_USER = f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE submitted_by = ? ORDER BY submitted_at DESC LIMIT ?"
+
+
+class Store:
+    """SQLite-backed store with a background group-commit writer"""
+
+    def __init__(self, path, flush_interval=0.2, max_batch=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.commits = 0
+        self.rows_written = 0
+        self.errors = 0       # batches that failed to commit
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._printers = {}   # printer id -> row (or None to delete), latest wins
+        self._jobs = {}       # job id -> row, latest wins
+        self._accepted = 0    # writes queued so far
+        self._committed = 0   # writes known to be on disk
+        self._closed = False
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        # Databases from before job pools lack the column
+        if "pool" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+            conn.execute("ALTER TABLE jobs ADD COLUMN pool")
+        conn.close()
+        self._writer = threading.Thread(target=self._run, name="store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        import sqlite3  # imported lazily: without PRINTFARM_DB it is never needed
+
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                               isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # Writes (queued, never block on disk)
+
+    def record_printer(self, record, removed=False):
+        """Queue the latest state of a printer"""
+        now = time.time()
+        row = None if removed else tuple(getattr(record, f) for f in PRINTER_FIELDS) + (now,)
+        with self._cond:
+            self._printers[record.id] = row
+            self._accepted += 1
+            if len(self._printers) + len(self._jobs) >= self.max_batch:
+                self._cond.notify()
+
+    def record_job(self, job):
+        """Queue the latest state of a job"""
+        row = tuple(getattr(job, f) for f in JOB_FIELDS[:-1])
+        # A pool is stored as its comma-separated printer ids
+        row += (",".join(sorted(job.pool)) if job.pool is not None else None, time.time())
+        with self._cond:
+            self._jobs[job.id] = row
+            self._accepted += 1
+            if len(self._printers) + len(self._jobs) >= self.max_batch:
+                self._cond.notify()
+
+    def flush(self, timeout=10.0):
+        """Wait until everything queued so far is committed; False on timeout or a failed batch"""
+        with self._cond:
+            target = self._accepted
+            errors = self.errors
+            self._cond.notify_all()
+            done = self._cond.wait_for(lambda: self._committed >= target or self._closed, timeout)
+            return done and self.errors == errors
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            with self._cond:
+                if not (self._printers or self._jobs or self._closed):
+                    self._cond.wait(self.flush_interval)
+                printers, self._printers = self._printers, {}
+                jobs, self._jobs = self._jobs, {}
+                accepted = self._accepted
+                closed = self._closed
+            if printers or jobs:
+                try:
+                    self._commit(conn, printers, jobs)
+                except Exception:
+                    # Keep the writer alive; the batch is lost but later writes still land
+                    self.errors += 1
+                    traceback.print_exc()
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            with self._cond:
+                self._committed = accepted
+                self._cond.notify_all()
+            if closed:
+                conn.close()
+                return
+
+    def _commit(self, conn, printers, jobs):
+        # One transaction (one fsync) for the whole batch
+        conn.execute("BEGIN")
+        conn.executemany(UPSERT_PRINTER, [row for row in printers.values() if row is not None])
+        conn.executemany(DELETE_PRINTER, [(pid,) for pid, row in printers.items() if row is None])
+        conn.executemany(UPSERT_JOB, jobs.values())
+        conn.execute("COMMIT")
+        self.commits += 1
+        self.rows_written += len(printers) + len(jobs)
+
+    def close(self):
+        """Commit what is queued and stop the writer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+
+    # Reads (WAL snapshot, never wait for the writer)
+
+    def load_printers(self):
+        return [dict(zip(PRINTER_FIELDS, row)) for row in self._reader().execute(SELECT_PRINTERS)]
+
+    def get_printer(self, printer_id):
+        row = self._reader().execute(SELECT_PRINTER, (printer_id,)).fetchone()
+        return dict(zip(PRINTER_FIELDS, row)) if row else None
+
+    def jobs_by_state(self, state, limit=100):
+        return [dict(zip(JOB_FIELDS, row)) for row in self._reader().execute(SELECT_JOBS_BY_STATE, (state, limit))]
+
+    def jobs_by_user(self, user, limit=100):
+        return [dict(zip(JOB_FIELDS, row)) for row in self._reader().execute(SELECT_JOBS_BY_USER, (user, limit))]
+
+
+def attach(store, fleet=FLEET, scheduler=SCHEDULER):
+    """Restore saved printers and queued jobs, then persist every later change"""
+    for row in store.load_printers():
+        fleet.upsert(row)
+    for row in store.jobs_by_state("queued", limit=1000000):
+        job = Job(**{f: row[f] for f in JOB_FIELDS if f not in ("state", "assigned_to", "started_at", "pool")},
+                  pool=row["pool"].split(",") if row["pool"] is not None else None)
+        scheduler.requeue(job)
+
+    fleet.subscribe(lambda old, new: store.record_printer(new) if new is not None
+                    else store.record_printer(old, removed=True))
+    scheduler.subscribe(store.record_job)
+
+    # Printers that are already free take restored jobs now rather than at their next change
+    for printer in fleet.select(status="available"):
+        scheduler.assign(printer.id)
+    return store
+
+
+def open_default():
+    """Open the store at PRINTFARM_DB and attach it to the shared fleet (None when unset)"""
+    path = os.environ.get("PRINTFARM_DB")
+    if not path:
+        return None
+    return attach(Store(path))
+
+
+STORE = open_default()
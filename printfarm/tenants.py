@@ -0,0 +1,102 @@
+# printfarm/tenants.py
+"""
+Tenant routing: which printers and actions a Slack team/channel/user gets
+Each lab is a tenant with its channels, its printers and what its members may
+do. PRINTFARM_TENANTS points at a JSON list such as
+
+    [{"name": "lab-a", "team": "T0001", "channels": ["C0123", "lab-a-printers"],
+      "printers": ["printer_1", "printer_2"], "permissions": ["view", "print"],
+      "users": {"U0456": ["view", "print", "control"]}}]
+
+"team" is optional (any workspace), channels may be ids or names, "printers"
+and "permissions" default to everything, and "users" overrides the
+permissions for individual users. Without the file the bot keeps its
+original rule: everything, but only in #3d-printer-automation-test.
+
+Rules are compiled once into dicts and every resolved (team, channel, user)
+is remembered, so a repeat request costs one dict probe.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+from printfarm.state import FLEET, follow
+
+# view: dashboards and status; print: start jobs; control: pause/cancel printers
+PERMISSIONS = frozenset(("view", "print", "control"))
+
+DEFAULT_TENANTS = [{"name": "default", "channels": ["3d-printer-automation-test"]}]
+DEFAULT_DENIED = "❌ This command only works in #3d-printer-automation-test channel"
+DENIED = "❌ The printer farm isn't set up for this channel"
+
+# Resolved (team, channel id, channel name, user) keys we remember
+MAX_RESOLVED = 8192
+
+Tenant = namedtuple("Tenant", "name printer_ids fleet permissions users")
+Access = namedtuple("Access", "tenant fleet permissions")
+
+
+def _permissions(values):
+    if values is None or "*" in values:
+        return PERMISSIONS
+    unknown = set(values) - PERMISSIONS
+    if unknown:
+        raise ValueError(f"unknown permissions: {', '.join(sorted(unknown))}")
+    return frozenset(values)
+
+
+class Tenants:
+    """Compiled tenant rules"""
+
+    def __init__(self, config, fleet=FLEET, denied=DENIED):
+        self.denied = denied
+        self._rules = {}      # (team or None, channel id or name) -> Tenant
+        self._resolved = {}   # (team, channel id, channel name, user) -> Access or None
+        for entry in config:
+            printer_ids = entry.get("printers")
+            if printer_ids is None or printer_ids == "*":
+                printer_ids, subset = None, fleet
+            else:
+                printer_ids = frozenset(printer_ids)
+                subset = follow(fleet, printer_ids)
+            tenant = Tenant(
+                entry["name"],
+                printer_ids,
+                subset,
+                _permissions(entry.get("permissions")),
+                {user: _permissions(values) for user, values in entry.get("users", {}).items()},
+            )
+            for channel in entry.get("channels", ()):
+                self._rules.setdefault((entry.get("team"), channel), tenant)
+
+    def resolve(self, team, channel_id, channel_name, user):
+        """The Access for a request, or None if no tenant covers its channel"""
+        key = (team, channel_id, channel_name, user)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        tenant = None
+        for probe in ((team, channel_id), (team, channel_name), (None, channel_id), (None, channel_name)):
+            tenant = self._rules.get(probe)
+            if tenant is not None:
+                break
+        access = None
+        if tenant is not None:
+            access = Access(tenant, tenant.fleet, tenant.users.get(user, tenant.permissions))
+        if len(self._resolved) < MAX_RESOLVED:
+            self._resolved[key] = access
+        return access
+
+
+def load_tenants(path=None, fleet=FLEET):
+    """Tenants from PRINTFARM_TENANTS, or the single default channel rule"""
+    path = path or os.environ.get("PRINTFARM_TENANTS")
+    if not path:
+        return Tenants(DEFAULT_TENANTS, fleet, denied=DEFAULT_DENIED)
+    with open(path, encoding="utf-8") as f:
+        return Tenants(json.load(f), fleet)
+
+
+TENANTS = load_tenants()
@@ -0,0 +1,53 @@
+# printfarm/webapi.py
+"""
+Minimal Slack Web API client (chat.postMessage, chat.update, ...)
+Uses the bot token from SLACK_BOT_TOKEN, over the shared keep-alive pool
+"""
+
+import json
+import os
+
+SLACK_API_URL = "https://slack.com/api/"
+
+
+class SlackApiError(Exception):
+    """Slack answered ok=false (or rate limited us); retry_after is set for 429s"""
+
+    def __init__(self, error, retry_after=None):
+        super().__init__(error)
+        self.error = error
+        self.retry_after = retry_after
+
+
+def bot_token():
+    return os.environ.get("SLACK_BOT_TOKEN", "")
+
+
+def call(method, payload, token=None, timeout=5.0, base_url=None):
+    """Call one Web API method with a JSON body and return the decoded response"""
+    import urllib.error  # imported lazily: only live dashboards and alerts call the Web API
+
+    from printfarm.httppool import POOL
+
+    token = token or bot_token()
+    if not token:
+        raise SlackApiError("not_configured")
+    try:
+        resp = POOL.request(
+            "POST",
+            (base_url or os.environ.get("SLACK_API_URL", SLACK_API_URL)) + method,
+            body=json.dumps(payload).encode(),
+            headers={
+                "Content-Type": "application/json; charset=utf-8",
+                "Authorization": f"Bearer {token}",
+            },
+            timeout=timeout,
+        )
+        data = json.loads(resp.body)
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            raise SlackApiError("ratelimited", float(e.headers.get("Retry-After", "1")))
+        raise SlackApiError(f"http_{e.code}")
+    if not data.get("ok"):
+        raise SlackApiError(data.get("error", "unknown_error"))
+    return data
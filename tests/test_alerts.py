@@ -0,0 +1,42 @@
+# tests/test_alerts.py
+"""
+Printer alerts: one failing alert does not stop the others
+"""
+
+from printfarm.alerts import AlertPipeline
+from printfarm.state import FleetState
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakySlack:
+    """Records posted alerts; raises an unexpected error for messages about `broken`"""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.posted = []
+
+    def __call__(self, method, payload):
+        if self.broken in payload["text"]:
+            raise KeyError(self.broken)
+        self.posted.append(payload["text"])
+        return {"ok": True}
+
+
+def test_failing_alert_does_not_stop_later_ones():
+    fleet = FleetState([{"id": f"p{i}", "name": f"Bambu X1 #{i}", "status": "available"} for i in (1, 2, 3)])
+    clock = Clock()
+    slack = FlakySlack(broken="Bambu X1 #1")
+    alerts = AlertPipeline(fleet, channel="C1", debounce=10, api=slack, clock=clock, background=False)
+    for printer_id in ("p1", "p2", "p3"):
+        fleet.update(printer_id, status="offline")
+    clock.now += 10
+    assert alerts.run_due() == 2
+    assert slack.posted == ["🔌 *Bambu X1 #2* went offline", "🔌 *Bambu X1 #3* went offline"]
+    assert (alerts.sent, alerts.failed) == (2, 1)
@@ -0,0 +1,57 @@
+# tests/test_asgi.py
+"""
+PrintfarmApp: the background services it runs next to the endpoints
+"""
+
+import pytest
+
+from printfarm import asgi, mqtt, poller
+from printfarm.commands import CONTROL
+
+
+class FakeService:
+    started = []
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.stopped = False
+
+    def start(self):
+        FakeService.started.append(self)
+        return self
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def services(monkeypatch):
+    FakeService.started = []
+    monkeypatch.setattr(poller, "Poller", FakeService)
+    monkeypatch.setattr(mqtt, "MqttIngest", FakeService)
+    monkeypatch.setattr(mqtt, "load_targets", lambda: [{"id": "printer_1", "serial": "SN1"}])
+    monkeypatch.setattr(CONTROL, "mqtt", None)
+    return FakeService.started
+
+
+def test_auto_starts_mqtt_and_attaches_commands(services):
+    app = asgi.PrintfarmApp(endpoints=(), workers=1, services="auto").load()
+    assert app.ingest is services[0] and app.poller is None
+    assert CONTROL.mqtt is app.ingest
+    app.close()
+    assert services[0].stopped and CONTROL.mqtt is None
+
+
+def test_explicit_services(services):
+    app = asgi.PrintfarmApp(endpoints=(), workers=1, services="mqtt,poller").load()
+    assert app.ingest is not None and app.poller is not None
+    app.close()
+    assert all(service.stopped for service in services)
+
+
+def test_none_and_unknown_services(services):
+    app = asgi.PrintfarmApp(endpoints=(), workers=1, services="none").load()
+    assert services == [] and CONTROL.mqtt is None
+    app.close()
+    with pytest.raises(ValueError):
+        asgi.PrintfarmApp(endpoints=(), workers=1, services="mqtt,cron").load()
@@ -0,0 +1,123 @@
+# tests/test_camera.py
+"""
+Camera snapshots: shared feeds against a fake MJPEG camera, and signed public URLs
+"""
+
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+from printfarm import camera
+from printfarm.camera import CameraHub
+from printfarm.state import FleetState
+
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+NOW = 1_700_000_000
+
+
+def url_params(url):
+    return {name: values[0] for name, values in parse_qs(urlparse(url).query).items()}
+
+
+def test_signed_urls_check_out(monkeypatch):
+    monkeypatch.setenv("PRINTFARM_PUBLIC_URL", "https://farm.example/")
+    monkeypatch.setenv("SLACK_SIGNING_SECRET", SECRET)
+    params = url_params(camera.snapshot_url("bambu-1", now=NOW))
+    assert "stream" not in params
+    assert camera.check_url("bambu-1", params["expires"], params["sig"], now=NOW)
+    assert not camera.check_url("bambu-2", params["expires"], params["sig"], now=NOW)
+    assert not camera.check_url("bambu-1", params["expires"], params["sig"], now=int(params["expires"]) + 1)
+
+
+def test_stream_flag_is_signed(monkeypatch):
+    monkeypatch.setenv("PRINTFARM_PUBLIC_URL", "https://farm.example")
+    monkeypatch.setenv("SLACK_SIGNING_SECRET", SECRET)
+    frame = url_params(camera.snapshot_url("bambu-1", now=NOW))
+    stream = url_params(camera.snapshot_url("bambu-1", stream=True, now=NOW))
+    assert camera.check_url("bambu-1", stream["expires"], stream["sig"], stream=True, now=NOW)
+    # A snapshot link can't be turned into a stream by adding &stream=1, or back
+    assert not camera.check_url("bambu-1", frame["expires"], frame["sig"], stream=True, now=NOW)
+    assert not camera.check_url("bambu-1", stream["expires"], stream["sig"], stream=False, now=NOW)
+
+
+def test_nothing_is_served_without_a_secret(monkeypatch):
+    monkeypatch.setenv("PRINTFARM_PUBLIC_URL", "https://farm.example")
+    monkeypatch.delenv("SLACK_SIGNING_SECRET", raising=False)
+    assert camera.snapshot_url("bambu-1", now=NOW) is None
+    assert not camera.check_url("bambu-1", str(NOW + 600), "", now=NOW)
+
+
+class FakeCamera:
+    """An endless MJPEG response, one numbered frame every `interval` seconds"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.headers = {"Content-Type": "multipart/x-mixed-replace; boundary=frame"}
+        self.buffer = io.BytesIO()
+        self.count = 0
+
+    def _fill(self):
+        time.sleep(self.interval)
+        self.count += 1
+        jpeg = f"jpeg-{self.count}".encode()
+        rest = self.buffer.read()
+        self.buffer = io.BytesIO(rest + b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                 + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+
+    def readline(self, limit=-1):
+        line = self.buffer.readline(limit)
+        if not line.endswith(b"\n"):
+            self.buffer = io.BytesIO(line + self.buffer.read())
+            self._fill()
+            return self.readline(limit)
+        return line
+
+    def read(self, size):
+        data = self.buffer.read(size)
+        while len(data) < size:
+            self._fill()
+            data += self.buffer.read(size - len(data))
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def make_hub(opened, idle_timeout=5.0):
+    def opener(url, timeout):
+        opened.append(url)
+        return FakeCamera()
+
+    fleet = FleetState([{"id": "p1", "name": "Bambu X1 #1", "ip": "10.0.0.5"}])
+    return CameraHub(fleet, idle_timeout=idle_timeout, opener=opener)
+
+
+def test_viewers_share_one_camera_connection():
+    opened = []
+    hub = make_hub(opened)
+    with ThreadPoolExecutor(16) as pool:
+        frames = list(pool.map(lambda _: hub.snapshot("p1"), range(64)))
+    assert all(frame is not None and frame.jpeg.startswith(b"jpeg-") for frame in frames)
+    assert opened == ["http://10.0.0.5:8080/stream"]
+    assert hub.stats()["p1"]["connections"] == 1
+    assert hub.snapshot("unknown") is None
+
+
+def test_feed_stops_when_nobody_is_watching():
+    opened = []
+    hub = make_hub(opened, idle_timeout=0.05)
+    feed = hub.feed("p1")
+    first = feed.next_frame(0, 2.0)
+    assert first is not None and feed.next_frame(first.seq, 2.0).seq > first.seq
+    for _ in range(200):
+        if feed._thread is None:
+            break
+        time.sleep(0.01)
+    assert feed._thread is None
+    # The next viewer reconnects
+    assert feed.next_frame(feed.frames[-1].seq, 2.0) is not None
+    assert len(opened) == 2
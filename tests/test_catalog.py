@@ -0,0 +1,55 @@
+# tests/test_catalog.py
+"""
+3MF catalog: metadata scan, search, and refreshes that never fail a request
+"""
+
+import os
+import zipfile
+
+from printfarm import catalog
+
+SLICE_INFO = """<?xml version="1.0" encoding="UTF-8"?>
+<config><plate>
+  <metadata key="index" value="1"/>
+  <metadata key="prediction" value="5400"/>
+  <metadata key="weight" value="38.5"/>
+</plate></config>"""
+
+
+def make_3mf(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("Metadata/slice_info.config", SLICE_INFO)
+        archive.writestr("Metadata/plate_1.gcode", "G28\n")
+
+
+def test_scan_and_search(tmp_path):
+    make_3mf(tmp_path / "phone_case.3mf")
+    make_3mf(tmp_path / "benchy_test.3mf")
+    library = catalog.Catalog(str(tmp_path))
+    assert library.refresh() == (2, 0)
+    [entry] = library.search("case")
+    assert (entry.path, entry.print_time, entry.filament_grams, entry.plates) == ("phone_case.3mf", 5400, 38.5, 1)
+    # Unchanged files are not read again, and the saved index is picked up
+    assert library.refresh() == (0, 0)
+    assert len(catalog.Catalog(str(tmp_path))) == 2
+
+
+def test_unwritable_index_is_not_fatal(tmp_path):
+    make_3mf(tmp_path / "phone_case.3mf")
+    library = catalog.Catalog(str(tmp_path), index_path=str(tmp_path / "missing" / "index.json"))
+    assert library.refresh() == (1, 0)
+    assert library.save_error is not None
+    assert [e.path for e in library.search("phone")] == ["phone_case.3mf"]
+
+
+def test_stale_catalog_refreshes_in_background(tmp_path):
+    make_3mf(tmp_path / "phone_case.3mf")
+    library = catalog.Catalog(str(tmp_path), refresh_interval=0.0)
+    library.refresh_if_stale()   # no index yet: waits for the first scan
+    assert len(library) == 1
+
+    make_3mf(tmp_path / "bracket.3mf")
+    os.utime(tmp_path / "bracket.3mf")
+    library.refresh_if_stale()   # serves what it has while the scan runs
+    library.refresh_in_background().join()
+    assert len(library) == 2
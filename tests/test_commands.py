@@ -0,0 +1,110 @@
+# tests/test_commands.py
+"""
+Printer commands: batches across printers and their summaries
+"""
+
+import time
+
+from printfarm import deferred
+from printfarm.commands import PrinterCommands, Result, run_batch, summarize
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+
+def make_commands(**options):
+    fleet = FleetState([
+        {"id": "p1", "name": "Bambu X1 #1", "status": "printing"},
+        {"id": "p2", "name": "Bambu X1 #2", "status": "printing"},
+        {"id": "p3", "name": "Bambu X1 #3", "status": "available"},
+        {"id": "p4", "name": "Bambu X1 #4", "status": "paused"},
+    ])
+    return PrinterCommands(fleet, Scheduler(fleet), **options)
+
+
+class SlowMqtt:
+    """Stands in for an MqttIngest: records requests, takes `delay` seconds, fails for `broken`"""
+
+    def __init__(self, delay=0.0, broken=()):
+        self.delay = delay
+        self.broken = broken
+        self.requests = []
+
+    def publish_threadsafe(self, printer_id, payload, timeout):
+        time.sleep(self.delay)
+        if printer_id in self.broken:
+            raise OSError("no route to printer")
+        self.requests.append((printer_id, payload["print"]["command"]))
+        return True
+
+
+def test_batch_runs_each_printer_once_and_skips_the_wrong_status():
+    commands = make_commands()
+    results = {r.printer_id: r for r in commands.batch("pause", ["p1", "p2", "p3", "p1", "nope"])}
+    assert sorted(results) == ["nope", "p1", "p2", "p3"]
+    assert [results[p].outcome for p in ("p1", "p2", "p3", "nope")] == ["done", "done", "skipped", "failed"]
+    assert commands.fleet.get("p1").status == "paused"
+    assert commands.fleet.get("p3").status == "available"
+
+
+def test_batch_runs_concurrently_over_mqtt():
+    commands = make_commands(parallelism=4)
+    commands.attach_mqtt(SlowMqtt(delay=0.2, broken=("p2",)))
+    started = time.monotonic()
+    results = list(commands.batch("cancel", ["p1", "p2", "p4"]))
+    assert time.monotonic() - started < 0.5
+    assert sorted(commands.mqtt.requests) == [("p1", "stop"), ("p4", "stop")]
+    failed = [r for r in results if r.outcome == "failed"]
+    assert [(r.printer_id, r.detail) for r in failed] == [("p2", "no route to printer")]
+
+
+def test_batch_times_out_slow_printers():
+    commands = make_commands(parallelism=2, timeout=0.1)
+    commands.attach_mqtt(SlowMqtt(delay=1.0))
+    results = list(commands.batch("pause", ["p1", "p2"]))
+    assert {(r.printer_id, r.outcome, r.detail) for r in results} == {
+        ("p1", "failed", "timed out"), ("p2", "failed", "timed out")}
+
+
+def test_batch_start_queues_behind_busy_printers():
+    commands = make_commands()
+    results = {r.printer_id: r for r in commands.batch(
+        "start", ["p1", "p3"], file="bracket.3mf", job={"submitted_by": "@ana"})}
+    assert results["p3"].detail == "started"
+    assert results["p1"].detail == "queued #1"
+    assert commands.fleet.get("p3").current_job == "bracket.3mf"
+
+
+def test_run_batch_reports_progress_and_summarizes():
+    commands = make_commands(parallelism=1)
+    commands.attach_mqtt(SlowMqtt(delay=0.05))
+    progress = []
+    summary = run_batch("pause", ["p1", "p2", "p3"], report=progress.append, interval=0.0, commands=commands)
+    assert progress and all(m["text"].startswith("⏳ *Batch pause*") for m in progress)
+    assert summary["text"].splitlines() == [
+        "✅ *Batch pause* on 3 printers",
+        "2 paused · 1 skipped",
+        "➖ Bambu X1 #3: skipped (available)",
+    ]
+
+
+def test_summarize_lists_failures_and_queued_jobs():
+    results = [Result("p1", "Bambu X1 #1", "done", "started"),
+               Result("p2", "Bambu X1 #2", "done", "queued #2"),
+               Result("p3", "Bambu X1 #3", "failed", "timed out")]
+    text = summarize("start", results)["text"]
+    assert text.splitlines() == [
+        "⚠️ *Batch start* on 3 printers",
+        "1 started · 1 queued · 1 failed",
+        "📋 Bambu X1 #2: queued #2",
+        "❌ Bambu X1 #3: timed out",
+    ]
+    many = [Result(f"p{i}", f"Printer {i:02}", "failed", "offline") for i in range(25)]
+    assert summarize("pause", many)["text"].endswith("…and 5 more")
+
+
+def test_background_batches_need_a_long_running_process(monkeypatch):
+    monkeypatch.delenv("SLACK_DEFERRED_RESPONSES", raising=False)
+    monkeypatch.setattr(deferred, "LONG_RUNNING", False)
+    assert not deferred.background_ok()
+    monkeypatch.setattr(deferred, "LONG_RUNNING", True)
+    assert deferred.background_ok()
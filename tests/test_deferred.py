@@ -0,0 +1,174 @@
+# tests/test_deferred.py
+"""
+Deferred response_url delivery: against a local HTTP stand-in for Slack, and
+with an injected poster for the dispatcher's queueing
+"""
+
+import json
+import threading
+import time
+import urllib.error
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from printfarm import deferred, httppool
+from printfarm.deferred import ResponseDispatcher
+
+URL = "https://hooks.slack.com/commands/T1/123/abc"
+
+
+class FakeSlack:
+    """Records posts; answers each with the next of `statuses` (200 once they run out)"""
+
+    def __init__(self, *statuses, retry_after=None):
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.posts = []
+
+    def __call__(self, url, payload, timeout):
+        self.posts.append((url, payload))
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status >= 400:
+            headers = Message()
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            raise urllib.error.HTTPError(url, status, "error", headers, None)
+        return status
+
+
+class SlackServer:
+    """A local response_url endpoint answering each POST with the next of `statuses` (200 after)"""
+
+    def __init__(self, *statuses, retry_after=None):
+        self.statuses = list(statuses)
+        self.received = []   # (path, content type, decoded body)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                server.received.append((self.path, self.headers["Content-Type"], json.loads(body)))
+                status = server.statuses.pop(0) if server.statuses else 200
+                reply = b"ok" if status == 200 else b"slow down"
+                self.send_response(status)
+                if status == 429 and retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/commands/T1/123/abc"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_post_json_over_the_pool(monkeypatch):
+    slack = SlackServer()
+    pool = httppool.ConnectionPool()
+    monkeypatch.setattr(httppool, "POOL", pool)
+    try:
+        dispatcher = ResponseDispatcher(workers=1)
+        for n in range(3):
+            dispatcher.submit(slack.url, lambda n=n: {"text": f"dashboard {n}", "replace_original": True})
+        dispatcher.join()
+        assert [body for _, _, body in slack.received] == [
+            {"text": f"dashboard {n}", "replace_original": True} for n in range(3)]
+        assert {(path, content_type) for path, content_type, _ in slack.received} == {
+            ("/commands/T1/123/abc", "application/json; charset=utf-8")}
+        assert dispatcher.delivered == 3 and pool.opened == 1   # one keep-alive connection
+    finally:
+        pool.close()
+        slack.close()
+
+
+def test_retries_real_error_responses(monkeypatch):
+    monkeypatch.setattr(httppool, "POOL", httppool.ConnectionPool())
+    # Slack's Retry-After wins over the (here 10 s) backoff
+    slack = SlackServer(429, retry_after=0)
+    try:
+        dispatcher = ResponseDispatcher(workers=1, backoff=10.0)
+        dispatcher.submit(slack.url, lambda: {"text": "rate limited once"})
+        started = time.monotonic()
+        dispatcher.join()
+        assert time.monotonic() - started < 5.0
+        assert len(slack.received) == 2 and dispatcher.delivered == 1
+    finally:
+        slack.close()
+
+    # Server errors are retried with backoff; a 404 (expired response_url) is not
+    slack = SlackServer(503, 500, 200, 404)
+    try:
+        dispatcher = ResponseDispatcher(workers=1, backoff=0.01)
+        dispatcher.submit(slack.url, lambda: {"text": "third time lucky"})
+        dispatcher.join()
+        dispatcher.submit(slack.url, lambda: {"text": "expired"})
+        dispatcher.join()
+        assert [body["text"] for _, _, body in slack.received] == ["third time lucky"] * 3 + ["expired"]
+        assert (dispatcher.delivered, dispatcher.failed) == (1, 1)
+    finally:
+        slack.close()
+
+
+def test_delivers_built_message():
+    slack = FakeSlack()
+    dispatcher = ResponseDispatcher(workers=1, post=slack)
+    assert dispatcher.submit(URL, lambda: {"text": "dashboard"})
+    dispatcher.join()
+    assert slack.posts == [(URL, {"text": "dashboard"})]
+    assert (dispatcher.delivered, dispatcher.failed) == (1, 0)
+
+
+def test_retries_rate_limits_and_server_errors_but_not_client_errors():
+    slack = FakeSlack(429, 503, retry_after=0)
+    dispatcher = ResponseDispatcher(workers=1, backoff=0.001, post=slack)
+    dispatcher.submit(URL, lambda: {"text": "eventually"})
+    dispatcher.join()
+    assert len(slack.posts) == 3 and dispatcher.delivered == 1
+
+    slack = FakeSlack(404)
+    dispatcher = ResponseDispatcher(workers=1, backoff=0.001, post=slack)
+    dispatcher.submit(URL, lambda: {"text": "expired url"})
+    dispatcher.join()
+    assert len(slack.posts) == 1 and dispatcher.failed == 1
+
+
+def test_build_errors_are_delivered_as_messages():
+    slack = FakeSlack()
+    dispatcher = ResponseDispatcher(workers=1, post=slack)
+    dispatcher.submit(URL, lambda: 1 / 0)
+    dispatcher.join()
+    assert slack.posts[0][1]["text"].startswith("❌ Error:")
+
+
+def test_full_queue_falls_back_to_inline():
+    building, release = threading.Event(), threading.Event()
+
+    def slow_build():
+        building.set()
+        release.wait(5)
+        return {"text": "first"}
+
+    dispatcher = ResponseDispatcher(workers=1, max_pending=1, post=FakeSlack())
+    dispatcher.submit(URL, slow_build)
+    building.wait(5)   # the worker is busy; one more fits in the queue
+    accepted = [dispatcher.submit(URL, lambda: {"text": "queued"}) for _ in range(3)]
+    release.set()
+    dispatcher.join()
+    assert accepted == [True, False, False]
+
+
+def test_defer_is_opt_in(monkeypatch):
+    monkeypatch.delenv("SLACK_DEFERRED_RESPONSES", raising=False)
+    assert not deferred.defer(URL, lambda: {"text": "inline"})
+    monkeypatch.setenv("SLACK_DEFERRED_RESPONSES", "1")
+    assert not deferred.defer("", lambda: {"text": "no response_url"})
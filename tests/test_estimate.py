@@ -0,0 +1,68 @@
+# tests/test_estimate.py
+"""
+Remaining time and cost estimates
+"""
+
+from printfarm import catalog
+from printfarm.catalog import CatalogEntry
+from printfarm.dashboard import DEFAULT_QUERY, render_page
+from printfarm.estimate import ProgressRates, estimate_fleet, estimate_printer, file_baseline, job_cost
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+
+def test_progress_rate_drives_remaining_time():
+    clock = [1000.0]
+    fleet = FleetState([{"id": "p1", "name": "Bambu X1 #1", "status": "printing",
+                         "current_job": "benchy.3mf", "progress": 10, "time_remaining": 300}])
+    rates = ProgressRates(fleet, clock=lambda: clock[0])
+    scheduler = Scheduler(fleet)
+    fleet.update("p1", progress=11)
+    # No rate yet: the printer's own figure
+    assert estimate_printer("p1", fleet, scheduler, rates).basis == "printer"
+    clock[0] += 600
+    fleet.update("p1", progress=21)   # 10% in 10 minutes
+    estimate = estimate_printer("p1", fleet, scheduler, rates)
+    assert (estimate.remaining, estimate.basis) == (79, "progress rate")
+    assert estimate.cost is not None
+
+
+def test_external_jobs_are_marked_up():
+    assert job_cost(60, 10, "external") == job_cost(60, 10, "internal") * 1.5
+
+
+class FakeCatalog:
+    """Counts lookups; knows one file"""
+
+    def __init__(self):
+        self.lookups = 0
+        self.entry = CatalogEntry("benchy.3mf", 1, 100, print_time=3600, filament_grams=15.0)
+
+    def get(self, path):
+        self.lookups += 1
+        return self.entry if path == self.entry.path else None
+
+
+def test_estimate_fleet_looks_up_the_catalog_once(monkeypatch):
+    library = FakeCatalog()
+    calls = []
+    monkeypatch.setattr(catalog, "get_catalog", lambda: calls.append(1) or library)
+    fleet = FleetState([
+        {"id": f"p{i}", "name": f"Bambu X1 #{i}", "status": "printing", "current_job": "benchy.3mf",
+         "progress": 50, "time_remaining": 0} for i in range(5)
+    ] + [{"id": "idle", "name": "Bambu X1 #9"}])
+    rates = ProgressRates(fleet)
+    estimates = estimate_fleet(fleet, Scheduler(fleet), rates)
+    assert sorted(estimates) == [f"p{i}" for i in range(5)]
+    assert estimates["p0"] == estimate_printer("p0", fleet, Scheduler(fleet), rates)
+    assert (estimates["p0"].remaining, estimates["p0"].basis) == (30, "slicer")
+    assert len(calls) == 2   # once for the pass, once for estimate_printer
+    assert file_baseline(library.entry) is file_baseline(library.entry)
+
+
+def test_dashboard_shows_the_estimated_time_left(monkeypatch):
+    monkeypatch.setattr(catalog, "get_catalog", lambda: FakeCatalog())
+    fleet = FleetState([{"id": "p1", "name": "Bambu X1 #1", "status": "printing",
+                         "current_job": "benchy.3mf", "progress": 50, "time_remaining": 0}])
+    blocks, _ = render_page(fleet, DEFAULT_QUERY)
+    assert "Remaining: 30m" in blocks[2]["text"]["text"]
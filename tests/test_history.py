@@ -0,0 +1,52 @@
+# tests/test_history.py
+"""
+/print stats message layout and the job event log behind it
+"""
+
+from printfarm.history import SECTION_TEXT_LIMIT, History, Totals, stats_message
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+
+def message_for(size):
+    fleet = FleetState({"id": f"p{i}", "name": f"Bambu X1 Carbon #{i}"} for i in range(size))
+    return stats_message(7, fleet=fleet, history=History(fleet, Scheduler(fleet)))
+
+
+def test_utilization_splits_into_sections_under_the_limit():
+    sections = [b["text"]["text"] for b in message_for(60)["blocks"] if b["type"] == "section"]
+    assert all(len(text) <= SECTION_TEXT_LIMIT for text in sections)
+    assert sum(text.count("utilized") for text in sections) == 60
+
+
+def test_huge_fleets_are_capped():
+    message = message_for(3000)
+    assert len(message["blocks"]) <= 50
+    assert "more printers" in message["blocks"][-4]["text"]["text"]
+
+
+def test_offline_is_a_gap_not_a_new_job():
+    fleet = FleetState({"id": f"p{i}", "name": f"Bambu X1 Carbon #{i}", "status": "available"} for i in (1, 2, 3))
+    now = [0.0]
+    history = History(fleet, Scheduler(fleet), clock=lambda: now[0])
+    for at, printer_id, changes in [
+        (0, "p1", {"status": "printing", "started_by": "@ana"}),
+        (0, "p2", {"status": "printing", "started_by": "@ben"}),
+        (50, "p2", {"status": "error"}),
+        (100, "p1", {"status": "offline"}),
+        (160, "p1", {"status": "printing"}),
+        (200, "p1", {"status": "available"}),
+        (250, "p3", {"status": "printing", "started_by": "@ana"}),
+    ]:
+        now[0] = at
+        fleet.update(printer_id, **changes)
+
+    stats = history.report(0, 300)
+    assert stats.printers == {"p1": Totals(140, 1, 0), "p2": Totals(50, 1, 1), "p3": Totals(50, 1, 0)}
+    assert stats.users == {"@ana": Totals(190, 2, 0), "@ben": Totals(50, 1, 1)}
+
+    # Only printing time inside the window counts (not the offline gap), and jobs
+    # started before it are not counted again
+    clipped = history.report(120, 300)
+    assert clipped.printers == {"p1": Totals(40, 0, 0), "p3": Totals(50, 1, 0)}
+    assert history.report(60, 150).printers == {"p1": Totals(40, 0, 0)}
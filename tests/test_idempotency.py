@@ -0,0 +1,69 @@
+# tests/test_idempotency.py
+"""
+Duplicate delivery suppression: the response store and the endpoint handlers
+"""
+
+import io
+from http.client import HTTPMessage
+from urllib.parse import urlencode
+
+from printfarm.asgi import load_handler
+from printfarm.idempotency import RESPONSES, ResponseStore
+
+
+class BrokenOnce:
+    """A wfile whose first write fails, as when Slack hangs up after its timeout"""
+
+    def __init__(self):
+        self.failed = False
+        self.data = b""
+
+    def write(self, data):
+        if not self.failed:
+            self.failed = True
+            raise BrokenPipeError("client went away")
+        self.data += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def post(handler_class, body, wfile):
+    h = handler_class.__new__(handler_class)
+    h.command, h.path = "POST", "/api/print"
+    h.request_version, h.requestline = "HTTP/1.1", "POST /api/print HTTP/1.1"
+    h.client_address, h.server, h.close_connection = ("127.0.0.1", 0), None, True
+    h.headers = HTTPMessage()
+    h.headers["Content-Length"] = str(len(body))
+    h.rfile, h.wfile = io.BytesIO(body), wfile
+    h.log_message = lambda *args: None
+    h.do_POST()
+
+
+def test_claim_replays_completed_response():
+    store = ResponseStore(wait=0.01)
+    assert store.claim("k") is None
+    assert store.claim("k") == b""   # still running
+    store.complete("k", b"body")
+    assert store.claim("k") == b"body"
+
+
+def test_abandon_lets_retry_run():
+    store = ResponseStore()
+    assert store.claim("k") is None
+    store.abandon("k")
+    assert store.claim("k") is None
+
+
+def test_failed_write_after_complete_keeps_response(monkeypatch):
+    monkeypatch.delenv("SLACK_SIGNING_SECRET", raising=False)
+    monkeypatch.setenv("SLACK_ALLOW_UNSIGNED", "1")
+    monkeypatch.delenv("SLACK_DEFERRED_RESPONSES", raising=False)
+    RESPONSES.clear()
+    body = urlencode({"channel_name": "3d-printer-automation-test", "text": "",
+                      "trigger_id": "trigger-broken-pipe"}).encode()
+    post(load_handler("print"), body, BrokenOnce())
+    # Slack's retry gets the stored dashboard instead of running the command again
+    replay = RESPONSES.claim(("command", "trigger-broken-pipe"))
+    assert replay is not None and b"3D Printer Farm Status" in replay
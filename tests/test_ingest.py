@@ -0,0 +1,44 @@
+# tests/test_ingest.py
+"""
+Slack request intake: signature checks and targeted form decoding
+"""
+
+import hashlib
+import hmac
+
+import pytest
+
+from printfarm import ingest
+from printfarm.ingest import RequestRejected
+
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+NOW = 1_700_000_000
+BODY = b"team_id=T1&channel_name=lab&text=status%3Aprinting+page%3A2&text=ignored"
+
+
+def signed(body, secret=SECRET, timestamp=NOW):
+    signature = "v0=" + hmac.new(secret.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return {"X-Slack-Request-Timestamp": str(timestamp), "X-Slack-Signature": signature}
+
+
+def test_signed_requests_pass_and_forgeries_do_not():
+    ingest.verify_signature(signed(BODY), BODY, secret=SECRET, now=NOW)
+    for headers, now in ((signed(BODY, secret="wrong"), NOW), (signed(BODY), NOW + 600), ({}, NOW)):
+        with pytest.raises(RequestRejected) as e:
+            ingest.verify_signature(headers, BODY, secret=SECRET, now=now)
+        assert e.value.status == 401
+
+
+def test_no_secret_fails_closed_unless_opted_out(monkeypatch):
+    monkeypatch.delenv("SLACK_SIGNING_SECRET", raising=False)
+    monkeypatch.delenv("SLACK_ALLOW_UNSIGNED", raising=False)
+    with pytest.raises(RequestRejected) as e:
+        ingest.verify_signature({}, BODY)
+    assert e.value.status == 401
+    monkeypatch.setenv("SLACK_ALLOW_UNSIGNED", "1")
+    ingest.verify_signature({}, BODY)
+
+
+def test_form_fields_decodes_only_what_is_asked():
+    assert ingest.form_fields(BODY, ("text", "channel_name", "user_id")) == {
+        "text": "status:printing page:2", "channel_name": "lab"}
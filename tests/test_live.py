@@ -0,0 +1,40 @@
+# tests/test_live.py
+"""
+Live dashboards: the refresh thread keeps going when an edit fails
+"""
+
+import time
+
+from printfarm.live import LiveDashboards
+from printfarm.state import FleetState
+
+
+class FlakySlack:
+    """Answers Web API calls; the first chat.update raises an unexpected error"""
+
+    def __init__(self):
+        self.updates = []
+
+    def __call__(self, method, payload):
+        if method == "chat.update":
+            self.updates.append(payload)
+            if len(self.updates) == 1:
+                raise KeyError("blocks")
+        return {"ok": True, "channel": payload["channel"], "ts": "1.0"}
+
+
+def test_refresh_thread_survives_a_failing_edit():
+    fleet = FleetState([{"id": "p1", "name": "Bambu X1 #1", "status": "available"}])
+    slack = FlakySlack()
+    live = LiveDashboards(fleet=fleet, debounce=0.01, rate=100.0, burst=100, api=slack)
+    live.start("C1")
+    fleet.update("p1", status="printing", progress=10)
+    deadline = time.monotonic() + 2.0
+    while not slack.updates and time.monotonic() < deadline:
+        time.sleep(0.01)
+    fleet.update("p1", progress=50)
+    while live.edits < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(slack.updates) == 2
+    assert live.edits == 1
+    assert live._thread.is_alive()
@@ -0,0 +1,47 @@
+# tests/test_metrics.py
+"""
+Request metrics: sampling, exported cache counters and unknown action ids
+"""
+
+from printfarm.dashboard import PrinterBlockCache
+from printfarm.dispatch import ActionRouter
+from printfarm.metrics import Metrics
+from printfarm.state import FleetState
+
+
+def test_counts_every_request_but_times_a_sample():
+    metrics = Metrics(sample_rate=0.1)
+    for _ in range(50):
+        timer = metrics.request("print")
+        timer.label = "dashboard"
+        timer.stage("parse")
+        timer.finish()
+    text = metrics.render().decode()
+    assert 'printfarm_requests_total{endpoint="print",action="dashboard"} 50' in text
+    assert 'printfarm_request_seconds_count{endpoint="print",action="dashboard"} 5' in text
+    assert 'printfarm_stage_seconds_count{endpoint="print",stage="parse"} 5' in text
+
+
+def test_exports_registered_caches():
+    fleet = FleetState([{"id": "p1", "name": "Bambu X1 #1"}, {"id": "p2", "name": "Bambu X1 #2"}])
+    blocks = PrinterBlockCache()
+    for _ in range(3):
+        for printer in fleet:
+            blocks.get(printer)
+    metrics = Metrics()
+    metrics.cache("printer_blocks", blocks.stats)
+    text = metrics.render().decode()
+    assert 'printfarm_cache_hits_total{cache="printer_blocks"} 4' in text
+    assert 'printfarm_cache_misses_total{cache="printer_blocks"} 2' in text
+    assert 'printfarm_cache_entries{cache="printer_blocks"} 2' in text
+
+
+def test_exports_unknown_action_ids():
+    metrics = Metrics()
+    router = ActionRouter(metrics=metrics)
+    router.fallback(lambda payload, action: None)
+    for action_id in ("old_button", "old_button", "typo"):
+        router.dispatch({"actions": [{"action_id": action_id}]})
+    text = metrics.render().decode()
+    assert 'printfarm_unknown_actions_total{action_id="old_button"} 2' in text
+    assert 'printfarm_unknown_actions_total{action_id="typo"} 1' in text
@@ -0,0 +1,138 @@
+# tests/test_mqtt.py
+"""
+MqttIngest against a local fake broker (plain TCP, no TLS)
+"""
+
+import asyncio
+import json
+import struct
+
+from printfarm import mqtt
+from printfarm.state import FleetState
+
+
+class FakeBroker:
+    """Accepts any client, sends `reports` on its report topic and records its requests"""
+
+    def __init__(self, serial, reports):
+        self.serial = serial
+        self.reports = reports
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        await mqtt._read_packet(reader)                                  # CONNECT
+        writer.write(mqtt._packet(mqtt.CONNACK, 0, b"\x00\x00"))
+        await mqtt._read_packet(reader)                                  # SUBSCRIBE
+        for report in self.reports:
+            payload = report if isinstance(report, bytes) else json.dumps(report).encode()
+            writer.write(mqtt._packet(mqtt.PUBLISH, 0, mqtt._encode_str(f"device/{self.serial}/report") + payload))
+        await writer.drain()
+        try:
+            while True:
+                kind, _, body = await mqtt._read_packet(reader)
+                if kind == mqtt.PUBLISH:
+                    (length,) = struct.unpack_from("!H", body)
+                    self.requests.append(json.loads(body[2 + length:]))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+class MalformedBroker(FakeBroker):
+    """Sends one malformed PUBLISH on the first connection, then behaves"""
+
+    def __init__(self, serial, reports, bad_packet):
+        super().__init__(serial, reports)
+        self.bad_packet = bad_packet
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        if self.connections > 1:
+            return await super().handle(reader, writer)
+        await mqtt._read_packet(reader)                                  # CONNECT
+        writer.write(mqtt._packet(mqtt.CONNACK, 0, b"\x00\x00"))
+        await mqtt._read_packet(reader)                                  # SUBSCRIBE
+        writer.write(mqtt._packet(mqtt.PUBLISH, 0, self.bad_packet))
+        await writer.drain()
+        try:
+            while True:
+                await mqtt._read_packet(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+async def run_ingest(broker, fleet, until):
+    server = await asyncio.start_server(broker.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    ingest = mqtt.MqttIngest([{"id": "p1", "host": "127.0.0.1", "port": port, "tls": False,
+                               "serial": broker.serial, "access_code": None}],
+                             fleet=fleet, coalesce_interval=0.01)
+    task = asyncio.create_task(ingest.run())
+    try:
+        for _ in range(200):
+            if until(ingest):
+                break
+            await asyncio.sleep(0.01)
+        return ingest
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        server.close()
+
+
+def make_fleet():
+    return FleetState([{"id": "p1", "name": "Bambu X1 #1", "model": "X1 Carbon"}])
+
+
+def test_fold_report_ignores_non_objects():
+    assert mqtt.fold_report([1, 2]) == {}
+    assert mqtt.fold_report({"print": {"gcode_state": "RUNNING", "mc_percent": 12}}) == {
+        "status": "printing", "progress": 12}
+
+
+def test_bad_reports_do_not_stop_the_broker():
+    fleet = make_fleet()
+    broker = FakeBroker("SN1", [
+        {"print": {"mc_percent": None}},
+        [1, 2],
+        b"not json",
+        {"print": {"gcode_state": "RUNNING", "mc_percent": 40, "subtask_name": "benchy.3mf"}},
+    ])
+    asyncio.run(run_ingest(broker, fleet, lambda ingest: fleet.get("p1").progress == 40))
+    printer = fleet.get("p1")
+    assert (printer.status, printer.progress, printer.current_job) == ("printing", 40, "benchy.3mf")
+    # The pushall request went out on connect
+    assert broker.requests[0]["pushing"]["command"] == "pushall"
+
+
+def test_publish_threadsafe_from_another_thread():
+    fleet = make_fleet()
+    broker = FakeBroker("SN1", [{"print": {"gcode_state": "RUNNING"}}])
+    results = []
+
+    async def main():
+        loop = asyncio.get_running_loop()
+
+        def connected(ingest):
+            if ingest._clients and fleet.get("p1").status == "printing" and not results:
+                request = {"print": {"sequence_id": "0", "command": "pause"}}
+                results.append(loop.run_in_executor(None, ingest.publish_threadsafe, "p1", request))
+            return results and results[0].done() and len(broker.requests) > 1
+
+        await run_ingest(broker, fleet, connected)
+        return await results[0]
+
+    assert asyncio.run(main()) is True
+    assert broker.requests[-1]["print"]["command"] == "pause"
+
+
+def test_malformed_publish_reconnects():
+    for bad_packet in (b"\x00", mqtt._encode_str("device/SN1/report")[:-3], b"\x00\x02\xff\xfe{}"):
+        fleet = make_fleet()
+        errors = []
+        fleet.subscribe(lambda old, new: new.error and errors.append(new.error))
+        broker = MalformedBroker("SN1", [{"print": {"gcode_state": "RUNNING", "mc_percent": 5}}], bad_packet)
+        asyncio.run(run_ingest(broker, fleet, lambda ingest: fleet.get("p1").progress == 5))
+        assert broker.connections == 2
+        assert errors and errors[0].startswith("MQTT: ")
+        assert fleet.get("p1").status == "printing"
@@ -0,0 +1,110 @@
+# tests/test_poller.py
+"""
+Poller against fake printers: local HTTP servers answering /status
+"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from printfarm.poller import Poller
+from printfarm.state import FleetState
+
+
+class FakePrinter:
+    """A printer's status endpoint on 127.0.0.1 answering with `status` after `delay` seconds"""
+
+    def __init__(self, status, delay=0.0):
+        self.status = status
+        self.delay = delay
+        self.requests = 0
+        printer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                printer.requests += 1
+                time.sleep(printer.delay)
+                body = json.dumps(printer.status).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass   # the poller gave up on us
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.address = f"127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def closed_address():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{s.getsockname()[1]}"
+
+
+def make_fleet(addresses):
+    return FleetState([{"id": printer_id, "name": printer_id, "ip": address}
+                       for printer_id, address in addresses.items()])
+
+
+def test_poll_folds_status_into_the_fleet():
+    printer = FakePrinter({"status": "printing", "current_job": "bracket.3mf", "progress": 40,
+                           "time_remaining": 1800, "name": "not polled"})
+    try:
+        fleet = make_fleet({"p1": printer.address})
+        fleet.update("p1", error="stale error")
+        poller = Poller(fleet, interval=0.1, timeout=1.0)
+        assert poller.poll_once() == 1
+        p1 = fleet.get("p1")
+        assert (p1.status, p1.current_job, p1.progress, p1.time_remaining) == ("printing", "bracket.3mf", 40, 1800)
+        assert p1.name == "p1" and p1.error is None
+        poller.stop()
+    finally:
+        printer.close()
+
+
+def test_hanging_printer_does_not_hold_up_the_round():
+    quick = FakePrinter({"status": "available"})
+    slow = FakePrinter({"status": "printing"}, delay=1.5)
+    try:
+        fleet = make_fleet({"quick": quick.address, "slow": slow.address})
+        poller = Poller(fleet, interval=0.1, timeout=0.3)
+        started = time.monotonic()
+        poller.poll_once()
+        assert time.monotonic() - started < 1.2
+        assert fleet.get("quick").status == "available"
+        # The slow printer times out and is marked offline, then backs off
+        for _ in range(100):
+            if fleet.get("slow").status == "offline":
+                break
+            time.sleep(0.02)
+        assert fleet.get("slow").status == "offline"
+        assert poller.poll_once() == 1
+        assert slow.requests == 1
+        poller.stop()
+    finally:
+        quick.close()
+        slow.close()
+
+
+def test_unreachable_printer_goes_offline_and_backs_off():
+    fleet = make_fleet({"gone": closed_address()})
+    poller = Poller(fleet, interval=0.1, timeout=0.5)
+    assert poller.poll_once() == 1
+    gone = fleet.get("gone")
+    assert gone.status == "offline" and gone.error
+    assert poller.poll_once() == 0   # not due again until its backoff passes
+    poller.stop()
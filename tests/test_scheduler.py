@@ -0,0 +1,72 @@
+# tests/test_scheduler.py
+"""
+Priority scheduler: pinned, pooled and shared jobs
+"""
+
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+
+
+def make_fleet():
+    return FleetState([
+        {"id": "p1", "name": "Bambu X1 #1", "model": "X1 Carbon", "status": "printing"},
+        {"id": "p2", "name": "Bambu X1 #2", "model": "X1 Carbon", "status": "printing"},
+        {"id": "p3", "name": "Bambu P1 #3", "model": "P1S", "status": "printing"},
+    ])
+
+
+def test_pooled_job_takes_the_first_free_printer_of_its_pool():
+    fleet = make_fleet()
+    scheduler = Scheduler(fleet)
+    job = scheduler.submit("part.3mf", pool=["p1", "p2"], prefer="p1")
+    assert job.state == "queued"
+    fleet.update("p3", status="available")    # not in the pool
+    assert job.state == "queued"
+    fleet.update("p2", status="available")
+    assert (job.state, job.assigned_to) == ("running", "p2")
+
+
+def test_pinned_job_waits_for_its_printer():
+    fleet = make_fleet()
+    scheduler = Scheduler(fleet)
+    job = scheduler.submit("part.3mf", printer_id="p1")
+    fleet.update("p2", status="available")
+    assert job.state == "queued"
+    fleet.update("p1", status="available")
+    assert job.assigned_to == "p1"
+
+
+def test_prefer_starts_on_the_clicked_printer():
+    fleet = make_fleet()
+    fleet.update("p1", status="available")
+    fleet.update("p2", status="available")
+    scheduler = Scheduler(fleet)
+    job = scheduler.submit("part.3mf", pool=["p1", "p2"], prefer="p2")
+    assert job.assigned_to == "p2"
+
+
+def test_priority_and_position():
+    fleet = make_fleet()
+    scheduler = Scheduler(fleet)
+    internal = scheduler.submit("a.3mf", client_type="internal", pool=["p1", "p2"])
+    external = scheduler.submit("b.3mf", client_type="external")
+    assert scheduler.position(external.id) == 1 and scheduler.position(internal.id) == 2
+    assert scheduler.pending(10, frozenset(["p1", "p2"])) == [internal]
+    fleet.update("p1", status="available")
+    assert external.assigned_to == "p1" and internal.state == "queued"
+
+
+def test_position_counts_jobs_in_the_same_pool():
+    fleet = make_fleet()
+    scheduler = Scheduler(fleet)
+    x1 = ["p1", "p2"]
+    jobs = [scheduler.submit(f"{n}.3mf", pool=x1) for n in "abc"]
+    other = scheduler.submit("d.3mf", pool=["p3"])
+    pinned = scheduler.submit("e.3mf", printer_id="p2", client_type="external")
+    assert len(scheduler) == 5
+    assert [scheduler.position(job.id) for job in jobs] == [2, 3, 4]
+    assert scheduler.position(other.id) == 1
+    assert scheduler.position(pinned.id) == 1
+    shared = scheduler.submit("f.3mf")
+    assert scheduler.position(shared.id) == 6
+    assert scheduler.position(jobs[0].id) == 2
@@ -0,0 +1,42 @@
+# tests/test_state.py
+"""
+FleetState and follow(): versioned updates and subset syncing
+"""
+
+from printfarm.state import FleetState, follow
+
+
+def make_fleet():
+    return FleetState([
+        {"id": "p1", "name": "Bambu X1 #1", "model": "X1 Carbon"},
+        {"id": "p2", "name": "Bambu X1 #2", "model": "X1 Carbon"},
+    ])
+
+
+def test_follow_tracks_only_its_printers():
+    fleet = make_fleet()
+    subset = follow(fleet, ["p1"])
+    fleet.update("p1", status="printing")
+    fleet.update("p2", status="offline")
+    assert subset.ids() == ["p1"]
+    assert subset.get("p1") is fleet.get("p1")
+
+
+def test_follow_drops_out_of_order_notifications():
+    fleet = make_fleet()
+    subset = follow(fleet, ["p1"])
+    older = fleet.update("p1", progress=10)
+    newer = fleet.update("p1", progress=20)
+    # A listener running late redelivers the older record
+    subset.upsert(older, keep_version=True)
+    assert subset.get("p1") is newer
+    subset.remove("p1", version=older.version)
+    assert subset.get("p1") is newer
+
+
+def test_update_without_changes_keeps_version():
+    fleet = make_fleet()
+    record = fleet.get("p1")
+    assert fleet.update("p1", status=record.status) is record
+    version, changed = fleet.changes_since(fleet.version)
+    assert changed == []
@@ -0,0 +1,50 @@
+# tests/test_store.py
+"""
+SQLite store: restore on attach and a writer that survives failed batches
+"""
+
+from printfarm.scheduler import Scheduler
+from printfarm.state import FleetState
+from printfarm.store import Store, attach
+
+
+def make_fleet(status="printing"):
+    return FleetState([{"id": "p1", "name": "Bambu X1 #1", "status": status}])
+
+
+def test_restored_jobs_start_on_free_printers(tmp_path):
+    path = str(tmp_path / "farm.db")
+    store = Store(path)
+    fleet = make_fleet()
+    scheduler = Scheduler(fleet)
+    attach(store, fleet, scheduler)
+    job = scheduler.submit("part.3mf")
+    assert store.flush()
+    store.close()
+
+    # After a restart the printer is already free and never changes state
+    store = Store(path)
+    fleet = make_fleet("available")
+    scheduler = Scheduler(fleet)
+    attach(store, fleet, scheduler)
+    assert scheduler.running("p1") is not None and scheduler.running("p1").id == job.id
+    assert store.flush()
+    assert store.jobs_by_state("queued") == []
+    store.close()
+
+
+def test_writer_survives_a_failed_batch(tmp_path):
+    store = Store(str(tmp_path / "farm.db"))
+    fleet = make_fleet()
+    fleet.subscribe(lambda old, new: store.record_printer(new))
+    store.record_job(type("Broken", (), {"id": "bad", "pool": None,
+                                          **{f: object() for f in ("file", "client_type", "deadline",
+                                                                    "duration", "submitted_by", "project",
+                                                                    "printer_id", "submitted_at", "state",
+                                                                    "assigned_to", "started_at")}})())
+    assert not store.flush()
+    assert store.errors == 1
+    fleet.update("p1", progress=50)
+    assert store.flush()
+    assert store.get_printer("p1")["progress"] == 50
+    store.close()